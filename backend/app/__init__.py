@@ -1,16 +1,23 @@
+import os
 from flask import Flask
 from flask_cors import CORS
-from flask_migrate import Migrate
 from .config import Config
 from .models import db
 from .api.video import video_bp
 from .api.analysis import analysis_bp
 from .api.status import status_bp
-from .api.transcribe import transcribe_bp
+from .api.transcribe import transcribe_bp, init_transcription_recovery
 from .api.project import project_bp
 from .api.proxy import proxy_bp
 from .api.chat import chat_bp
 from .api.config import config_bp
+from .api.metrics import metrics_bp
+from .api.profiles import profiles_bp
+from .api.search import search_bp
+from .api.stats import stats_bp
+from .api.upload import upload_bp
+from .services.profiling import init_request_profiling
+from .services.artifact_gc import init_artifact_gc
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -25,7 +32,10 @@ def create_app(config_class=Config):
     # 初始化扩展
     db.init_app(app)
     CORS(app)
-    Migrate(app, db)
+    # Flask-Migrate（alembic）导入需要约0.4秒，只在 flask db 等命令行中需要
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
     
     # 注册蓝图
     app.register_blueprint(video_bp)
@@ -36,4 +46,12 @@ def create_app(config_class=Config):
     app.register_blueprint(proxy_bp)
     app.register_blueprint(chat_bp)
     app.register_blueprint(config_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(profiles_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(stats_bp)
+    app.register_blueprint(upload_bp)
+    init_request_profiling(app)
+    init_artifact_gc(app)
+    init_transcription_recovery(app)
     return app
@@ -1,11 +1,17 @@
 import os
 import uuid
 import json
-from flask import Blueprint, jsonify, current_app, request
+from flask import Blueprint, jsonify, current_app, request, Response, stream_with_context
 from app.services.analysis_service import AnalysisService
+from app.services import artifact_gc
+from app.models.video import Video
 
 analysis_bp = Blueprint('analysis', __name__, url_prefix='/api/analysis')
 
+def force_requested():
+    """请求参数 force=1 时忽略已缓存的分析结果，重新生成"""
+    return request.args.get('force', '').lower() in ('1', 'true', 'yes')
+
 @analysis_bp.route('/analyze_transcript/<task_id>', methods=['GET'])
 def analyze_transcript(task_id):
     """
@@ -21,16 +27,63 @@ def analyze_transcript(task_id):
     #     transcript = f.read()
 
     # 调用分析服务
-    analysis_service = AnalysisService()
-    result = analysis_service.analyze_text(transcript_path)
-
-    # 保存分析结果
+    # mode: single / sharded / incremental / auto，缺省使用配置的分析模式
+    # incremental 只重新分析文字稿中被修改过的阶段
+    # 文字稿、提示词版本和模型都未变化时直接返回已有结果，force=1 强制重新生成
     output_path = os.path.join(temp_dir, "tree.json")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(result)
+    analysis_service = AnalysisService()
+    result = analysis_service.analyze_to_file(transcript_path, output_path, 'tree', request.args.get('mode'), force_requested())
 
     return jsonify({'success': True, 'task_id': task_id, 'result': result})
 
+@analysis_bp.route('/stream/<task_id>', methods=['GET'])
+def stream_analysis(task_id):
+    """
+    流式分析接口（SSE），每生成一个分析节点就推送给前端，全部完成后写入 tree.json / bubble.json
+    
+    Query:
+        view: tree（默认）或 bubble
+        force: 为1时忽略已缓存的结果
+    """
+    view = request.args.get('view', 'tree')
+    if view not in ('tree', 'bubble'):
+        return jsonify({'success': False, 'error': 'view must be tree or bubble'}), 400
+
+    temp_dir = os.path.join(current_app.root_path, '..', 'temp', task_id)
+    transcript_path = os.path.join(temp_dir, "transcript.txt")
+    if not os.path.exists(transcript_path):
+        return jsonify({'success': False, 'error': 'transcript file not found'}), 404
+    output_path = os.path.join(temp_dir, f"{view}.json")
+    force = force_requested()
+
+    def generate():
+        try:
+            # 已有相同输入生成的结果时直接推送全部节点；相同分析正在进行时共享其输出
+            analysis_service = AnalysisService()
+            count = 0
+            for event in analysis_service.analyze_text_stream_to_file(transcript_path, output_path, view, force):
+                if event['type'] == 'node':
+                    count += 1
+                    yield f"data: {json.dumps({'type': 'node', 'node': event['node'], 'count': count}, ensure_ascii=False)}\n\n"
+                elif event['type'] == 'reset':
+                    count = 0
+                    yield f"data: {json.dumps({'type': 'reset'})}\n\n"
+                elif event['type'] == 'done':
+                    yield f"data: {json.dumps({'type': 'completion', 'view': view, 'count': count, 'cached': event['cached']})}\n\n"
+        except Exception as e:
+            current_app.logger.error(f"流式分析失败: {str(e)}")
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)}, ensure_ascii=False)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @analysis_bp.route('<task_id>_tree')
 def get_analysis_tree(task_id):
     """
@@ -47,6 +100,19 @@ def get_analysis_tree(task_id):
 
     return result
 
+@analysis_bp.route('<task_id>_speech')
+def get_speech_metrics(task_id):
+    """
+    获取按句的本地语速和停顿指标，文字稿或音频变化后重新计算
+    """
+    temp_dir = os.path.join(current_app.root_path, '..', 'temp', task_id)
+    transcript_path = os.path.join(temp_dir, "transcript.txt")
+    if not os.path.exists(transcript_path):
+        return jsonify({'success': False, 'error': 'transcript file not found'}), 404
+
+    from app.services.speech_metrics import load_or_compute
+    return jsonify(load_or_compute(transcript_path))
+
 @analysis_bp.route('<task_id>_bubble')
 def get_analysis_bubble(task_id):
     """
@@ -78,13 +144,12 @@ def analyze_transcript_bubble(task_id):
     #     transcript = f.read()
 
     # 调用分析服务
-    analysis_service = AnalysisService()
-    result = analysis_service.bubble_analyze_text(transcript_path)
-
-    # 保存分析结果
+    # mode: single / sharded / incremental / auto，缺省使用配置的分析模式
+    # incremental 只重新分析文字稿中被修改过的阶段
+    # 文字稿、提示词版本和模型都未变化时直接返回已有结果，force=1 强制重新生成
     output_path = os.path.join(temp_dir, "bubble.json")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(result)
+    analysis_service = AnalysisService()
+    result = analysis_service.analyze_to_file(transcript_path, output_path, 'bubble', request.args.get('mode'), force_requested())
 
     return jsonify({'success': True, 'task_id': task_id, 'result': result})
 
@@ -96,19 +161,23 @@ def analyze_audio_bubble(task_id):
     # 假设文字稿路径
     temp_dir = os.path.join(current_app.root_path, '..', 'temp', task_id)
     audio_path = os.path.join(temp_dir, "audio.wav")
+    if not os.path.exists(audio_path) and artifact_gc.is_evicted(temp_dir, "audio.wav"):
+        # 音频被 temp/ 回收删除时重新提取
+        video = Video.query.get(task_id)
+        try:
+            artifact_gc.restore(task_id, video.bv_id if video else None, temp_dir, 'audio')
+        except Exception as e:
+            current_app.logger.error(f"重新获取音频失败: {str(e)}")
     if not os.path.exists(audio_path):
         return jsonify({'success': False, 'error': 'audio file not found'}), 404
+    artifact_gc.touch(temp_dir)
 
     # with open(transcript_path, 'r', encoding='utf-8') as f:
     #     transcript = f.read()
 
-    # 调用分析服务
-    analysis_service = AnalysisService()
-    result = analysis_service.bubble_analyze_audio(audio_path)
-
-    # 保存分析结果
+    # 调用分析服务并保存分析结果；相同音频已分析过时直接返回，force=1 强制重新生成
     output_path = os.path.join(temp_dir, "bubble.json")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(result)
+    analysis_service = AnalysisService()
+    result = analysis_service.bubble_analyze_audio_to_file(audio_path, output_path, force_requested())
 
     return jsonify({'success': True, 'task_id': task_id, 'result': result})
\ No newline at end of file
@@ -98,11 +98,17 @@ def update_config():
             
             # 重新加载配置
             from app.config import Config
+            old_gemini_key = Config.GEMINI_API_KEY
             Config.api_config = load_config()
             Config.GEMINI_API_KEY = Config.api_config.get('geminiApiKey') or os.environ.get('GEMINI_API_KEY') or ''
             Config.OPENAI_API_KEY = Config.api_config.get('openaiApiKey') or os.environ.get('OPENAI_API_KEY') or ''
             Config.ANTHROPIC_API_KEY = Config.api_config.get('anthropicApiKey') or os.environ.get('ANTHROPIC_API_KEY') or ''
             
+            # Gemini API Key变更时重建共享客户端
+            if Config.GEMINI_API_KEY != old_gemini_key:
+                from app.services.llm_provider import reset_client_pool
+                reset_client_pool()
+            
             # 同步到 Flask 应用的运行时配置，避免读取到旧值
             try:
                 current_app.config['GEMINI_API_KEY'] = Config.GEMINI_API_KEY
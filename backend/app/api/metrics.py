@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from app.services.metrics import REGISTRY
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus文本格式的运行指标：各步骤耗时、聊天首字节延迟、重试/限流次数、上传字节数、处理中的项目数"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
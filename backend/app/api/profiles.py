@@ -0,0 +1,30 @@
+import os
+from flask import Blueprint, jsonify, request, send_file
+from app.config import Config
+from app.services.profiling import list_profiles
+
+profiles_bp = Blueprint('profiles', __name__, url_prefix='/api/profiles')
+
+@profiles_bp.route('', methods=['GET'])
+def get_profiles():
+    """最近的性能分析结果列表"""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'success': True, 'profiles': list_profiles(limit)})
+
+@profiles_bp.route('/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    下载单份性能分析结果
+
+    Query:
+        format: txt（默认，按累计耗时排序的文本摘要）或 prof（pstats二进制，可用snakeviz打开）
+    """
+    fmt = request.args.get('format', 'txt')
+    if fmt not in ('txt', 'prof') or os.path.basename(profile_id) != profile_id:
+        return jsonify({'success': False, 'error': '参数错误'}), 400
+    path = os.path.join(Config.PROFILE_DIR, f"{profile_id}.{fmt}")
+    if not os.path.exists(path):
+        return jsonify({'success': False, 'error': '性能分析结果不存在'}), 404
+    if fmt == 'txt':
+        return send_file(path, mimetype='text/plain; charset=utf-8')
+    return send_file(path, as_attachment=True, download_name=f"{profile_id}.prof")
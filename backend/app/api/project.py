@@ -7,7 +7,14 @@ from app.models.video import Video
 from app.services.audio_service import AudioService
 from app.services.audio_transcribe_service import AudioTranscribeService
 from app.services.analysis_service import AnalysisService
-from app.models.db import db
+from app.services.analysis_shards import analysis_is_stale
+from app.services.metrics import PIPELINE_QUEUE_DEPTH, STAGE_DURATION, DUPLICATE_IMPORTS
+from app.services.tracing import span
+from app.services.profiling import should_profile, profile_block
+from app.services import search_index, artifact_gc
+from app.models.db import db, release_connection
+from app.config import Config
+from sqlalchemy import or_
 import threading
 import time
 
@@ -16,6 +23,28 @@ project_bp = Blueprint('project', __name__)
 # 允许的视频文件扩展名
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm'}
 
+def start_pipeline_thread(target, video_id: str):
+    """
+    在后台线程处理项目，并计入正在处理的项目数；开启追踪时整个处理过程记录为一条trace。
+    在请求中调用，target 在当前应用的新应用上下文中执行（线程有独立的数据库会话，结束时释放），
+    请求带有 X-Profile: 1 或命中采样时对整个处理过程做性能分析
+    """
+    PIPELINE_QUEUE_DEPTH.inc()
+    profiled = should_profile()
+    app = current_app._get_current_object()
+
+    def run():
+        try:
+            with app.app_context(), span('project', video_id=video_id), \
+                    profile_block('job', video_id, enabled=profiled):
+                target()
+        finally:
+            PIPELINE_QUEUE_DEPTH.dec()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -38,6 +67,7 @@ def list_projects():
             'bilibili_url': v.bilibili_url,
             'created_at': v.created_at.isoformat() if v.created_at else None,
             'status': v.status,
+            'duplicate_of': v.duplicate_of,
         })
     return jsonify(projects)
 
@@ -78,59 +108,56 @@ def upload_bilibili_video():
         
         # 异步处理视频
         def process_video_async():
-            from app import create_app
-            app = create_app()
-            with app.app_context():
-                try:
-                    # 重新查询视频记录，确保在正确的会话中
-                    current_video = Video.query.get(video_id)
-                    if not current_video:
-                        app.logger.error(f"视频记录不存在: {video_id}")
-                        return
+            try:
+                # 重新查询视频记录，确保在正确的会话中
+                current_video = Video.query.get(video_id)
+                if not current_video:
+                    current_app.logger.error(f"视频记录不存在: {video_id}")
+                    return
 
-                    before_download = time.time()
-                    # 调用Bilibili下载和处理流程
-                    from app.services.bilibili_service import BilibiliService
-                    bili_service = BilibiliService()
-                    
-                    # 获取视频信息
-                    video_info = bili_service.get_video_info(current_video.bv_id)
-                    
-                    # 更新视频信息
-                    current_video.title = video_info.get('title', current_video.title)
-                    current_video.uploader = video_info.get('uploader', current_video.uploader)
-                    current_video.cover = video_info.get('cover', current_video.cover)
-                    current_video.duration = video_info.get('duration', current_video.duration)
-                    db.session.commit()
-                    
-                    # 构建任务目录路径
-                    task_dir = os.path.join(app.root_path, '..', 'temp', video_id)
-                    os.makedirs(task_dir, exist_ok=True)
-                    
-                    # 下载视频
-                    video_path = bili_service.download_video(current_video.bv_id, video_id)
+                release_connection()
+                before_download = time.time()
+                # 调用Bilibili下载和处理流程
+                from app.services.bilibili_service import BilibiliService
+                bili_service = BilibiliService()
+                
+                # 获取视频信息
+                video_info = bili_service.get_video_info(current_video.bv_id)
+                
+                # 更新视频信息
+                current_video.title = video_info.get('title', current_video.title)
+                current_video.uploader = video_info.get('uploader', current_video.uploader)
+                current_video.cover = video_info.get('cover', current_video.cover)
+                current_video.duration = video_info.get('duration', current_video.duration)
+                db.session.commit()
+                
+                # 构建任务目录路径
+                task_dir = os.path.join(current_app.root_path, '..', 'temp', video_id)
+                os.makedirs(task_dir, exist_ok=True)
+                
+                # 下载视频
+                video_path = bili_service.download_video(current_video.bv_id, video_id)
 
-                    after_download = time.time()
-                    print(f"视频下载耗时: {after_download - before_download:.2f}秒")
+                after_download = time.time()
+                print(f"视频下载耗时: {after_download - before_download:.2f}秒")
 
-                    # 处理下载的视频
-                    process_local_video_pipeline(video_id, video_path, task_dir)
+                # 处理下载的视频
+                process_local_video_pipeline(video_id, video_path, task_dir)
 
-                    after_process = time.time()
-                    print(f'全过程耗时: {after_process - before_download:.2f}秒')
+                after_process = time.time()
+                print(f'全过程耗时: {after_process - before_download:.2f}秒')
 
-                except Exception as e:
-                    try:
-                        current_video = Video.query.get(video_id)
-                        if current_video:
-                            current_video.status = 'failed'
-                            db.session.commit()
-                    except Exception as db_error:
-                        app.logger.error(f"更新数据库状态失败: {str(db_error)}")
-                    app.logger.error(f"处理Bilibili视频失败: {str(e)}")
-        
-        thread = threading.Thread(target=process_video_async)
-        thread.start()
+            except Exception as e:
+                try:
+                    current_video = Video.query.get(video_id)
+                    if current_video:
+                        current_video.status = 'failed'
+                        db.session.commit()
+                except Exception as db_error:
+                    current_app.logger.error(f"更新数据库状态失败: {str(db_error)}")
+                current_app.logger.error(f"处理Bilibili视频失败: {str(e)}")
+
+        start_pipeline_thread(process_video_async, video_id)
         
         return jsonify({'success': True, 'video_id': video_id})
         
@@ -178,25 +205,7 @@ def upload_local_video():
         db.session.add(video)
         db.session.commit()
         
-        # 异步处理视频
-        def process_local_video_async():
-            from app import create_app
-            app = create_app()
-            with app.app_context():
-                try:
-                    process_local_video_pipeline(video_id, video_path, task_dir)
-                except Exception as e:
-                    try:
-                        current_video = Video.query.get(video_id)
-                        if current_video:
-                            current_video.status = 'failed'
-                            db.session.commit()
-                    except Exception as db_error:
-                        app.logger.error(f"更新数据库状态失败: {str(db_error)}")
-                    app.logger.error(f"处理本地视频失败: {str(e)}")
-        
-        thread = threading.Thread(target=process_local_video_async)
-        thread.start()
+        start_local_video_processing(video_id, video_path, task_dir)
         
         return jsonify({'success': True, 'video_id': video_id})
         
@@ -209,10 +218,91 @@ def upload_local_video():
 
 
 
+def link_duplicate(video_id: str, task_dir: str, audio_path: str):
+    """
+    计算音频指纹并写入项目记录；与已完成的项目是同一场比赛且时间对齐时，复制其文字稿和分析结果并记录关联
+
+    Returns:
+        被复用的项目编号，没有重复时返回None
+    """
+    # 音频指纹依赖NumPy，只在处理项目时加载
+    from app.services import fingerprint
+    with STAGE_DURATION.time(stage='fingerprint'), span('fingerprint', bytes=os.path.getsize(audio_path)) as s:
+        prints = fingerprint.compute_fingerprint(audio_path)
+        if prints is None:
+            return None
+        fingerprint.save_fingerprint(task_dir, prints)
+        key = fingerprint.fingerprint_key(prints)
+        video = Video.query.get(video_id)
+        video.audio_fingerprint = key
+        seconds = fingerprint.fingerprint_seconds(prints)
+        video.audio_seconds = seconds
+        db.session.commit()
+
+        # 候选：哈希相同，或时长相差在允许的错位以内的已完成项目
+        tolerance = Config.FINGERPRINT_MAX_SHIFT_S
+        rows = Video.query.filter(
+            Video.id != video_id,
+            Video.status == 'completed',
+            or_(Video.audio_fingerprint == key,
+                Video.audio_seconds.between(seconds - tolerance, seconds + tolerance))
+        ).order_by(Video.created_at).all()
+        projects_dir = os.path.dirname(os.path.abspath(task_dir))
+        candidates = [(row.id, os.path.join(projects_dir, row.id), row.audio_fingerprint) for row in rows
+                      if os.path.exists(os.path.join(projects_dir, row.id, 'transcript.txt'))]
+        duplicate_id, ber, shift = fingerprint.find_duplicate(prints, candidates)
+        s.set(candidates=len(candidates), duplicate=duplicate_id, shift=shift)
+        if duplicate_id is None:
+            return None
+        if abs(shift) > fingerprint.REUSE_MAX_SHIFT_S:
+            # 复制的文字稿和分析结果的时间戳会整体偏移，照常转录
+            current_app.logger.info(f"项目 {video_id} 与 {duplicate_id} 音频相同但错位 {shift:.2f} 秒，不复用其文字稿和分析结果")
+            return None
+
+        copied = fingerprint.copy_artifacts(os.path.join(projects_dir, duplicate_id), task_dir)
+        video.duplicate_of = duplicate_id
+        db.session.commit()
+    DUPLICATE_IMPORTS.inc()
+    current_app.logger.info(f"项目 {video_id} 与 {duplicate_id} 音频相同（误码率 {ber:.3f}），已复用: {', '.join(copied)}")
+    return duplicate_id
+
+
+def start_local_video_processing(video_id: str, video_path: str, task_dir: str):
+    """在后台线程中处理已保存的本地视频，需在请求中调用"""
+    def process_local_video_async():
+        try:
+            process_local_video_pipeline(video_id, video_path, task_dir)
+        except Exception as e:
+            try:
+                current_video = Video.query.get(video_id)
+                if current_video:
+                    current_video.status = 'failed'
+                    db.session.commit()
+            except Exception as db_error:
+                current_app.logger.error(f"更新数据库状态失败: {str(db_error)}")
+            current_app.logger.error(f"处理本地视频失败: {str(e)}")
+
+    return start_pipeline_thread(process_local_video_async, video_id)
+
+
 def process_local_video_pipeline(video_id: str, video_path: str, task_dir: str):
-    """处理本地视频的完整流程：提取音频 -> 转录 -> 分析"""
+    """
+    处理本地视频的完整流程：提取音频 -> 转录 -> 分析
+
+    Returns:
+        各步骤耗时（秒）：{'extract': ..., 'transcribe': ..., 'analysis': ..., 'total': ...}
+    """
+    with span('pipeline', video_id=video_id):
+        return _run_local_video_pipeline(video_id, video_path, task_dir)
+
+
+def _run_local_video_pipeline(video_id: str, video_path: str, task_dir: str):
+    timings = {}
     try:
         current_app.logger.info(f"开始处理本地视频: {video_id}")
+        # 以下各步骤耗时较长，只在写入状态时短暂使用数据库连接
+        release_connection()
+        artifact_gc.touch(task_dir)
         
         # 定义文件路径
         audio_path = os.path.join(task_dir, "audio.wav")
@@ -235,7 +325,16 @@ def process_local_video_pipeline(video_id: str, video_path: str, task_dir: str):
             current_app.logger.error(f"音频提取失败: {str(e)}")
             raise Exception(f"音频提取失败: {str(e)}")
 
+        # 与已有项目是同一场比赛时复用其文字稿和分析结果，之后的转录和分析步骤会直接跳过；检测失败不影响项目处理
+        if Config.FINGERPRINT_ENABLED and not os.path.exists(transcript_path):
+            try:
+                link_duplicate(video_id, task_dir, audio_path)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.warning(f"音频指纹检测失败: {str(e)}")
+
         after_extract = time.time()
+        timings['extract'] = after_extract - before_extract
         print(f"音频提取耗时: {after_extract - before_extract:.2f}秒")
 
         before_transcribe = time.time()
@@ -243,7 +342,6 @@ def process_local_video_pipeline(video_id: str, video_path: str, task_dir: str):
         current_app.logger.info(f"步骤2: 转录音频")
         try:
             if not os.path.exists(transcript_path):
-                from app.config import Config
                 transcribe_service = AudioTranscribeService(
                     gemini_api_key=Config.GEMINI_API_KEY,
                     max_retries=Config.MAX_RETRIES,
@@ -257,15 +355,34 @@ def process_local_video_pipeline(video_id: str, video_path: str, task_dir: str):
             current_app.logger.error(f"音频转录失败: {str(e)}")
             raise Exception(f"音频转录失败: {str(e)}")
 
+        # 更新全文检索索引，文字稿未变化时跳过；索引失败不影响项目处理
+        try:
+            search_index.index_transcript(video_id, transcript_path)
+        except Exception as e:
+            current_app.logger.warning(f"更新检索索引失败: {str(e)}")
+
+        # 本地计算语速和停顿指标，分析完成后合并进分析结果
+        try:
+            from app.services.speech_metrics import load_or_compute
+            load_or_compute(transcript_path, audio_path)
+        except Exception as e:
+            current_app.logger.warning(f"计算语速指标失败: {str(e)}")
+
         after_transcribe = time.time()
+        timings['transcribe'] = after_transcribe - before_transcribe
         print(f"音频转录耗时: {after_transcribe - before_transcribe:.2f}秒")
 
         before_analysis = time.time()
         # 步骤3: 分析转录文本
         current_app.logger.info(f"步骤3: 分析转录文本")
         try:
-            if not os.path.exists(tree_analysis_path) or not os.path.exists(bubble_analysis_path):
-                from app.config import Config
+            analysis_missing = not os.path.exists(tree_analysis_path) or not os.path.exists(bubble_analysis_path)
+            # 文字稿在上次分析后被修改（如修正发言人、错听的句子）时，只增量重新分析改动的阶段
+            analysis_stale = not analysis_missing and (
+                analysis_is_stale(transcript_path, tree_analysis_path) or
+                analysis_is_stale(transcript_path, bubble_analysis_path)
+            )
+            if analysis_missing or analysis_stale:
                 analysis_service = AnalysisService(
                     gemini_api_key=Config.GEMINI_API_KEY,
                     max_retries=Config.MAX_RETRIES
@@ -273,16 +390,18 @@ def process_local_video_pipeline(video_id: str, video_path: str, task_dir: str):
                 analysis_service.analyze_transcript(
                     transcript_path, 
                     tree_analysis_path, 
-                    bubble_analysis_path
+                    bubble_analysis_path,
+                    mode='incremental' if analysis_stale else None
                 )
                 current_app.logger.info(f"分析完成: {tree_analysis_path}, {bubble_analysis_path}")
             else:
-                current_app.logger.info(f"分析文件已存在，跳过分析")
+                current_app.logger.info(f"分析文件已是最新，跳过分析")
         except Exception as e:
             current_app.logger.error(f"文本分析失败: {str(e)}")
             raise Exception(f"文本分析失败: {str(e)}")
 
         after_analysis = time.time()
+        timings['analysis'] = after_analysis - before_analysis
         print(f"音频分析耗时: {after_analysis - before_analysis:.2f}秒")
 
         # 步骤4: 更新视频状态
@@ -295,6 +414,8 @@ def process_local_video_pipeline(video_id: str, video_path: str, task_dir: str):
         except Exception as db_error:
             current_app.logger.error(f"更新数据库状态失败: {str(db_error)}")
 
+        timings['total'] = time.time() - before_extract
+        return timings
 
     except Exception as e:
         current_app.logger.error(f"处理本地视频失败: {str(e)}")
@@ -326,8 +447,13 @@ def delete_project(video_id):
             import shutil
             shutil.rmtree(task_dir)
             current_app.logger.info(f"删除项目文件夹: {task_dir}")
+        try:
+            search_index.remove_project(video_id)
+        except Exception as e:
+            current_app.logger.warning(f"移除检索索引失败: {str(e)}")
         
-        # 删除数据库记录
+        # 删除数据库记录，复用过该项目产物的项目已有各自的副本，只解除关联
+        Video.query.filter_by(duplicate_of=video_id).update({'duplicate_of': None})
         db.session.delete(video)
         db.session.commit()
         
@@ -374,69 +500,66 @@ def retry_video_processing(video_id):
         
         # 异步重试处理
         def retry_process_async():
-            from app import create_app
-            app = create_app()
-            with app.app_context():
-                try:
-                    # 重新查询视频记录，确保在正确的会话中
-                    current_video = Video.query.get(video_id)
-                    if not current_video:
-                        app.logger.error(f"视频记录不存在: {video_id}")
-                        return
+            try:
+                # 重新查询视频记录，确保在正确的会话中
+                current_video = Video.query.get(video_id)
+                if not current_video:
+                    current_app.logger.error(f"视频记录不存在: {video_id}")
+                    return
+                
+                current_app.logger.info(f"开始重试处理视频: {video_id}")
+                release_connection()
+                
+                if current_video.bv_id.startswith('LV'):
+                    # 本地视频重试
+                    if video_file and os.path.exists(video_file):
+                        current_app.logger.info(f"本地视频文件存在，开始处理: {video_file}")
+                        process_local_video_pipeline(video_id, video_file, task_dir)
+                    else:
+                        current_app.logger.error(f"本地视频文件不存在: {video_file}")
+                        current_video.status = 'failed'
+                        db.session.commit()
+                        current_app.logger.info(f"已更新状态为失败: {video_id}")
+                else:
+                    # B站视频重试
+                    current_app.logger.info(f"B站视频重试，开始下载: {current_video.bv_id}")
+                    from app.services.bilibili_service import BilibiliService
+                    bili_service = BilibiliService()
                     
-                    app.logger.info(f"开始重试处理视频: {video_id}")
+                    # 检查视频文件是否已经存在
+                    existing_file = None
+                    if os.path.exists(task_dir):
+                        for filename in os.listdir(task_dir):
+                            if filename.startswith('video.') and any(filename.endswith(ext) for ext in ALLOWED_EXTENSIONS):
+                                existing_file = os.path.join(task_dir, filename)
+                                break
                     
-                    if current_video.bv_id.startswith('LV'):
-                        # 本地视频重试
-                        if video_file and os.path.exists(video_file):
-                            app.logger.info(f"本地视频文件存在，开始处理: {video_file}")
-                            process_local_video_pipeline(video_id, video_file, task_dir)
-                        else:
-                            app.logger.error(f"本地视频文件不存在: {video_file}")
-                            current_video.status = 'failed'
-                            db.session.commit()
-                            app.logger.info(f"已更新状态为失败: {video_id}")
+                    if existing_file and os.path.exists(existing_file):
+                        current_app.logger.info(f"B站视频文件已存在，跳过下载: {existing_file}")
+                        video_path = existing_file
                     else:
-                        # B站视频重试
-                        app.logger.info(f"B站视频重试，开始下载: {current_video.bv_id}")
-                        from app.services.bilibili_service import BilibiliService
-                        bili_service = BilibiliService()
-                        
-                        # 检查视频文件是否已经存在
-                        video_file = None
-                        if os.path.exists(task_dir):
-                            for filename in os.listdir(task_dir):
-                                if filename.startswith('video.') and any(filename.endswith(ext) for ext in ALLOWED_EXTENSIONS):
-                                    video_file = os.path.join(task_dir, filename)
-                                    break
-                        
-                        if video_file and os.path.exists(video_file):
-                            app.logger.info(f"B站视频文件已存在，跳过下载: {video_file}")
-                            video_path = video_file
-                        else:
-                            app.logger.info(f"B站视频文件不存在，开始下载: {current_video.bv_id}")
-                            video_path = bili_service.download_video(current_video.bv_id, video_id)
-                        
-                        before_process=time.time()
-                        process_local_video_pipeline(video_id, video_path, task_dir)
-                        after_process = time.time()
-                        print(f'处理用时：{after_process-before_process:.2f}秒')
-                    
-                    app.logger.info(f"重试处理完成: {video_id}")
+                        current_app.logger.info(f"B站视频文件不存在，开始下载: {current_video.bv_id}")
+                        video_path = bili_service.download_video(current_video.bv_id, video_id)
                     
-                except Exception as e:
-                    app.logger.error(f"重试处理视频失败: {str(e)}")
-                    try:
-                        current_video = Video.query.get(video_id)
-                        if current_video:
-                            current_video.status = 'failed'
-                            db.session.commit()
-                            app.logger.info(f"已更新状态为失败: {video_id}")
-                    except Exception as db_error:
-                        app.logger.error(f"更新数据库状态失败: {str(db_error)}")
-        
-        thread = threading.Thread(target=retry_process_async)
-        thread.start()
+                    before_process=time.time()
+                    process_local_video_pipeline(video_id, video_path, task_dir)
+                    after_process = time.time()
+                    print(f'处理用时：{after_process-before_process:.2f}秒')
+                
+                current_app.logger.info(f"重试处理完成: {video_id}")
+                
+            except Exception as e:
+                current_app.logger.error(f"重试处理视频失败: {str(e)}")
+                try:
+                    current_video = Video.query.get(video_id)
+                    if current_video:
+                        current_video.status = 'failed'
+                        db.session.commit()
+                        current_app.logger.info(f"已更新状态为失败: {video_id}")
+                except Exception as db_error:
+                    current_app.logger.error(f"更新数据库状态失败: {str(db_error)}")
+
+        start_pipeline_thread(retry_process_async, video_id)
         
         return jsonify({'success': True, 'message': '重试处理已开始'})
         
@@ -1,5 +1,4 @@
 from flask import Blueprint, request, Response, redirect
-import requests as pyrequests
 import logging
 
 # 配置日志
@@ -9,6 +8,8 @@ proxy_bp = Blueprint('proxy', __name__)
 
 @proxy_bp.route('/api/proxy_image')
 def proxy_image():
+    # requests只有图片代理用到，推迟导入以加快后端启动
+    import requests as pyrequests
     url = request.args.get('url')
     if not url:
         logger.error("Missing url parameter in proxy_image request")
@@ -75,6 +76,7 @@ def proxy_image():
 
 @proxy_bp.route('/api/proxy_image/test')
 def test_proxy_image():
+    import requests as pyrequests
     """测试图片代理功能"""
     test_url = "http://i0.hdslb.com/bfs/archive/b3a04fbb1c9fc39979cbe70407a815fe15313aa2.jpg"
     logger.info(f"Testing proxy with URL: {test_url}")
@@ -0,0 +1,63 @@
+import time
+import logging
+from flask import Blueprint, jsonify, request
+from app.models.video import Video
+from app.services import search_index
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+search_bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+@search_bp.route('', methods=['GET'])
+def search():
+    """
+    在全部项目的文字稿中检索发言
+
+    Query:
+        q: 检索词，空格分隔的多个词需同时出现
+        camp: 阵营（正方/反方/主持人/评委）
+        speaker: 发言人包含的文本，如"一辩"
+        stage: 阶段名包含的文本，如"自由辩论"
+        project_id: 只在该项目中检索
+        limit / offset: 分页，limit最大100
+
+    Returns:
+        按相关度排序的发言行，link为带时间戳的项目播放页地址
+    """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'success': False, 'error': 'q is required'}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    start = time.time()
+    try:
+        search_index.sync()
+        result = search_index.search(
+            q,
+            camp=request.args.get('camp'),
+            speaker=request.args.get('speaker'),
+            stage=request.args.get('stage'),
+            project_id=request.args.get('project_id'),
+            limit=limit,
+            offset=offset,
+        )
+    except Exception as e:
+        logger.error(f"检索失败: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    # 补充项目标题
+    project_ids = {hit['project_id'] for hit in result['hits']}
+    titles = {v.id: v.title for v in Video.query.filter(Video.id.in_(project_ids)).all()} if project_ids else {}
+    for hit in result['hits']:
+        hit['title'] = titles.get(hit['project_id'])
+
+    return jsonify({
+        'success': True,
+        'query': q,
+        'hits': result['hits'],
+        'has_more': result['has_more'],
+        'took_ms': round((time.time() - start) * 1000, 2),
+    })
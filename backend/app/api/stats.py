@@ -0,0 +1,45 @@
+import time
+import logging
+from flask import Blueprint, jsonify, request
+from app.models.video import Video
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+stats_bp = Blueprint('stats', __name__, url_prefix='/api/stats')
+
+@stats_bp.route('', methods=['GET'])
+def get_stats():
+    """
+    讲者统计：按发言人和阵营汇总发言时长、每分钟字数、轮次和打断密度
+
+    Query:
+        project_id: 逗号分隔的项目ID，缺省为全部已完成的项目
+
+    Returns:
+        {'debates', 'segments', 'speakers': [...], 'camps': [...], 'took_ms'}
+    """
+    # numpy较大，只在请求统计时加载，不影响后端启动
+    from app.services import stats_service
+
+    start = time.time()
+    if request.args.get('project_id'):
+        project_ids = [p.strip() for p in request.args['project_id'].split(',') if p.strip()]
+    else:
+        project_ids = [v.id for v in Video.query.filter_by(status='completed').all()]
+
+    try:
+        paths = stats_service.project_transcripts(project_ids)
+        result = stats_service.compute_stats(list(paths.values()))
+    except Exception as e:
+        logger.error(f"计算讲者统计失败: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    result.update(
+        success=True,
+        projects=list(paths),
+        missing=[p for p in project_ids if p not in paths],
+        took_ms=round((time.time() - start) * 1000, 2),
+    )
+    return jsonify(result)
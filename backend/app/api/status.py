@@ -1,7 +1,22 @@
-from flask import Blueprint
+import time
+from flask import Blueprint, jsonify
+from sqlalchemy import text
+from app.models.db import db
 
 status_bp = Blueprint('status', __name__)
 
+# 进程启动时间，用于就绪接口返回运行时长
+_started_at = time.time()
+
 @status_bp.route('/api/status/test', methods=['GET'])
 def test():
     return "status ok"
+
+@status_bp.route('/api/ready', methods=['GET'])
+def ready():
+    """就绪检查：应用已加载且数据库可用，Electron启动时轮询该接口后再显示窗口"""
+    try:
+        db.session.execute(text('SELECT 1'))
+    except Exception as e:
+        return jsonify({'success': False, 'ready': False, 'error': str(e)}), 503
+    return jsonify({'success': True, 'ready': True, 'uptime': round(time.time() - _started_at, 3)})
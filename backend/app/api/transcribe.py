@@ -1,12 +1,23 @@
 import os
+import time
 import uuid
 import logging
+import threading
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app, Response, stream_template
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from app.services.audio_transcribe_service import AudioTranscribeService, TranscriptionSegment
+from app.services.transcript_utils import ts_to_ms
 from app.models.transcription import TranscriptionTask
+from app.models.video import Video
 from app.models.db import db
+from app.config import Config
+from app.services.job_queue import JobQueue, worker_id, worker_alive
+from app.services.metrics import TRANSCRIBE_QUEUE_DEPTH
+from app.services import transcript_export
+from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError
+from urllib.parse import quote
 import json
 
 # 配置日志
@@ -19,6 +30,9 @@ transcribe_bp = Blueprint('transcribe', __name__, url_prefix='/api/transcribe')
 # 允许的音频文件扩展名
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'm4a', 'aac', 'flac', 'ogg'}
 
+# 上传和重试的转录任务在后台工作线程中执行，请求立即返回202
+TRANSCRIBE_QUEUE = JobQueue('transcribe', Config.TRANSCRIBE_WORKERS, TRANSCRIBE_QUEUE_DEPTH)
+
 def allowed_file(filename):
     """检查文件扩展名是否允许"""
     return '.' in filename and \
@@ -38,21 +52,190 @@ def get_transcribe_service():
         segment_length_ms=30*60*1000  # 30分钟一段
     )
 
+def segment_to_dict(seg):
+    """将单个TranscriptionSegment转换为字典"""
+    return {
+        'global_ts': seg.global_ts,
+        'start_time_ms': ts_to_ms(seg.global_ts),
+        'end_time_ms': getattr(seg, 'end_time_ms', None),
+        'speaker': seg.speaker,
+        'text': seg.text,
+        'confidence': seg.confidence,
+        'camp': getattr(seg, 'camp', '未知'),
+        'stage': getattr(seg, 'stage', '未知阶段'),
+        'stage_name': getattr(seg, 'stage_name', '')
+    }
+
 def segments_to_dict(segments):
     """将TranscriptionSegment列表转换为字典列表"""
-    return [
-        {
-            'start_time_ms': seg.start_time_ms,
-            'end_time_ms': seg.end_time_ms,
-            'speaker': seg.speaker,
-            'text': seg.text,
-            'confidence': seg.confidence,
-            'camp': getattr(seg, 'camp', '未知'),
-            'stage': getattr(seg, 'stage', '未知阶段'),
-            'stage_name': getattr(seg, 'stage_name', '')
-        }
-        for seg in segments
-    ]
+    return [segment_to_dict(seg) for seg in segments]
+
+class ProgressReporter:
+    """
+    把转录进度回调写入任务记录；同一步骤内最多每 TRANSCRIBE_PROGRESS_INTERVAL_S 秒提交一次。
+    每次只执行一条更新两列的UPDATE并立即提交，不先读取整行，写锁只持有一条语句的时间
+    """
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.last_commit = 0.0
+        self.last_step = None
+
+    def __call__(self, current, total, description):
+        now = time.time()
+        if current == self.last_step and now - self.last_commit < Config.TRANSCRIBE_PROGRESS_INTERVAL_S:
+            return
+        self.last_step = current
+        self.last_commit = now
+        # 最后一步（格式化和保存）完成前不报告100%
+        TranscriptionTask.query.filter_by(id=self.task_id).update({
+            'progress': min(99, int(current / total * 100)),
+            'progress_message': description[:200],
+        }, synchronize_session=False)
+        db.session.commit()
+
+
+# 等待开始的状态；pending 为引入队列前创建的任务
+WAITING_STATUSES = ('queued', 'pending')
+# 有文字稿可读取的状态；partial 为流式转录中途断开或出错时已保存的部分结果
+READABLE_STATUSES = ('completed', 'partial')
+
+
+def claim_task(task_id: str) -> bool:
+    """
+    把等待中的任务改为处理中，只有一方能成功：排队的任务可能同时被工作线程和 /stream 开始
+
+    Returns:
+        是否由调用方开始处理
+    """
+    claimed = TranscriptionTask.query.filter(
+        TranscriptionTask.id == task_id,
+        TranscriptionTask.status.in_(WAITING_STATUSES)
+    ).update({
+        'status': 'processing',
+        'progress': 0,
+        'progress_message': '开始转录',
+        'worker': worker_id(),
+    }, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def run_transcription_task(app, task_id: str):
+    """在工作线程中转录任务的音频，保存文字稿和转录段，失败时记录错误"""
+    with app.app_context():
+        if not claim_task(task_id):
+            logger.info(f"转录任务已被其他请求开始或不存在，跳过: {task_id}")
+            db.session.remove()
+            return
+        transcription = TranscriptionTask.query.get(task_id)
+        try:
+            transcribe_service = get_transcribe_service()
+            segments = transcribe_service.transcribe_audio(transcription.audio_path, ProgressReporter(task_id))
+
+            # 生成转录文本文件
+            if transcription.transcript_path and os.path.exists(transcription.transcript_path):
+                os.remove(transcription.transcript_path)
+            output_path = os.path.join(os.path.dirname(transcription.audio_path), f"{task_id}_transcript.txt")
+            transcribe_service.save_transcription_to_file(segments, output_path)
+
+            # 保存转录结果
+            transcription.transcript_path = output_path
+            transcription.segments = str(segments_to_dict(segments))
+            transcription.status = 'completed'
+            transcription.progress = 100
+            transcription.progress_message = '转录完成'
+            transcription.completed_at = datetime.utcnow()
+            db.session.commit()
+
+            # 清理临时文件
+            transcribe_service.cleanup_temp_files()
+            logger.info(f"转录任务完成: {task_id}，共 {len(segments)} 段")
+        except Exception as e:
+            logger.error(f"转录失败: {str(e)}")
+            db.session.rollback()
+            transcription.status = 'failed'
+            transcription.error_message = str(e)
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def recover_transcription_tasks(app):
+    """
+    恢复上次进程退出时未完成的任务：队列只在内存中，排队中且音频仍在的任务重新入队，
+    执行中但所在进程已退出的任务标记为失败，可通过 /retry 重试
+    """
+    with app.app_context():
+        try:
+            tasks = TranscriptionTask.query.filter(
+                TranscriptionTask.status.in_(('queued', 'processing'))
+            ).order_by(TranscriptionTask.created_at).all()
+        except SQLAlchemyError as e:
+            # 数据库尚未迁移等
+            logger.warning(f"恢复转录任务失败: {str(e)}")
+            db.session.rollback()
+            return
+        requeued = []
+        failed = 0
+        for task in tasks:
+            if task.status == 'processing':
+                # 本进程尚未开始任何任务，记录为本进程号的任务来自进程号相同的上一个进程
+                if task.worker != worker_id() and worker_alive(task.worker):
+                    continue
+                task.error_message = '服务重启，转录中断'
+            elif task.audio_path and os.path.exists(task.audio_path):
+                requeued.append(task.id)
+                continue
+            else:
+                task.error_message = 'Audio file not found'
+            task.status = 'failed'
+            failed += 1
+        db.session.commit()
+        for task_id in requeued:
+            TRANSCRIBE_QUEUE.submit(task_id, run_transcription_task, app, task_id)
+        if requeued or failed:
+            logger.info(f"恢复转录任务：重新入队 {len(requeued)} 个，标记失败 {failed} 个")
+
+
+_recovery_lock = threading.Lock()
+_recovered = False
+
+
+def init_transcription_recovery(app):
+    """第一个请求到达时恢复未完成的任务（flask db 等命令行和重载器的父进程不会执行）"""
+
+    @app.before_request
+    def _recover_transcription_tasks():
+        global _recovered
+        if _recovered:
+            return
+        with _recovery_lock:
+            if _recovered:
+                return
+            _recovered = True
+        recover_transcription_tasks(app)
+
+
+def enqueue_transcription(task_id: str):
+    """把任务放入转录队列，需在请求中调用"""
+    TRANSCRIBE_QUEUE.submit(task_id, run_transcription_task, current_app._get_current_object(), task_id)
+
+
+def accepted_response(task_id: str, message: str):
+    """202响应：任务已入队，通过 /status/<task_id> 查询进度"""
+    status_url = f"{transcribe_bp.url_prefix}/status/{task_id}"
+    response = jsonify({
+        'success': True,
+        'task_id': task_id,
+        'status': 'queued',
+        'message': message,
+        'status_url': status_url,
+        'queue_depth': TRANSCRIBE_QUEUE.depth()
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
 
 @transcribe_bp.route('/health', methods=['GET'])
 def health_check():
@@ -66,10 +249,10 @@ def health_check():
 @transcribe_bp.route('/upload', methods=['POST'])
 def upload_audio():
     """
-    上传音频文件并开始转录
+    上传音频文件，保存后将转录任务入队
     
     Returns:
-        JSON响应包含任务ID和状态
+        202，JSON响应包含任务ID和查询进度的地址
     """
     try:
         # 检查是否有文件
@@ -93,6 +276,14 @@ def upload_audio():
                 'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
             }), 400
         
+        # 可选：关联到已有项目，之后按项目导出文字稿
+        project_id = request.form.get('project_id') or None
+        if project_id and not Video.query.get(project_id):
+            return jsonify({
+                'success': False,
+                'error': f'Project not found: {project_id}'
+            }), 404
+        
         # 生成唯一文件名
         file_id = str(uuid.uuid4())
         filename = secure_filename(file.filename)
@@ -111,55 +302,20 @@ def upload_audio():
         transcription = TranscriptionTask(
             id=file_id,
             original_filename=filename,
+            project_id=project_id,
             audio_path=audio_path,
-            status='pending',
+            status='queued',
+            progress=0,
+            progress_message='排队中',
             created_at=datetime.utcnow()
         )
         
         db.session.add(transcription)
         db.session.commit()
         
-        # 异步开始转录（在实际部署中应该使用Celery等任务队列）
-        try:
-            transcribe_service = get_transcribe_service()
-            segments = transcribe_service.transcribe_audio(audio_path)
-            
-            # 保存转录结果
-            transcription.status = 'completed'
-            transcription.completed_at = datetime.utcnow()
-            transcription.segments = str(segments_to_dict(segments))
-            
-            # 生成转录文本文件
-            output_filename = f"{file_id}_transcript.txt"
-            output_path = os.path.join(upload_dir, output_filename)
-            transcribe_service.save_transcription_to_file(segments, output_path)
-            transcription.transcript_path = output_path
-            
-            db.session.commit()
-            
-            # 清理临时文件
-            transcribe_service.cleanup_temp_files()
-            
-            return jsonify({
-                'success': True,
-                'task_id': file_id,
-                'status': 'completed',
-                'message': 'Transcription completed successfully',
-                'segments_count': len(segments)
-            })
-            
-        except Exception as e:
-            logger.error(f"转录失败: {str(e)}")
-            transcription.status = 'failed'
-            transcription.error_message = str(e)
-            db.session.commit()
-            
-            return jsonify({
-                'success': False,
-                'task_id': file_id,
-                'status': 'failed',
-                'error': str(e)
-            }), 500
+        # 入队后立即返回，转录在后台工作线程中执行
+        enqueue_transcription(file_id)
+        return accepted_response(file_id, 'Transcription queued')
         
     except Exception as e:
         logger.error(f"上传处理失败: {str(e)}")
@@ -250,12 +406,14 @@ def get_transcription_status(task_id):
             'success': True,
             'task_id': task_id,
             'status': transcription.status,
+            'progress': transcription.progress or 0,
+            'progress_message': transcription.progress_message,
             'original_filename': transcription.original_filename,
             'created_at': transcription.created_at.isoformat() if transcription.created_at else None,
             'completed_at': transcription.completed_at.isoformat() if transcription.completed_at else None
         }
         
-        if transcription.status == 'completed':
+        if transcription.status in READABLE_STATUSES:
             # 解析转录段
             import ast
             segments_data = ast.literal_eval(transcription.segments) if transcription.segments else []
@@ -265,13 +423,16 @@ def get_transcription_status(task_id):
             # 生成完整转录文本
             full_text = ""
             for segment in segments_data:
+                if segment.get('start_time_ms') is None:
+                    full_text += f"{segment['text']}\n"
+                    continue
                 start_min = segment['start_time_ms'] // 1000 // 60
                 start_sec = segment['start_time_ms'] // 1000 % 60
                 full_text += f"[{start_min:02d}:{start_sec:02d}] {segment['speaker']}: {segment['text']}\n"
             
             response['full_text'] = full_text
             
-        elif transcription.status == 'failed':
+        if transcription.status in ('failed', 'partial'):
             response['error_message'] = transcription.error_message
         
         return jsonify(response)
@@ -283,6 +444,78 @@ def get_transcription_status(task_id):
             'error': str(e)
         }), 500
 
+def resolve_transcript(project_id: str):
+    """
+    按项目ID或BV号精确查找文字稿：优先使用关联到该项目的最新已完成转录任务，没有时使用最新的部分结果，
+    其次是项目自身的文字稿
+
+    Returns:
+        (转录任务或None, 文字稿路径或None)
+    """
+    video = Video.query.filter(or_(Video.id == project_id, Video.bv_id == project_id)).first()
+    keys = {project_id, video.id} if video else {project_id}
+    transcription = TranscriptionTask.query.filter(
+        TranscriptionTask.project_id.in_(keys),
+        TranscriptionTask.status.in_(READABLE_STATUSES)
+    ).order_by(
+        (TranscriptionTask.status == 'completed').desc(),
+        TranscriptionTask.created_at.desc()
+    ).first()
+    if transcription and transcription.transcript_path and os.path.exists(transcription.transcript_path):
+        return transcription, transcription.transcript_path
+    if video:
+        path = os.path.join(current_app.root_path, '..', 'temp', video.id, 'transcript.txt')
+        if os.path.exists(path):
+            return transcription, path
+    return transcription, None
+
+@transcribe_bp.route('/export/<project_id>', methods=['GET'])
+def export_transcript(project_id):
+    """
+    流式导出文字稿
+    
+    Args:
+        project_id: 项目ID或BV号
+    
+    Query:
+        format: srt / vtt / jsonl / txt，默认 srt
+    
+    Returns:
+        文字稿文件（附件）；txt 和已导出过的文字稿带 Content-Length，其他格式第一次导出时为分块传输
+    """
+    fmt = (request.args.get('format') or 'srt').lower()
+    if fmt not in transcript_export.FORMATS:
+        return jsonify({
+            'success': False,
+            'error': f'Unsupported format: {fmt}. Supported: {", ".join(transcript_export.FORMATS)}'
+        }), 400
+    
+    _, path = resolve_transcript(project_id)
+    if not path:
+        return jsonify({
+            'success': False,
+            'error': 'Transcript not found for this project'
+        }), 404
+    
+    try:
+        length, chunks = transcript_export.export_stream(fmt, path)
+    except (OSError, UnicodeDecodeError) as e:
+        logger.error(f"导出文字稿失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    content_type, extension = transcript_export.FORMATS[fmt]
+    filename = f"{project_id}_transcript{extension}"
+    headers = {
+        'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}",
+        'Cache-Control': 'no-cache'
+    }
+    if length is not None:
+        headers['Content-Length'] = str(length)
+    return Response(chunks, content_type=content_type, headers=headers)
+
 @transcribe_bp.route('/download/<project_id>', methods=['GET'])
 def download_transcript(project_id):
     """
@@ -295,37 +528,22 @@ def download_transcript(project_id):
         转录文本文件
     """
     try:
-        # 查找项目对应的转录任务
-        transcription = TranscriptionTask.query.filter(
-            TranscriptionTask.original_filename.like(f'%{project_id}%')
-        ).first()
-        
-        if not transcription:
+        # 按项目精确查找文字稿（索引查询），大文件请使用 /export/<project_id> 流式下载
+        transcription, path = resolve_transcript(project_id)
+        if not path:
             return jsonify({
                 'success': False,
                 'error': 'Transcription not found for this project'
             }), 404
         
-        if transcription.status != 'completed':
-            return jsonify({
-                'success': False,
-                'error': 'Transcription not completed'
-            }), 400
-        
-        if not transcription.transcript_path or not os.path.exists(transcription.transcript_path):
-            return jsonify({
-                'success': False,
-                'error': 'Transcript file not found'
-            }), 404
-        
         # 返回文件内容
-        with open(transcription.transcript_path, 'r', encoding='utf-8') as f:
+        with open(path, 'r', encoding='utf-8') as f:
             content = f.read()
         
         return jsonify({
             'success': True,
             'project_id': project_id,
-            'task_id': transcription.id,
+            'task_id': transcription.id if transcription else None,
             'filename': f"{project_id}_transcript.txt",
             'content': content
         })
@@ -367,7 +585,7 @@ def list_transcriptions():
                 'completed_at': transcription.completed_at.isoformat() if transcription.completed_at else None
             }
             
-            if transcription.status == 'completed' and transcription.segments:
+            if transcription.status in READABLE_STATUSES and transcription.segments:
                 import ast
                 segments_data = ast.literal_eval(transcription.segments)
                 task['segments_count'] = len(segments_data)
@@ -439,7 +657,7 @@ def delete_transcription(task_id):
 @transcribe_bp.route('/retry/<task_id>', methods=['POST'])
 def retry_transcription(task_id):
     """
-    重试失败的转录任务
+    重试失败或只完成部分（partial）的转录任务
     
     Args:
         task_id: 任务ID
@@ -455,10 +673,10 @@ def retry_transcription(task_id):
                 'error': 'Task not found'
             }), 404
         
-        if transcription.status != 'failed':
+        if transcription.status not in ('failed', 'partial'):
             return jsonify({
                 'success': False,
-                'error': 'Only failed tasks can be retried'
+                'error': 'Only failed or partial tasks can be retried'
             }), 400
         
         if not transcription.audio_path or not os.path.exists(transcription.audio_path):
@@ -467,52 +685,15 @@ def retry_transcription(task_id):
                 'error': 'Audio file not found'
             }), 404
         
-        # 重置状态
-        transcription.status = 'pending'
+        # 重置状态后重新入队
+        transcription.status = 'queued'
+        transcription.progress = 0
+        transcription.progress_message = '排队中'
         transcription.error_message = None
         db.session.commit()
         
-        # 重新转录
-        try:
-            transcribe_service = get_transcribe_service()
-            segments = transcribe_service.transcribe_audio(transcription.audio_path)
-            
-            # 更新结果
-            transcription.status = 'completed'
-            transcription.completed_at = datetime.utcnow()
-            transcription.segments = str(segments_to_dict(segments))
-            
-            # 更新转录文件
-            if transcription.transcript_path and os.path.exists(transcription.transcript_path):
-                os.remove(transcription.transcript_path)
-            
-            output_filename = f"{task_id}_transcript.txt"
-            output_path = os.path.join(os.path.dirname(transcription.audio_path), output_filename)
-            transcribe_service.save_transcription_to_file(segments, output_path)
-            transcription.transcript_path = output_path
-            
-            db.session.commit()
-            
-            return jsonify({
-                'success': True,
-                'task_id': task_id,
-                'status': 'completed',
-                'message': 'Transcription retried successfully',
-                'segments_count': len(segments)
-            })
-            
-        except Exception as e:
-            logger.error(f"重试转录失败: {str(e)}")
-            transcription.status = 'failed'
-            transcription.error_message = str(e)
-            db.session.commit()
-            
-            return jsonify({
-                'success': False,
-                'task_id': task_id,
-                'status': 'failed',
-                'error': str(e)
-            }), 500
+        enqueue_transcription(task_id)
+        return accepted_response(task_id, 'Transcription retry queued')
         
     except Exception as e:
         logger.error(f"重试失败: {str(e)}")
@@ -525,7 +706,7 @@ def retry_transcription(task_id):
 
 @transcribe_bp.route('/stream/<task_id>', methods=['GET'])
 def stream_transcription(task_id):
-    """流式转录API，实时返回转录结果"""
+    """流式转录API，实时返回转录结果；接管排队中的任务（上传或重试后立即请求），不再等待工作线程"""
     try:
         transcription = TranscriptionTask.query.get(task_id)
         if not transcription:
@@ -534,10 +715,10 @@ def stream_transcription(task_id):
                 'error': 'Task not found'
             }), 404
         
-        if transcription.status != 'pending':
+        if transcription.status not in WAITING_STATUSES:
             return jsonify({
                 'success': False,
-                'error': 'Task is not in pending status'
+                'error': 'Task is not queued'
             }), 400
         
         if not transcription.audio_path or not os.path.exists(transcription.audio_path):
@@ -546,84 +727,100 @@ def stream_transcription(task_id):
                 'error': 'Audio file not found'
             }), 404
         
+        # 从队列中接管任务，工作线程之后取到该任务时会跳过
+        if not claim_task(task_id):
+            return jsonify({
+                'success': False,
+                'error': 'Task has already been started'
+            }), 409
+        
+        # 流式转录过程中会逐段写入文字稿文件与数据库，不再在结束后重复转录
+        output_path = os.path.join(os.path.dirname(transcription.audio_path), f"{task_id}_transcript.txt")
+        persist_every = 20
+
         def generate():
-            """生成器函数，实时返回转录结果"""
+            """生成器函数，实时返回转录结果，并增量持久化已完成的转录段"""
+            collected = []
+            completed = False
+            error_message = None
             try:
-                # 更新状态为处理中
-                transcription.status = 'processing'
+                transcription.transcript_path = output_path
                 db.session.commit()
                 
                 transcribe_service = get_transcribe_service()
                 
-                # 进度回调函数
+                # 进度回调只记录事件，由生成器在下一次产出时发送
+                pending_progress = []
+
                 def progress_callback(current, total, description):
-                    progress_data = {
+                    pending_progress.append({
                         'type': 'progress',
                         'current': current,
                         'total': total,
                         'description': description,
                         'percentage': int((current / total) * 100)
-                    }
-                    yield f"data: {json.dumps(progress_data, ensure_ascii=False)}\n\n"
+                    })
+
+                def drain_progress():
+                    while pending_progress:
+                        yield f"data: {json.dumps(pending_progress.pop(0), ensure_ascii=False)}\n\n"
                 
                 # 开始流式转录
-                segments_count = 0
-                for segment in transcribe_service.transcribe_audio_stream(
-                    transcription.audio_path, 
-                    progress_callback
-                ):
-                    segments_count += 1
-                    segment_data = {
-                        'type': 'segment',
-                        'segment': {
-                            'start_time_ms': segment.start_time_ms,
-                            'end_time_ms': segment.end_time_ms,
-                            'speaker': segment.speaker,
-                            'text': segment.text,
-                            'confidence': segment.confidence,
-                            'camp': getattr(segment, 'camp', '未知'),
-                            'stage': getattr(segment, 'stage', '未知阶段'),
-                            'stage_name': getattr(segment, 'stage_name', '')
-                        },
-                        'count': segments_count
-                    }
-                    yield f"data: {json.dumps(segment_data, ensure_ascii=False)}\n\n"
-                
-                # 转录完成
-                transcription.status = 'completed'
-                transcription.completed_at = datetime.utcnow()
-                transcription.segments = str(segments_to_dict(list(transcribe_service.transcribe_audio(transcription.audio_path))))
-                
-                # 生成转录文本文件
-                output_filename = f"{task_id}_transcript.txt"
-                output_path = os.path.join(os.path.dirname(transcription.audio_path), output_filename)
-                transcribe_service.save_transcription_to_file(list(transcribe_service.transcribe_audio(transcription.audio_path)), output_path)
-                transcription.transcript_path = output_path
-                
-                db.session.commit()
+                with open(output_path, 'w', encoding='utf-8') as transcript_file:
+                    stream = transcribe_service.transcribe_audio_stream(
+                        transcription.audio_path,
+                        progress_callback
+                    )
+                    for segment in stream:
+                        yield from drain_progress()
+
+                        transcript_file.write(transcribe_service.format_transcript_line(segment))
+                        transcript_file.flush()
+                        collected.append(segment_to_dict(segment))
+                        if len(collected) % persist_every == 0:
+                            transcription.segments = str(collected)
+                            db.session.commit()
+
+                        segment_data = {
+                            'type': 'segment',
+                            'segment': collected[-1],
+                            'count': len(collected)
+                        }
+                        yield f"data: {json.dumps(segment_data, ensure_ascii=False)}\n\n"
+                    yield from drain_progress()
+
+                completed = True
                 
                 # 发送完成消息
                 completion_data = {
                     'type': 'completion',
                     'message': 'Transcription completed successfully',
-                    'segments_count': segments_count
+                    'segments_count': len(collected)
                 }
                 yield f"data: {json.dumps(completion_data, ensure_ascii=False)}\n\n"
                 
             except Exception as e:
                 logger.error(f"流式转录失败: {str(e)}")
-                transcription.status = 'failed'
-                transcription.error_message = str(e)
-                db.session.commit()
-                
+                error_message = str(e)
                 error_data = {
                     'type': 'error',
                     'error': str(e)
                 }
                 yield f"data: {json.dumps(error_data, ensure_ascii=False)}\n\n"
+            finally:
+                # 无论正常结束、出错还是客户端中途断开，都保存已完成的部分结果；
+                # 有已完成的段时记为 partial，仍可通过 /download、/export 读取，可通过 /retry 重新转录
+                transcription.segments = str(collected)
+                if completed:
+                    transcription.status = 'completed'
+                    transcription.completed_at = datetime.utcnow()
+                else:
+                    transcription.status = 'partial' if collected else 'failed'
+                    transcription.error_message = error_message or f"流式转录中断，已保存 {len(collected)} 段"
+                db.session.commit()
         
         return Response(
-            generate(),
+            stream_with_context(generate()),
             mimetype='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
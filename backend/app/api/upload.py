@@ -0,0 +1,99 @@
+import os
+import uuid
+import logging
+from flask import Blueprint, jsonify, request, current_app
+from app.models.video import Video
+from app.models.db import db
+from app.api.project import allowed_file, start_local_video_processing
+from app.services import chunked_upload
+from app.services.chunked_upload import UploadError
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+upload_bp = Blueprint('upload', __name__, url_prefix='/api/projects/uploads')
+
+
+def _task_dir(upload_id: str) -> str:
+    return os.path.join(current_app.root_path, '..', 'temp', os.path.basename(upload_id))
+
+
+@upload_bp.route('', methods=['POST'])
+def create_upload():
+    """
+    创建分块上传
+
+    Body (JSON):
+        filename: 原始文件名
+        size: 文件字节数
+        title: 项目标题（可选）
+        chunk_size: 每块字节数（可选，默认 CHUNKED_UPLOAD_CHUNK_SIZE）
+
+    Returns:
+        upload_id（即项目编号）、chunk_size、total_chunks 和已收到的块
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename') or ''
+    if not allowed_file(filename):
+        return jsonify({'success': False, 'error': '不支持的文件格式'}), 400
+    try:
+        size = int(data.get('size') or 0)
+        upload_id = str(uuid.uuid4())
+        state = chunked_upload.create_upload(_task_dir(upload_id), filename, size,
+                                             title=data.get('title') or '', chunk_size=data.get('chunk_size'))
+    except (TypeError, ValueError) as e:
+        status = e.status if isinstance(e, UploadError) else 400
+        return jsonify({'success': False, 'error': str(e)}), status
+    return jsonify({'success': True, **chunked_upload.summary(state)}), 201
+
+
+@upload_bp.route('/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """查询已收到的块，断线后据此只重传缺少的块"""
+    state = chunked_upload.load_state(_task_dir(upload_id))
+    if state is None:
+        return jsonify({'success': False, 'error': '上传不存在或已过期'}), 404
+    summary = chunked_upload.summary(state)
+    return jsonify({'success': True, **summary, 'video_id': upload_id if summary['complete'] else None})
+
+
+@upload_bp.route('/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_chunk(upload_id, index):
+    """
+    上传第index块（从0开始），请求体为该块的原始字节，请求头 X-Chunk-SHA256 为其SHA-256（十六进制，必填）。
+    最后一块到达后立即创建项目并开始处理
+    """
+    task_dir = _task_dir(upload_id)
+    try:
+        state, completed_now = chunked_upload.write_chunk(
+            task_dir, index, request.stream, request.headers.get('X-Chunk-SHA256'))
+    except UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except OSError as e:
+        current_app.logger.error(f"写入上传块失败: {upload_id}/{index}, 错误: {str(e)}")
+        return jsonify({'success': False, 'error': f'写入失败: {str(e)}'}), 500
+
+    if completed_now:
+        # 使用原始文件名作为标题（支持中文）
+        video = Video(
+            id=upload_id,
+            bv_id=f"LV{upload_id[:8].upper()}",  # Local Video
+            title=state['title'] or state['filename'].rsplit('.', 1)[0],
+            bilibili_url='',
+            status='processing'
+        )
+        db.session.add(video)
+        db.session.commit()
+        start_local_video_processing(upload_id, state['video_path'], task_dir)
+        current_app.logger.info(f"分块上传完成，开始处理: {upload_id}，分块校验值: {state['chunk_tree_sha256']}")
+
+    summary = chunked_upload.summary(state)
+    return jsonify({
+        'success': True,
+        'index': index,
+        'received_count': len(summary['received']),
+        'total_chunks': summary['total_chunks'],
+        'complete': summary['complete'],
+        'video_id': upload_id if summary['complete'] else None,
+    })
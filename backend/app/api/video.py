@@ -1,9 +1,17 @@
 from flask import Blueprint, request, jsonify
 from app.services.bilibili_service import BilibiliService
+from app.services import artifact_gc
 from flask import current_app, send_from_directory
 
 video_bp = Blueprint('video', __name__)
-bili_service = BilibiliService()
+_bili_service = None
+
+def get_bili_service():
+    """第一次使用时才创建B站服务"""
+    global _bili_service
+    if _bili_service is None:
+        _bili_service = BilibiliService()
+    return _bili_service
 
 @video_bp.route('/api/videos/search', methods=['POST'])
 def search_video():
@@ -12,7 +20,7 @@ def search_video():
     if not bv_id:
         return jsonify({'error': '缺少BV号'}), 400
     try:
-        info = bili_service.get_video_info(bv_id)
+        info = get_bili_service().get_video_info(bv_id)
         return jsonify({'status': 'success', 'video_info': info})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -24,7 +32,7 @@ def download_video():
     if not bv_id:
         return jsonify({'error': '缺少BV号'}), 400
     try:
-        info = bili_service.download_video(bv_id)
+        info = get_bili_service().download_video(bv_id)
         return jsonify({'status': 'success', 'video_info': info})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -36,7 +44,7 @@ def download_audio():
     if not bv_id:
         return jsonify({'error': '缺少BV号'}), 400
     try:
-        info = bili_service.download_audio(bv_id)
+        info = get_bili_service().download_audio(bv_id)
         return jsonify({'status': 'success', 'video_info': info})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -66,10 +74,18 @@ def get_video(video_id):
             break
     
     if not video_file:
+        # 视频被 temp/ 回收删除时在后台重新下载，前端稍后重试
+        if artifact_gc.evicted_video(video_dir) and \
+                artifact_gc.restore_async(video_id, video.bv_id, video_dir, 'video'):
+            response = jsonify({'status': 'error', 'restoring': True,
+                                'message': '视频文件已被清理以节省磁盘空间，正在重新下载，请稍后刷新'})
+            response.headers['Retry-After'] = '30'
+            return response, 503
         return jsonify({'status': 'error', 'message': '视频文件不存在'}), 404
     
     full_path = os.path.join(video_dir, video_file)
     if not os.path.exists(full_path):
         return jsonify({'status': 'error', 'message': '视频文件不存在'}), 404
     
+    artifact_gc.touch(video_dir)
     return send_from_directory(video_dir, video_file)
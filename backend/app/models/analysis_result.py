@@ -5,7 +5,7 @@ class AnalysisResult(db.Model):
     __tablename__ = 'analysis_results'
     
     id = db.Column(db.Integer, primary_key=True)
-    video_id = db.Column(db.Integer, db.ForeignKey('videos.id', ondelete='CASCADE'), nullable=False)
+    video_id = db.Column(db.String(36), db.ForeignKey('videos.id', ondelete='CASCADE'), nullable=False, index=True)
     start_time_ms = db.Column(db.Integer, nullable=False)
     end_time_ms = db.Column(db.Integer, nullable=False)
     speaker = db.Column(db.String(50))
@@ -1,2 +1,51 @@
+"""
+数据库实例与SQLite连接设置。
+
+多个后台任务（下载、转录、分析）和请求会同时写入同一个SQLite文件，每个新连接都执行：
+- journal_mode=WAL：读不阻塞写、写不阻塞读，只有写入之间互斥
+- busy_timeout：遇到其他连接正在写入时等待而不是立即报 database is locked
+- synchronous=NORMAL：WAL下每次提交不再同步刷盘，只在检查点时刷盘，断电最多丢失最近几次提交
+- cache_size：每个连接的页缓存大小
+后台任务的会话随应用上下文创建和销毁（每个工作线程一个），写入应尽量短，耗时步骤之前调用 release_connection()。
+"""
+import sqlite3
+import logging
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import Config
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 db = SQLAlchemy()
+
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    """新建SQLite连接时设置并发相关的PRAGMA，其他数据库不受影响"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(Config.SQLITE_BUSY_TIMEOUT_MS)}")
+        if Config.SQLITE_JOURNAL_MODE:
+            cursor.execute(f"PRAGMA journal_mode = {Config.SQLITE_JOURNAL_MODE}")
+        if Config.SQLITE_SYNCHRONOUS:
+            cursor.execute(f"PRAGMA synchronous = {Config.SQLITE_SYNCHRONOUS}")
+        # 负数表示以KB为单位
+        cursor.execute(f"PRAGMA cache_size = -{int(Config.SQLITE_CACHE_SIZE_KB)}")
+    except sqlite3.DatabaseError as e:
+        # 数据库正被其他连接切换日志模式等情况下不影响连接使用
+        logger.warning(f"设置SQLite参数失败: {str(e)}")
+    finally:
+        cursor.close()
+
+
+def release_connection():
+    """
+    提交当前事务，连接随之还给连接池；在下载、转录、分析等耗时步骤之前调用，避免长时间占用连接。
+    会话中已加载的对象仍可使用，再次访问属性时重新取得连接读取
+    """
+    db.session.commit()
@@ -5,7 +5,7 @@ class Transcription(db.Model):
     __tablename__ = 'transcriptions'
     
     id = db.Column(db.Integer, primary_key=True)
-    video_id = db.Column(db.Integer, db.ForeignKey('videos.id', ondelete='CASCADE'), nullable=False)
+    video_id = db.Column(db.String(36), db.ForeignKey('videos.id', ondelete='CASCADE'), nullable=False, index=True)
     start_time_ms = db.Column(db.Integer, nullable=False)
     end_time_ms = db.Column(db.Integer, nullable=False)
     speaker = db.Column(db.String(50))
@@ -19,10 +19,14 @@ class TranscriptionTask(db.Model):
     
     id = db.Column(db.String(36), primary_key=True)  # UUID
     original_filename = db.Column(db.String(255), nullable=False)
+    project_id = db.Column(db.String(36), index=True)  # 所属项目（videos.id），可为空
     audio_path = db.Column(db.String(500), nullable=False)
     transcript_path = db.Column(db.String(500))
-    status = db.Column(db.String(20), default='pending')  # pending, processing, completed, failed
+    status = db.Column(db.String(20), default='pending')  # pending, queued, processing, completed, partial, failed
+    progress = db.Column(db.Integer, default=0)  # 转录进度 0-100
+    progress_message = db.Column(db.String(200))  # 当前步骤，如"正在转录第 2/4 段..."
     segments = db.Column(db.Text)  # JSON格式的转录段数据
     error_message = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    worker = db.Column(db.String(64))  # 执行该任务的进程（主机名:进程号），重启后据此找出无人处理的任务
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     completed_at = db.Column(db.DateTime)
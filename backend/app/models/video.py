@@ -11,12 +11,15 @@ class Video(db.Model):
     duration = db.Column(db.Integer)
     uploader = db.Column(db.String(100))
     bilibili_url = db.Column(db.Text, nullable=False)
-    status = db.Column(db.String(50), default='pending')  # pending, processing, completed, failed
+    status = db.Column(db.String(50), default='pending', index=True)  # pending, processing, completed, failed
     progress = db.Column(db.Integer, default=0)  # 处理进度 0-100
     error_message = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     cover = db.Column(db.String(500))  # 封面图片URL或路径
+    audio_fingerprint = db.Column(db.String(40), index=True)  # 音频子指纹的哈希，见 services/fingerprint.py
+    audio_seconds = db.Column(db.Integer, index=True)  # 音频秒数，按时长筛选指纹比对的候选
+    duplicate_of = db.Column(db.String(36), index=True)  # 音频相同的已有项目，文字稿和分析结果复用自该项目
     
     # 关联关系
     transcriptions = db.relationship('Transcription', backref='video', lazy=True, cascade='all, delete-orphan')
@@ -1,26 +1,35 @@
 import os
-from google import genai
 import json
 import time
 import logging
+import difflib
+from concurrent.futures import ThreadPoolExecutor
+from app.services.analysis_stream import AnalysisArrayParser
+from app.services.analysis_shards import (
+    SHARD_INSTRUCTIONS, build_shard_text, parse_analysis_nodes, merge_shard_results, splice_shard_results,
+    text_hash, file_hash, manifest_path_for, build_manifest, load_manifest, save_manifest, group_nodes_by_region
+)
+from app.services.transcript_utils import split_regions
+from app.services.llm_provider import get_provider, TASK_ANALYSIS
+from app.services.metrics import STAGE_DURATION, UPLOAD_BYTES, record_llm_failure
+from app.services.tracing import span, propagate
+from app.services.file_utils import atomic_write_text
+from app.services.singleflight import SingleFlight, StreamFlight
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class AnalysisService:
-    def __init__(self, gemini_api_key: str = None, max_retries: int = 3):
-        # 从配置获取API KEY
-        if gemini_api_key is None:
-            from app.config import Config
-            gemini_api_key = Config.GEMINI_API_KEY
-        
-        self.client = genai.Client(api_key=gemini_api_key)
-        self.max_retries = max_retries  # 最大重试次数
+# 同一任务、同一视图、相同输入的分析同时只执行一次，之后的请求等待并共享结果
+ANALYSIS_FLIGHT = SingleFlight('analysis')
+ANALYSIS_STREAM_FLIGHT = StreamFlight('analysis_stream')
 
-    def analyze_text(self, transcription_path: str) -> str:
-        # 你可以用OpenAI、Gemini等大模型
-        prompt = """辩论要素分析：
+# 提示词版本，记录在分析结果的来源信息中；修改提示词后递增，使已缓存的分析结果失效
+# 2: 语速改为本地计算（speech_metrics），提示词不再要求模型判断
+PROMPT_VERSION = '2'
+
+# 树形分析提示词
+TREE_ANALYSIS_PROMPT = """辩论要素分析：
            - 立论 (Affirmation): 此时发言者在阐述的主要观点
            - 攻辩 (Attack): 此时发言者对对方观点的攻击
            - 防守 (Defense): 此时发言者对自身观点的辩护
@@ -28,7 +37,6 @@ class AnalysisService:
            - 举例 (Example): 为论证某一论点举出的例子
         辩论技巧识别：
            - 类比、举例、归谬、反证等
-           - 语速分析（快/中/慢）
            - 打断时机分析（主动打断/被动打断）
         每一个论点或者发言点返回一段分析结果，例如正方一辩提出三个论点，则需返回三段如下的json，对应论点相应的时间戳。分析应尽量细节且及时，例如用什么例子攻击对方什么论点或者支持己方什么论点都需单独返回一段json。
         每一个论点或者发言点还要返回一个简短概括，最好在10个字以内。
@@ -52,41 +60,9 @@ class AnalysisService:
             }
           ]
         }"""
-        for attempt in range(self.max_retries):
-            try:
-                uploaded_file = self.client.files.upload(file=transcription_path)
-                response = self.client.models.generate_content_stream(
-                    model="gemini-2.5-pro",
-                    contents=[prompt, uploaded_file])
-                
-                # 收集流式响应
-                full_text = ""
-                for chunk in response:
-                    if chunk.text:
-                        full_text += chunk.text
-                        # 可以在这里添加进度回调或日志
-                        # logger.info(f"转录进度: {len(full_text)} 字符")
-                        print(chunk.text)
-
-                if "```json\n" in full_text:
-                    full_text = full_text.replace('```json\n','')
-                if "```json" in full_text:
-                    full_text = full_text.replace('```json','')
-                if "```" in full_text:
-                    full_text = full_text.replace('```','')
-                
-                return full_text.strip()
-                    
-            except Exception as e:
-                logger.warning(f"Gemini分析失败(第{attempt+1}次): {str(e)}")
-                if attempt == self.max_retries - 1:
-                    raise
-                time.sleep(2 ** attempt)
-        return ""
 
-    def bubble_analyze_text(self, transcription_path: str) -> str:
-        # 你可以用OpenAI、Gemini等大模型
-        prompt = """你是一个资深辩手，也是某辩论强校的教练。现在，你要带领新入队队员拆解一场辩论赛。
+# 气泡分析提示词（基于文字稿）
+BUBBLE_ANALYSIS_PROMPT = """你是一个资深辩手，也是某辩论强校的教练。现在，你要带领新入队队员拆解一场辩论赛。
         辩论要素分析：
            - 立论 (Affirmation): 此时发言者在阐述的主要观点
            - 攻辩 (Attack): 此时发言者对对方观点的攻击
@@ -95,7 +71,6 @@ class AnalysisService:
            - 举例 (Example): 为论证某一论点举出的例子
         辩论技巧识别：
            - 类比、举例、归谬、反证等
-           - 语速分析（快/中/慢）
            - 打断时机分析（主动打断/被动打断）
         每一个论点或者发言点返回一段分析结果，例如正方一辩提出三个论点，则需返回三段如下的json，对应论点相应的时间戳。分析应尽量细节且及时，例如用什么例子攻击对方什么论点或者支持己方什么论点都需单独返回一段json。
         每一个论点或者发言点还要返回一个简短概括，最好在10个字以内。
@@ -123,77 +98,9 @@ class AnalysisService:
             }
           ]
         }"""
-        for attempt in range(self.max_retries):
-            try:
-                uploaded_file = self.client.files.upload(file=transcription_path)
-                response = self.client.models.generate_content_stream(
-                    model="gemini-2.5-pro",
-                    contents=[prompt, uploaded_file])
-                
-                # 收集流式响应
-                full_text = ""
-                for chunk in response:
-                    if chunk.text:
-                        full_text += chunk.text
-                        # 可以在这里添加进度回调或日志
-                        # logger.info(f"转录进度: {len(full_text)} 字符")
-                        print(chunk.text)
-                
-                # 清理JSON字符串，删除可能存在的多余字符
-                if "```json\n" in full_text:
-                    full_text = full_text.replace('```json\n','')
-                if "```json" in full_text:
-                    full_text = full_text.replace('```json','')
-                if "```" in full_text:
-                    full_text = full_text.replace('```','')
-                return full_text.strip()
-                    
-            except Exception as e:
-                logger.warning(f"Gemini分析失败(第{attempt+1}次): {str(e)}")
-                if attempt == self.max_retries - 1:
-                    raise
-                time.sleep(2 ** attempt)
-        return ""
-
-    def analyze_transcript(self, transcript_path: str, tree_analysis_path: str, bubble_analysis_path: str):
-        """
-        分析转录文本，生成树形分析和气泡分析
-        
-        Args:
-            transcript_path: 转录文本文件路径
-            tree_analysis_path: 树形分析输出路径
-            bubble_analysis_path: 气泡分析输出路径
-        """
-        try:
-            logger.info(f"开始分析转录文本: {transcript_path}")
-            
-            # 生成树形分析
-            logger.info("生成树形分析...")
-            tree_analysis = self.analyze_text(transcript_path)
-            
-            # 保存树形分析结果
-            with open(tree_analysis_path, 'w', encoding='utf-8') as f:
-                f.write(tree_analysis)
-            logger.info(f"树形分析已保存到: {tree_analysis_path}")
-            
-            # 生成气泡分析
-            logger.info("生成气泡分析...")
-            bubble_analysis = self.bubble_analyze_text(transcript_path)
-            
-            # 保存气泡分析结果
-            with open(bubble_analysis_path, 'w', encoding='utf-8') as f:
-                f.write(bubble_analysis)
-            logger.info(f"气泡分析已保存到: {bubble_analysis_path}")
-            
-            logger.info("转录文本分析完成")
-            
-        except Exception as e:
-            logger.error(f"分析转录文本失败: {str(e)}")
-            raise
 
-    def bubble_analyze_audio(self, audio_path: str) -> str:
-        # 你可以用OpenAI、Gemini等大模型
-        prompt = """你是一个资深辩手，也是某辩论强校的教练。现在，你要带领新入队队员拆解一场辩论赛。
+# 气泡分析提示词（直接基于音频）
+AUDIO_BUBBLE_ANALYSIS_PROMPT = """你是一个资深辩手，也是某辩论强校的教练。现在，你要带领新入队队员拆解一场辩论赛。
         辩论要素分析：
            - 立论 (Affirmation): 此时发言者在阐述的主要观点
            - 攻辩 (Attack): 此时发言者对对方观点的攻击
@@ -202,7 +109,6 @@ class AnalysisService:
            - 举例 (Example): 为论证某一论点举出的例子
         辩论技巧识别：
            - 类比、举例、归谬、反证等
-           - 语速分析（快/中/慢）
            - 打断时机分析（主动打断/被动打断）
         每一个论点或者发言点返回一段分析结果，例如正方一辩提出三个论点，则需返回三段如下的json，对应论点相应的时间戳。分析应尽量细节且及时，例如用什么例子攻击对方什么论点或者支持己方什么论点都需单独返回一段json。
         每一个论点或者发言点还要返回一个简短概括，最好在10个字以内。
@@ -230,34 +136,428 @@ class AnalysisService:
             }
           ]
         }"""
+
+
+def clean_json_text(full_text: str) -> str:
+    """清理JSON字符串，删除可能存在的```标记"""
+    if "```json\n" in full_text:
+        full_text = full_text.replace('```json\n','')
+    if "```json" in full_text:
+        full_text = full_text.replace('```json','')
+    if "```" in full_text:
+        full_text = full_text.replace('```','')
+    return full_text.strip()
+
+
+class AnalysisService:
+    def __init__(self, gemini_api_key: str = None, max_retries: int = 3):
+        # 按配置的路由获取分析提供方，未传入API KEY时由提供方从配置读取
+        self.provider = get_provider(TASK_ANALYSIS, api_key=gemini_api_key)
+        self.max_retries = max_retries  # 最大重试次数
+
+    def analyze_stream(self, file_path: str, prompt: str, text: str = None):
+        """
+        流式分析，analysis数组中的每个节点一旦生成完毕就立即产出
+        
+        Args:
+            file_path: 上传给模型的文件路径（文字稿或音频）
+            prompt: 分析提示词
+            text: 直接随提示词发送的文本，提供时不上传文件
+            
+        Yields:
+            dict: {'type': 'node', 'node': 节点} 单个分析节点；
+                  {'type': 'reset'} 请求失败重试，之前产出的节点作废；
+                  {'type': 'done', 'result': 完整JSON文本} 生成结束
+        """
         for attempt in range(self.max_retries):
             try:
-                uploaded_file = self.client.files.upload(file=audio_path)
-                response = self.client.models.generate_content_stream(
-                    model="gemini-2.5-pro",
-                    contents=[prompt, uploaded_file])
+                if text is not None:
+                    content = text
+                else:
+                    size = os.path.getsize(file_path)
+                    with span('llm.upload', task=TASK_ANALYSIS, bytes=size, attempt=attempt + 1):
+                        content = self.provider.upload(file_path)
+                    UPLOAD_BYTES.inc(size, task=TASK_ANALYSIS)
                 
-                # 收集流式响应
+                # 收集流式响应，同时增量解析已闭合的节点
+                parser = AnalysisArrayParser()
                 full_text = ""
-                for chunk in response:
-                    if chunk.text:
-                        full_text += chunk.text
-                        # 可以在这里添加进度回调或日志
-                        # logger.info(f"转录进度: {len(full_text)} 字符")
-                        print(chunk.text)
-                
-                # 清理JSON字符串，删除可能存在的多余字符
-                if "```json\n" in full_text:
-                    full_text = full_text.replace('```json\n','')
-                if "```json" in full_text:
-                    full_text = full_text.replace('```json','')
-                if "```" in full_text:
-                    full_text = full_text.replace('```','')
-                return full_text.strip()
+                for chunk_text in self.provider.stream([prompt, content]):
+                    full_text += chunk_text
+                    for node in parser.feed(chunk_text):
+                        yield {'type': 'node', 'node': node}
+
+                yield {'type': 'done', 'result': clean_json_text(full_text)}
+                return
                     
             except Exception as e:
                 logger.warning(f"Gemini分析失败(第{attempt+1}次): {str(e)}")
+                record_llm_failure(TASK_ANALYSIS, e, will_retry=attempt < self.max_retries - 1)
                 if attempt == self.max_retries - 1:
                     raise
+                yield {'type': 'reset'}
                 time.sleep(2 ** attempt)
+
+    def _collect(self, file_path: str, prompt: str, text: str = None) -> str:
+        """消费流式分析，返回完整的JSON文本"""
+        # 生成过程中会yield，span放在消费方，避免追踪上下文跨越yield
+        with span('llm.generate', task=TASK_ANALYSIS, chars_in=len(text) if text is not None else None) as s:
+            attempts = 1
+            for event in self.analyze_stream(file_path, prompt, text):
+                if event['type'] == 'reset':
+                    attempts += 1
+                elif event['type'] == 'done':
+                    s.set(attempts=attempts, chars=len(event['result']))
+                    return event['result']
         return ""
+
+    def analyze_text(self, transcription_path: str) -> str:
+        return self._collect(transcription_path, TREE_ANALYSIS_PROMPT)
+
+    def bubble_analyze_text(self, transcription_path: str) -> str:
+        return self._collect(transcription_path, BUBBLE_ANALYSIS_PROMPT)
+
+    def _prompt_for(self, view: str) -> str:
+        return BUBBLE_ANALYSIS_PROMPT if view == 'bubble' else TREE_ANALYSIS_PROMPT
+
+    def _read_regions(self, transcription_path: str):
+        """读取文字稿并切分为区域（辩论阶段，或没有阶段标题时的时间窗口）"""
+        from app.config import Config
+        with open(transcription_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        return text, split_regions(text, Config.ANALYSIS_REGION_WINDOW_MS)
+
+    def _analyze_regions(self, regions, indices, view: str) -> dict:
+        """并发分析指定的区域，之前的区域压缩后作为背景，返回 {区域序号: 节点列表}"""
+        from app.config import Config
+        shard_prompt = self._prompt_for(view) + SHARD_INSTRUCTIONS
+
+        def analyze_shard(index):
+            shard_text = build_shard_text(regions, index, Config.ANALYSIS_CONTEXT_CHARS)
+            with span('analysis_shard', index=index, region=regions[index][0]):
+                nodes = parse_analysis_nodes(self._collect(None, shard_prompt, shard_text))
+            logger.info(f"区域 {index+1}/{len(regions)}（{regions[index][0] or '时间窗口'}）分析完成，{len(nodes)} 个节点")
+            return nodes
+
+        workers = max(1, min(Config.ANALYSIS_MAX_WORKERS, len(indices)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(propagate(analyze_shard), index) for index in indices]
+            return dict(zip(indices, (future.result() for future in futures)))
+
+    def _analyze_sharded(self, transcription_path: str, view: str):
+        """分片分析，返回 (JSON文本, 清单)"""
+        text, regions = self._read_regions(transcription_path)
+        if len(regions) < 2:
+            logger.info("文字稿只有一个区域，退回整场分析")
+            result = self._collect(transcription_path, self._prompt_for(view))
+            return result, build_manifest(text, regions, [None] * len(regions))
+
+        logger.info(f"分片分析: 共 {len(regions)} 个区域")
+        results = self._analyze_regions(regions, list(range(len(regions))), view)
+        shard_nodes = [results[index] for index in range(len(regions))]
+        merged = merge_shard_results(shard_nodes, [name for name, _ in regions])
+        manifest = build_manifest(text, regions, [[node['analysis_id'] for node in nodes] for nodes in shard_nodes])
+        return json.dumps({'analysis': merged}, ensure_ascii=False, indent=2), manifest
+
+    def analyze_text_sharded(self, transcription_path: str, view: str = 'tree') -> str:
+        """
+        分片分析：按辩论阶段切分文字稿，各阶段并发分析（之前阶段压缩后作为背景），
+        再合并结果并全局重新编号，总耗时取决于最长的阶段而不是整场辩论
+        
+        Args:
+            transcription_path: 文字稿路径
+            view: tree 或 bubble
+            
+        Returns:
+            合并后的JSON文本
+        """
+        return self._analyze_sharded(transcription_path, view)[0]
+
+    def _analyze_incremental(self, transcription_path: str, output_path: str, view: str):
+        """增量分析，返回 (JSON文本, 清单)"""
+        manifest = load_manifest(manifest_path_for(output_path))
+        if manifest is None or not manifest.get('regions') or not os.path.exists(output_path):
+            logger.info("没有可比对的上次分析记录，执行完整分片分析")
+            return self._analyze_sharded(transcription_path, view)
+        previous = manifest.get('provenance') or {}
+        if previous and previous.get('prompt_version') != PROMPT_VERSION:
+            # 未变化区域的旧节点来自旧提示词，不能与新结果拼接
+            logger.info("提示词版本已变化，执行完整分片分析")
+            return self._analyze_sharded(transcription_path, view)
+
+        with open(output_path, 'r', encoding='utf-8') as f:
+            existing_text = f.read()
+        text, regions = self._read_regions(transcription_path)
+        if manifest.get('transcript_hash') == text_hash(text):
+            logger.info("文字稿未变化，沿用已有分析结果")
+            return existing_text, manifest
+
+        existing = parse_analysis_nodes(existing_text)
+        old_groups = group_nodes_by_region(existing, manifest)
+        old_hashes = [region['hash'] for region in manifest['regions']]
+        new_hashes = [text_hash(region_text) for _, region_text in regions]
+
+        # 未变化的区域保留原节点；被修改/新增的区域重新分析，新节点使用新编号
+        entries = [None] * len(regions)
+        changed = []
+        matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                for k in range(i2 - i1):
+                    entries[j1 + k] = {'name': regions[j1 + k][0], 'nodes': old_groups[i1 + k], 'fresh': False}
+                continue
+            for j in range(j1, j2):
+                entries[j] = {'name': regions[j][0], 'nodes': [], 'fresh': True}
+                changed.append(j)
+
+        logger.info(f"增量分析: {len(changed)}/{len(regions)} 个区域发生变化，仅重新分析这些区域")
+        results = self._analyze_regions(regions, changed, view) if changed else {}
+        for index in changed:
+            entries[index]['nodes'] = results[index]
+
+        numeric_ids = [int(str(node['analysis_id'])) for node in existing if str(node.get('analysis_id')).isdigit()]
+        merged, _ = splice_shard_results(entries, max(numeric_ids, default=0) + 1)
+        manifest = build_manifest(text, regions, [[node['analysis_id'] for node in entry['nodes']] for entry in entries])
+        return json.dumps({'analysis': merged}, ensure_ascii=False, indent=2), manifest
+
+    def analyze_incremental(self, transcription_path: str, output_path: str, view: str = 'tree') -> str:
+        """
+        增量分析：与上次分析时的文字稿逐区域比对，只重新分析发生变化的阶段/时间窗口，
+        并拼接回已有结果，未变化区域的节点编号保持不变
+        
+        Args:
+            transcription_path: 文字稿路径
+            output_path: 已有的分析结果路径（tree.json / bubble.json），其清单记录了上次的区域
+            view: tree 或 bubble
+            
+        Returns:
+            拼接后的JSON文本
+        """
+        return self._analyze_incremental(transcription_path, output_path, view)[0]
+
+    def resolve_mode(self, transcription_path: str, mode: str = None) -> str:
+        """确定分析模式：single / sharded / incremental，auto按文字稿长度选择"""
+        from app.config import Config
+        mode = mode or Config.ANALYSIS_MODE
+        if mode == 'auto':
+            with open(transcription_path, 'r', encoding='utf-8') as f:
+                length = len(f.read())
+            mode = 'sharded' if length > Config.ANALYSIS_SHARD_THRESHOLD_CHARS else 'single'
+        return mode
+
+    def provenance(self, input_hash: str, view: str, source: str = 'transcript') -> dict:
+        """分析结果的来源信息：输入内容哈希、提示词版本和模型，全部相同时可直接复用已有结果"""
+        return {
+            'source': source,
+            'input_hash': input_hash,
+            'view': view,
+            'prompt_version': PROMPT_VERSION,
+            'provider': self.provider.name,
+            'model': self.provider.model,
+        }
+
+    def transcript_provenance(self, transcription_path: str, view: str) -> dict:
+        with open(transcription_path, 'r', encoding='utf-8') as f:
+            return self.provenance(text_hash(f.read()), view)
+
+    def cached_result(self, output_path: str, provenance: dict):
+        """output_path 已由完全相同的输入、提示词版本和模型生成时返回其内容，否则返回None"""
+        manifest = load_manifest(manifest_path_for(output_path))
+        if not manifest or manifest.get('provenance') != provenance or not os.path.exists(output_path):
+            return None
+        with open(output_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def _flight_key(self, output_path: str, provenance: dict) -> tuple:
+        """请求合并的键：结果文件（即任务和视图）、输入哈希和模型"""
+        return (os.path.normpath(os.path.abspath(output_path)), provenance['input_hash'],
+                provenance['provider'], provenance['model'])
+
+    def _cached_or_none(self, output_path: str, provenance: dict, force: bool):
+        if force:
+            return None
+        cached = self.cached_result(output_path, provenance)
+        if cached is not None:
+            logger.info(f"输入、提示词版本和模型均未变化，直接返回已有分析结果: {output_path}")
+        return cached
+
+    def analyze_to_file(self, transcription_path: str, output_path: str, view: str = 'tree', mode: str = None,
+                        force: bool = False) -> str:
+        """
+        生成分析并写入output_path，同时写入记录文字稿区域和来源信息的清单文件，供之后增量分析和复用。
+        相同任务、视图和输入的分析正在进行时（包括流式分析），等待并返回其结果
+        
+        Args:
+            force: 为True时忽略已缓存的结果，重新生成
+            
+        Returns:
+            分析结果JSON文本
+        """
+        provenance = self.transcript_provenance(transcription_path, view)
+        cached = self._cached_or_none(output_path, provenance, force)
+        if cached is not None:
+            return cached
+
+        def run():
+            # 等待锁期间上一次相同的分析可能刚刚写完
+            cached = self._cached_or_none(output_path, provenance, force)
+            if cached is not None:
+                return cached
+            resolved_mode = self.resolve_mode(transcription_path, mode)
+            with STAGE_DURATION.time(stage='analysis'), span('analysis', view=view, mode=resolved_mode):
+                if resolved_mode == 'incremental':
+                    result, manifest = self._analyze_incremental(transcription_path, output_path, view)
+                elif resolved_mode == 'sharded':
+                    result, manifest = self._analyze_sharded(transcription_path, view)
+                else:
+                    result = self._collect(transcription_path, self._prompt_for(view))
+                    manifest = None
+            return self.save_result(transcription_path, output_path, result, manifest, view)
+
+        return ANALYSIS_FLIGHT.do(self._flight_key(output_path, provenance), run)[0]
+
+    def speech_annotator(self, transcription_path: str, audio_path: str = None):
+        """
+        读取或计算文字稿对应的本地语速指标，用于附加到分析节点上；计算失败时返回None，不影响分析
+        """
+        # numpy较大，只在需要时加载
+        from app.services.speech_metrics import SpeechAnnotator, load_or_compute
+        try:
+            return SpeechAnnotator(load_or_compute(transcription_path, audio_path))
+        except Exception as e:
+            logger.warning(f"计算语速指标失败: {str(e)}")
+            return None
+
+    def save_result(self, transcription_path: str, output_path: str, result: str, manifest: dict = None,
+                    view: str = None) -> str:
+        """
+        附加本地语速指标后写入分析结果及其清单；整场分析没有区域编号记录，之后按时间戳把节点归入区域。
+        提供view时在清单中记录来源信息，相同输入再次请求时直接复用
+
+        Returns:
+            实际写入的分析结果
+        """
+        annotator = self.speech_annotator(transcription_path)
+        if annotator is not None:
+            result = annotator.annotate_result(result)
+        if manifest is None:
+            text, regions = self._read_regions(transcription_path)
+            manifest = build_manifest(text, regions, [None] * len(regions))
+        if view is not None:
+            manifest['provenance'] = self.provenance(manifest['transcript_hash'], view)
+        atomic_write_text(output_path, result)
+        save_manifest(manifest_path_for(output_path), manifest)
+        return result
+
+    def analyze_text_stream(self, transcription_path: str, view: str = 'tree'):
+        """流式生成树形(tree)或气泡(bubble)分析，事件格式同 analyze_stream"""
+        prompt = BUBBLE_ANALYSIS_PROMPT if view == 'bubble' else TREE_ANALYSIS_PROMPT
+        return self.analyze_stream(transcription_path, prompt)
+
+    def analyze_text_stream_to_file(self, transcription_path: str, output_path: str, view: str = 'tree',
+                                    force: bool = False):
+        """
+        流式生成分析并在完成后写入output_path。已有相同输入生成的结果时直接逐个产出其节点；
+        相同分析正在进行时共享其输出，不再重复调用模型
+
+        Yields:
+            同 analyze_stream；'done' 事件另带 'cached' 字段，表示结果来自已有文件或其他请求
+        """
+        provenance = self.transcript_provenance(transcription_path, view)
+        cached = self._cached_or_none(output_path, provenance, force)
+        if cached is not None:
+            return self._replay(cached)
+
+        def produce(publish):
+            streamed = False
+
+            def run():
+                nonlocal streamed
+                cached = self._cached_or_none(output_path, provenance, force)
+                if cached is not None:
+                    return cached
+                streamed = True
+                annotator = self.speech_annotator(transcription_path)
+                with STAGE_DURATION.time(stage='analysis'), span('analysis', view=view, mode='stream'):
+                    for event in self.analyze_text_stream(transcription_path, view):
+                        if event['type'] == 'done':
+                            result = self.save_result(transcription_path, output_path, event['result'], view=view)
+                            publish({'type': 'done', 'result': result, 'cached': False})
+                            return result
+                        if event['type'] == 'node' and annotator is not None:
+                            event = {'type': 'node', 'node': annotator.annotate(event['node'])}
+                        publish(event)
+                return ""
+
+            result = ANALYSIS_FLIGHT.do(self._flight_key(output_path, provenance), run)[0]
+            if not streamed:
+                for event in self._replay(result):
+                    publish(event)
+
+        return ANALYSIS_STREAM_FLIGHT.stream(self._flight_key(output_path, provenance), produce)
+
+    @staticmethod
+    def _replay(result: str):
+        """把已完成的分析结果按流式事件逐个产出"""
+        for node in parse_analysis_nodes(result):
+            yield {'type': 'node', 'node': node}
+        yield {'type': 'done', 'result': result, 'cached': True}
+
+    def analyze_transcript(self, transcript_path: str, tree_analysis_path: str, bubble_analysis_path: str, mode: str = None,
+                           force: bool = False):
+        """
+        分析转录文本，生成树形分析和气泡分析
+        
+        Args:
+            transcript_path: 转录文本文件路径
+            tree_analysis_path: 树形分析输出路径
+            bubble_analysis_path: 气泡分析输出路径
+            mode: 分析模式（single/sharded/incremental/auto），缺省使用配置
+            force: 为True时忽略已缓存的结果
+        """
+        try:
+            logger.info(f"开始分析转录文本: {transcript_path}")
+            
+            # 生成并保存树形分析结果
+            logger.info("生成树形分析...")
+            self.analyze_to_file(transcript_path, tree_analysis_path, 'tree', mode, force)
+            logger.info(f"树形分析已保存到: {tree_analysis_path}")
+            
+            # 生成并保存气泡分析结果
+            logger.info("生成气泡分析...")
+            self.analyze_to_file(transcript_path, bubble_analysis_path, 'bubble', mode, force)
+            logger.info(f"气泡分析已保存到: {bubble_analysis_path}")
+            
+            logger.info("转录文本分析完成")
+            
+        except Exception as e:
+            logger.error(f"分析转录文本失败: {str(e)}")
+            raise
+
+    def bubble_analyze_audio(self, audio_path: str) -> str:
+        return self._collect(audio_path, AUDIO_BUBBLE_ANALYSIS_PROMPT)
+
+    def bubble_analyze_audio_to_file(self, audio_path: str, output_path: str, force: bool = False) -> str:
+        """直接基于音频生成气泡分析并写入output_path，相同音频、提示词版本和模型的结果直接复用"""
+        provenance = self.provenance(file_hash(audio_path), 'bubble', source='audio')
+        cached = self._cached_or_none(output_path, provenance, force)
+        if cached is not None:
+            return cached
+
+        def run():
+            cached = self._cached_or_none(output_path, provenance, force)
+            if cached is not None:
+                return cached
+            with STAGE_DURATION.time(stage='analysis'), span('analysis', view='bubble', mode='audio'):
+                result = self.bubble_analyze_audio(audio_path)
+            # 同目录已有文字稿时同样附加语速指标
+            transcript_path = os.path.join(os.path.dirname(audio_path), 'transcript.txt')
+            annotator = self.speech_annotator(transcript_path, audio_path) if os.path.exists(transcript_path) else None
+            if annotator is not None:
+                result = annotator.annotate_result(result)
+            atomic_write_text(output_path, result)
+            # 基于音频的结果没有文字稿区域记录，之后的增量分析会退回完整分析
+            save_manifest(manifest_path_for(output_path), {'provenance': provenance})
+            return result
+
+        return ANALYSIS_FLIGHT.do(self._flight_key(output_path, provenance), run)[0]
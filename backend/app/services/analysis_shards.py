@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import bisect
+import hashlib
+import logging
+from typing import List, Tuple
+from app.services.analysis_stream import AnalysisArrayParser
+from app.services.file_utils import atomic_write_json
+from app.services.transcript_utils import parse_stage_header, ts_to_ms, region_start_ms
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 分片分析时追加在原提示词之后的说明
+SHARD_INSTRUCTIONS = """
+        注意：本次只提供一场辩论中的【当前阶段】文字稿，之前阶段的发言摘要作为背景附在前面。
+        只为【当前阶段】中的发言生成分析，不要为之前阶段的内容生成分析。
+        本阶段的analysis_id从1开始顺序编号。target或base指向本阶段的论点时，填写本阶段的analysis_id；
+        指向之前阶段的论点时，填写该论点发言的时间戳，格式为"@[hh:mm:ss]"，例如"@[00:12:30]"。"""
+
+# target/base中可能包含多个引用，用逗号、顿号或空白分隔
+_REF_SPLIT_RE = re.compile(r'[,，、\s]+')
+
+
+def compact_stage_text(stage_text: str, line_chars: int = 40) -> str:
+    """压缩阶段文本作为背景：保留阶段标题、时间戳和发言人，每句只保留开头部分"""
+    lines = []
+    for line in stage_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if parse_stage_header(line) is None and len(line) > line_chars:
+            line = line[:line_chars] + '…'
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def build_shard_text(stages: List[Tuple[str, str]], index: int, context_chars: int) -> str:
+    """构造第index个阶段的分析输入：之前阶段的压缩背景 + 当前阶段全文"""
+    context = '\n'.join(compact_stage_text(text) for _, text in stages[:index])
+    if len(context) > context_chars:
+        # 只保留离当前阶段最近的背景
+        context = context[-context_chars:]
+        context = context[context.find('\n') + 1:]
+    parts = []
+    if context:
+        parts.append(f"【之前阶段摘要】\n{context}")
+    parts.append(f"【当前阶段】\n{stages[index][1]}")
+    return '\n\n'.join(parts)
+
+
+def parse_analysis_nodes(text: str) -> List[dict]:
+    """从模型返回的文本中取出analysis数组，整体解析失败时退回增量解析器逐个提取"""
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict) and isinstance(data.get('analysis'), list):
+            return [node for node in data['analysis'] if isinstance(node, dict)]
+    except json.JSONDecodeError:
+        pass
+    return AnalysisArrayParser().feed(text)
+
+
+def _same_type(original, value: int):
+    """保持analysis_id原有的类型（整数或字符串）"""
+    return value if isinstance(original, int) and not isinstance(original, bool) else str(value)
+
+
+class _EarlierIndex:
+    """之前阶段已合并节点的时间索引，用于解析"@[hh:mm:ss]"形式的跨阶段引用"""
+
+    def __init__(self):
+        self.times = []
+        self.ids = []
+
+    def add(self, node: dict):
+        ms = ts_to_ms(str(node.get('global_fs', '')))
+        if ms is None:
+            return
+        pos = bisect.bisect_right(self.times, ms)
+        self.times.insert(pos, ms)
+        self.ids.insert(pos, node['analysis_id'])
+
+    def lookup(self, ms: int):
+        """返回时间戳不晚于ms的最近节点，没有则返回最早的节点"""
+        if not self.times:
+            return None
+        pos = bisect.bisect_right(self.times, ms)
+        return self.ids[pos - 1] if pos > 0 else self.ids[0]
+
+
+def remap_reference(value, local_map: dict, earlier: _EarlierIndex):
+    """将分片内的target/base引用映射为全局analysis_id，无法解析的引用被丢弃"""
+    if value is None or value == "":
+        return value
+    resolved = []
+    for token in _REF_SPLIT_RE.split(str(value).strip()):
+        if not token:
+            continue
+        if token.startswith('@') or token.startswith('['):
+            ms = ts_to_ms(token)
+            target = earlier.lookup(ms) if ms is not None else None
+        else:
+            target = local_map.get(token)
+        if target is not None and str(target) not in resolved:
+            resolved.append(str(target))
+    if not resolved:
+        return ""
+    if len(resolved) == 1 and isinstance(value, int) and not isinstance(value, bool):
+        return int(resolved[0])
+    return ','.join(resolved)
+
+
+def _drop_dangling_references(nodes: List[dict]):
+    """删除target/base中指向不存在节点的引用（例如被重新分析掉的旧节点）"""
+    valid = {str(node.get('analysis_id')) for node in nodes}
+    for node in nodes:
+        for field in ('target', 'base'):
+            value = node.get(field)
+            if value is None or value == "" or isinstance(value, int):
+                if isinstance(value, int) and str(value) not in valid:
+                    node[field] = ""
+                continue
+            kept = [t for t in _REF_SPLIT_RE.split(str(value).strip()) if t and t in valid]
+            node[field] = ','.join(kept)
+
+
+def splice_shard_results(entries: List[dict], next_id: int) -> Tuple[List[dict], int]:
+    """
+    按区域顺序拼接分析结果。已有区域的节点原样保留；新分析的区域从next_id起按顺序分配新编号，
+    并映射target/base引用。被替换区域的旧编号不再使用，保留区域中指向它们的引用随之删除，
+    不会误指向新节点
+
+    Args:
+        entries: 每个区域一项 {'name': 阶段名, 'nodes': 节点列表, 'fresh': 是否为新分析结果}
+        next_id: 新节点的第一个全局编号，需大于所有保留节点的编号
+
+    Returns:
+        (拼接后的节点列表, 下一个可用编号)
+
+    Example:
+        第二个区域（旧节点2）被重新分析，保留区域中反驳2的节点3不会指向新节点：
+
+        >>> kept = [{'analysis_id': 1}, {'analysis_id': 3, 'target': 2}]
+        >>> fresh = [{'analysis_id': 1, 'target': ''}]
+        >>> merged, _ = splice_shard_results([{'nodes': kept[:1]}, {'nodes': fresh, 'fresh': True},
+        ...                                   {'nodes': kept[1:]}], 4)
+        >>> [(node['analysis_id'], node.get('target')) for node in merged]
+        [(1, None), (4, ''), (3, '')]
+    """
+    merged = []
+    earlier = _EarlierIndex()
+    for entry in entries:
+        nodes = entry['nodes']
+        if entry.get('fresh'):
+            local_map = {}
+            for node in nodes:
+                local_id = node.get('analysis_id')
+                new_id = _same_type(local_id, next_id)
+                next_id += 1
+                if local_id is not None:
+                    local_map.setdefault(str(local_id).strip(), new_id)
+                node['analysis_id'] = new_id
+            for node in nodes:
+                for field in ('target', 'base'):
+                    if field in node:
+                        node[field] = remap_reference(node[field], local_map, earlier)
+                if entry.get('name'):
+                    node.setdefault('stage', entry['name'])
+        # 本区域处理完成后才加入索引，跨区域引用只能指向之前的区域
+        for node in nodes:
+            earlier.add(node)
+        merged.extend(nodes)
+    _drop_dangling_references(merged)
+    return merged, next_id
+
+
+def merge_shard_results(shard_nodes: List[List[dict]], stage_names: List[str], start_id: int = 1) -> List[dict]:
+    """
+    合并各阶段的分析结果：按阶段顺序全局重新编号analysis_id，
+    并把target/base中的本阶段编号和跨阶段时间戳引用映射为全局编号
+
+    Args:
+        shard_nodes: 每个阶段的分析节点列表，按阶段顺序排列
+        stage_names: 对应的阶段名，写入节点的stage字段
+        start_id: 第一个节点的全局编号
+
+    Returns:
+        合并后的节点列表
+    """
+    entries = [{'name': name, 'nodes': nodes, 'fresh': True} for nodes, name in zip(shard_nodes, stage_names)]
+    merged, _ = splice_shard_results(entries, start_id)
+    return merged
+
+
+def text_hash(text: str) -> str:
+    """文本内容的sha256，忽略行尾空白差异"""
+    normalized = '\n'.join(line.rstrip() for line in text.strip().splitlines())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """文件内容的sha256，分块读取，适用于大音频文件"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_path_for(output_path: str) -> str:
+    """分析结果对应的清单文件路径，如 tree.json -> tree.manifest.json"""
+    return os.path.splitext(output_path)[0] + '.manifest.json'
+
+
+def build_manifest(transcript_text: str, regions: List[Tuple[str, str]], region_ids: List) -> dict:
+    """
+    记录本次分析所基于的文字稿区域，供之后的增量分析比对
+
+    Args:
+        transcript_text: 完整文字稿
+        regions: [(阶段名, 区域文本)]
+        region_ids: 每个区域包含的节点编号列表；整场一次分析时为None，之后按时间戳归属区域
+    """
+    return {
+        'transcript_hash': text_hash(transcript_text),
+        'regions': [
+            {
+                'name': name,
+                'hash': text_hash(text),
+                'start_ms': region_start_ms(text),
+                'ids': ids,
+            }
+            for (name, text), ids in zip(regions, region_ids)
+        ],
+    }
+
+
+def load_manifest(manifest_path: str):
+    """读取清单文件，不存在或损坏时返回None"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_manifest(manifest_path: str, manifest: dict):
+    atomic_write_json(manifest_path, manifest, indent=2)
+
+
+def group_nodes_by_region(nodes: List[dict], manifest: dict) -> List[List[dict]]:
+    """按清单把已有节点归入各区域：有编号记录时按编号，否则按时间戳落在的区域"""
+    regions = manifest['regions']
+    groups = [[] for _ in regions]
+    if all(region.get('ids') is not None for region in regions):
+        owner = {}
+        for index, region in enumerate(regions):
+            for node_id in region['ids']:
+                owner[str(node_id)] = index
+        for node in nodes:
+            index = owner.get(str(node.get('analysis_id')))
+            if index is not None:
+                groups[index].append(node)
+        return groups
+
+    starts = [region.get('start_ms') or 0 for region in regions]
+    for node in nodes:
+        ms = ts_to_ms(str(node.get('global_fs', '')))
+        index = max(bisect.bisect_right(starts, ms) - 1, 0) if ms is not None else 0
+        groups[index].append(node)
+    return groups
+
+
+def analysis_is_stale(transcript_path: str, output_path: str) -> bool:
+    """判断分析结果是否落后于文字稿：优先比对清单中的文字稿哈希，没有清单时比较修改时间"""
+    if not os.path.exists(output_path):
+        return True
+    manifest = load_manifest(manifest_path_for(output_path))
+    if manifest and manifest.get('transcript_hash'):
+        with open(transcript_path, 'r', encoding='utf-8') as f:
+            return text_hash(f.read()) != manifest['transcript_hash']
+    return os.path.getmtime(transcript_path) > os.path.getmtime(output_path)
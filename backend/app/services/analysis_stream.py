@@ -0,0 +1,94 @@
+import re
+import json
+import logging
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AnalysisArrayParser:
+    """
+    增量JSON解析器：逐块喂入模型的流式输出，"analysis"数组中的元素一旦闭合就立即解析返回。
+
+    只跟踪字符串/转义状态与括号深度，不依赖完整JSON，因此可以容忍前后的```标记或多余文字。
+    """
+
+    # 模型有时会照抄提示词示例中缺少逗号的写法，解析失败时尝试补上字段间的逗号
+    _MISSING_COMMA = re.compile(r'"\s*\n(\s*)"')
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.in_array = False
+        self.finished = False
+        self.in_string = False
+        self.escaped = False
+        self.depth = 0
+        self.element_start = None
+        self.count = 0
+
+    def feed(self, chunk: str) -> list:
+        """喂入一段文本，返回本次新闭合的分析节点列表"""
+        nodes = []
+        if self.finished:
+            return nodes
+        self.buffer += chunk
+
+        if not self.in_array:
+            match = re.search(r'"analysis"\s*:\s*\[', self.buffer)
+            if not match:
+                return nodes
+            self.in_array = True
+            self.pos = match.end()
+
+        buffer = self.buffer
+        while self.pos < len(buffer):
+            ch = buffer[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                if self.depth == 0 and ch == '{':
+                    self.element_start = self.pos
+                self.depth += 1
+            elif ch in '}]':
+                if self.depth == 0 and ch == ']':
+                    # analysis数组结束
+                    self.finished = True
+                    self.pos += 1
+                    break
+                self.depth -= 1
+                if self.depth == 0 and self.element_start is not None:
+                    node = self._decode(buffer[self.element_start:self.pos + 1])
+                    self.element_start = None
+                    if node is not None:
+                        self.count += 1
+                        nodes.append(node)
+            self.pos += 1
+
+        # 丢弃已经处理完的前缀，避免缓冲区随输出长度线性增长
+        keep_from = self.element_start if self.element_start is not None else self.pos
+        self.buffer = self.buffer[keep_from:]
+        self.pos -= keep_from
+        if self.element_start is not None:
+            self.element_start = 0
+        return nodes
+
+    def _decode(self, text: str):
+        """解析单个分析节点，失败时尝试修复缺失的逗号"""
+        for candidate in (text, self._MISSING_COMMA.sub(r'",\n\1"', text)):
+            try:
+                node = json.loads(candidate)
+                if isinstance(node, dict):
+                    return node
+            except json.JSONDecodeError:
+                continue
+        logger.warning(f"无法解析分析节点，已跳过: {text[:100]}")
+        return None
@@ -0,0 +1,397 @@
+"""
+temp/ 目录的产物回收：项目目录中的视频和音频可以重新获取（B站视频重新下载，audio.wav 从视频重新提取），
+总占用超过 ARTIFACT_GC_MAX_BYTES 或磁盘剩余空间低于 ARTIFACT_GC_MIN_FREE_BYTES 时由后台线程删除，
+直到占用降到配额的 ARTIFACT_GC_TARGET_RATIO：
+- 先删视频，再删 audio.wav（体积最大且可重新生成）；同一类中按项目最近访问时间从早到晚
+- 正在处理的项目、最近 ARTIFACT_GC_MIN_IDLE_S 秒内访问过的项目不删除
+- 文字稿、分析结果、音频指纹等其余文件从不删除；本地上传的视频只有这一份，也不删除
+- 不属于任何项目的目录（/api/transcribe 上传的音频、检索索引等）计入占用但不删除
+
+被删除的文件记录在项目目录的 evicted.json 中，播放视频、音频分析等需要时由 restore() 重新获取。
+超过 ARTIFACT_GC_UPLOAD_TTL_S 秒没有收到新块的未完成分块上传（upload.json）整个删除，客户端会重新创建上传。
+多个进程共用 temp/ 时由锁文件保证同一时间只有一个进程在回收。
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from app.config import Config
+from app.services.file_utils import atomic_write_json
+from app.services.metrics import ARTIFACT_EVICTED_BYTES, ARTIFACT_RESTORES, TEMP_DIR_BYTES
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EVICTED_FILENAME = 'evicted.json'
+ACCESS_FILENAME = '.last_access'
+LOCK_FILENAME = '.gc.lock'
+UPLOAD_STATE_FILENAME = 'upload.json'
+AUDIO_FILENAME = 'audio.wav'
+VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm'}
+# 删除顺序：数值小的先删
+KIND_ORDER = {'video': 0, 'audio': 1}
+# 锁文件超过该时长视为上次回收中途退出留下的
+_LOCK_STALE_S = 3600
+
+_project_locks_guard = threading.Lock()
+_project_locks = {}
+_restoring = set()
+_collector_started = False
+
+
+def _project_lock(task_dir: str) -> threading.RLock:
+    # 可重入：重新提取音频时会在持有锁的情况下先重新下载视频
+    with _project_locks_guard:
+        return _project_locks.setdefault(os.path.abspath(task_dir), threading.RLock())
+
+
+def disk_bytes(stat: os.stat_result) -> int:
+    """文件实际占用的磁盘空间；分块上传预分配的稀疏文件按已写入的部分计算"""
+    blocks = getattr(stat, 'st_blocks', None)
+    return blocks * 512 if blocks is not None else stat.st_size
+
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += disk_bytes(os.lstat(os.path.join(dirpath, filename)))
+            except OSError:
+                pass
+    return total
+
+
+def find_video_file(task_dir: str):
+    """项目目录中的视频文件名（video.<扩展名>），没有时返回None"""
+    try:
+        names = os.listdir(task_dir)
+    except OSError:
+        return None
+    for name in names:
+        if name.startswith('video.') and name.rsplit('.', 1)[-1].lower() in VIDEO_EXTENSIONS:
+            return name
+    return None
+
+
+def touch(task_dir: str):
+    """记录项目被访问（播放视频、重新处理等），回收时最近访问的项目最后删除"""
+    path = os.path.join(task_dir, ACCESS_FILENAME)
+    try:
+        with open(path, 'a'):
+            pass
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def last_access(task_dir: str, paths=()) -> float:
+    """项目最近被访问或写入的时间"""
+    latest = 0.0
+    for path in (os.path.join(task_dir, ACCESS_FILENAME), *paths):
+        try:
+            latest = max(latest, os.stat(path).st_mtime)
+        except OSError:
+            pass
+    return latest
+
+
+def load_evicted(task_dir: str) -> dict:
+    """文件名 -> 删除记录；不存在或损坏时返回空字典"""
+    try:
+        with open(os.path.join(task_dir, EVICTED_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def evicted_artifacts(task_dir: str) -> dict:
+    """已被删除且尚未重新获取的文件"""
+    return {name: entry for name, entry in load_evicted(task_dir).items()
+            if not os.path.exists(os.path.join(task_dir, name))}
+
+
+def is_evicted(task_dir: str, name: str) -> bool:
+    return name in evicted_artifacts(task_dir)
+
+
+def evicted_video(task_dir: str):
+    """被删除的视频文件名，没有时返回None"""
+    for name, entry in evicted_artifacts(task_dir).items():
+        if entry.get('kind') == 'video':
+            return name
+    return None
+
+
+def _update_evicted(task_dir: str, name: str, entry: dict = None):
+    """写入或移除一条删除记录，只保留仍缺失的文件"""
+    with _project_lock(task_dir):
+        evicted = load_evicted(task_dir)
+        if entry is None:
+            evicted.pop(name, None)
+        else:
+            evicted[name] = entry
+        evicted = {key: value for key, value in evicted.items()
+                   if (key == name and entry is not None) or not os.path.exists(os.path.join(task_dir, key))}
+        path = os.path.join(task_dir, EVICTED_FILENAME)
+        if evicted:
+            atomic_write_json(path, evicted, indent=2)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+# ---------- 回收 ----------
+
+def _acquire_lock(root: str):
+    path = os.path.join(root, LOCK_FILENAME)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            return path
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < _LOCK_STALE_S:
+                    return None
+                os.remove(path)
+            except OSError:
+                return None
+    return None
+
+
+def _expire_uploads(root: str, project_ids: set, now: float) -> int:
+    """删除长时间没有新块的未完成分块上传，返回释放的字节数"""
+    freed = 0
+    for name in os.listdir(root):
+        task_dir = os.path.join(root, name)
+        state_path = os.path.join(task_dir, UPLOAD_STATE_FILENAME)
+        if name in project_ids or not os.path.isfile(state_path):
+            continue
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if state.get('completed_at') is not None:
+            continue
+        video = find_video_file(task_dir)
+        active = last_access(task_dir, [state_path] + ([os.path.join(task_dir, video)] if video else []))
+        if now - active < Config.ARTIFACT_GC_UPLOAD_TTL_S:
+            continue
+        size = directory_bytes(task_dir)
+        shutil.rmtree(task_dir, ignore_errors=True)
+        freed += size
+        logger.info(f"删除过期的未完成上传: {name}，释放 {size / 1024 / 1024:.1f}MB")
+    return freed
+
+
+def _candidates(root: str, projects: dict, now: float) -> list:
+    """
+    可删除的文件：(删除顺序, 最近访问时间, 项目编号, 文件名, 种类, 字节数)
+
+    Args:
+        projects: 项目编号 -> (BV号, 状态)
+    """
+    candidates = []
+    for project_id, (bv_id, status) in projects.items():
+        task_dir = os.path.join(root, project_id)
+        if status == 'processing' or not os.path.isdir(task_dir):
+            continue
+        files = []
+        video = find_video_file(task_dir)
+        # 本地上传的视频无法重新获取
+        if video and not (bv_id or '').startswith('LV'):
+            files.append((video, 'video'))
+        # 没有视频可供重新提取时保留音频
+        if os.path.exists(os.path.join(task_dir, AUDIO_FILENAME)) and (video or evicted_video(task_dir)):
+            files.append((AUDIO_FILENAME, 'audio'))
+        if not files:
+            continue
+        accessed = last_access(task_dir, [os.path.join(task_dir, name) for name, _ in files])
+        if now - accessed < Config.ARTIFACT_GC_MIN_IDLE_S:
+            continue
+        for name, kind in files:
+            try:
+                size = disk_bytes(os.stat(os.path.join(task_dir, name)))
+            except OSError:
+                continue
+            candidates.append((KIND_ORDER[kind], accessed, project_id, name, kind, size))
+    candidates.sort()
+    return candidates
+
+
+def _bytes_to_free(total: int, free: int) -> int:
+    """超出配额时需要释放的字节数，释放到配额的 ARTIFACT_GC_TARGET_RATIO 为止，避免反复在临界点回收"""
+    ratio = Config.ARTIFACT_GC_TARGET_RATIO
+    needed = 0
+    if Config.ARTIFACT_GC_MAX_BYTES and total > Config.ARTIFACT_GC_MAX_BYTES:
+        needed = total - int(Config.ARTIFACT_GC_MAX_BYTES * ratio)
+    if Config.ARTIFACT_GC_MIN_FREE_BYTES and free < Config.ARTIFACT_GC_MIN_FREE_BYTES:
+        needed = max(needed, int(Config.ARTIFACT_GC_MIN_FREE_BYTES / ratio) - free)
+    return needed
+
+
+def collect(projects: dict, root: str = None, now: float = None) -> dict:
+    """
+    检查 temp/ 占用，超出配额时删除可重新获取的文件
+
+    Args:
+        projects: 项目编号 -> (BV号, 状态)，由调用方从数据库读取
+        root: 项目目录的上级目录，默认 UPLOAD_FOLDER
+
+    Returns:
+        本次回收的统计
+    """
+    root = root or Config.UPLOAD_FOLDER
+    now = now or time.time()
+    if not os.path.isdir(root):
+        return {'skipped': 'missing'}
+    lock_path = _acquire_lock(root)
+    if lock_path is None:
+        return {'skipped': 'locked'}
+    try:
+        expired = _expire_uploads(root, set(projects), now)
+        total = directory_bytes(root)
+        free = shutil.disk_usage(root).free
+        needed = _bytes_to_free(total, free)
+        result = {'total_bytes': total, 'free_bytes': free, 'expired_upload_bytes': expired,
+                  'needed_bytes': needed, 'evicted': [], 'evicted_bytes': 0}
+        if needed > 0:
+            for _, _, project_id, name, kind, size in _candidates(root, projects, now):
+                if result['evicted_bytes'] >= needed:
+                    break
+                task_dir = os.path.join(root, project_id)
+                # 先记录再删除，中途退出时记录里多出的文件仍存在，不会被当作已删除
+                _update_evicted(task_dir, name, {'kind': kind, 'bytes': size, 'evicted_at': now})
+                try:
+                    os.remove(os.path.join(task_dir, name))
+                except OSError as e:
+                    logger.warning(f"删除 {project_id}/{name} 失败: {str(e)}")
+                    continue
+                ARTIFACT_EVICTED_BYTES.inc(size, kind=kind)
+                result['evicted'].append(f"{project_id}/{name}")
+                result['evicted_bytes'] += size
+            if result['evicted_bytes'] < needed:
+                logger.warning(f"temp/ 占用 {total / 1024 ** 3:.2f}GB，可删除的文件不足，"
+                               f"仍需释放 {(needed - result['evicted_bytes']) / 1024 ** 3:.2f}GB")
+        TEMP_DIR_BYTES.set(total - result['evicted_bytes'])
+        if result['evicted'] or expired:
+            logger.info(f"temp/ 回收完成：删除 {len(result['evicted'])} 个文件共 "
+                        f"{result['evicted_bytes'] / 1024 / 1024:.1f}MB，过期上传 {expired / 1024 / 1024:.1f}MB")
+        return result
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def start_collector(app):
+    """在后台线程中每 ARTIFACT_GC_INTERVAL_S 秒回收一次，每个进程只启动一次"""
+    global _collector_started
+    with _project_locks_guard:
+        if _collector_started or not Config.ARTIFACT_GC_ENABLED:
+            return
+        _collector_started = True
+    from app.models.video import Video
+
+    def run():
+        # 启动后先等一会儿，避免与启动时的其他工作争抢磁盘
+        time.sleep(min(60.0, Config.ARTIFACT_GC_INTERVAL_S))
+        while True:
+            try:
+                with app.app_context():
+                    rows = Video.query.with_entities(Video.id, Video.bv_id, Video.status).all()
+                    collect({row.id: (row.bv_id, row.status) for row in rows})
+            except Exception as e:
+                logger.error(f"temp/ 回收失败: {str(e)}")
+            time.sleep(Config.ARTIFACT_GC_INTERVAL_S)
+
+    threading.Thread(target=run, name='artifact-gc', daemon=True).start()
+    logger.info(f"temp/ 回收已启动，配额 {Config.ARTIFACT_GC_MAX_BYTES / 1024 ** 3:.1f}GB，"
+                f"最少剩余 {Config.ARTIFACT_GC_MIN_FREE_BYTES / 1024 ** 3:.1f}GB")
+
+
+def init_artifact_gc(app):
+    """第一个请求到达时启动回收线程（flask db 等命令行和重载器的父进程不会启动）"""
+
+    @app.before_request
+    def _start_artifact_gc():
+        if not _collector_started:
+            start_collector(app)
+
+
+# ---------- 按需重新获取 ----------
+
+def restore(video_id: str, bv_id: str, task_dir: str, kind: str) -> str:
+    """
+    重新获取被删除的视频或音频，同一项目同时只有一个线程在获取
+
+    Args:
+        kind: 'video' 或 'audio'
+
+    Returns:
+        文件路径
+
+    Raises:
+        FileNotFoundError: 文件无法重新获取（如本地上传的视频）
+    """
+    with _project_lock(task_dir + '#restore'):
+        if kind == 'video':
+            existing = find_video_file(task_dir)
+            if existing:
+                return os.path.join(task_dir, existing)
+            name = evicted_video(task_dir)
+            if (bv_id or '').startswith('LV') or name is None:
+                raise FileNotFoundError(f"视频文件不存在且无法重新获取: {video_id}")
+            from app.services.bilibili_service import BilibiliService
+            logger.info(f"重新下载被清理的视频: {video_id} ({bv_id})")
+            BilibiliService().download_video(bv_id, video_id)
+            path = os.path.join(task_dir, find_video_file(task_dir) or name)
+            _update_evicted(task_dir, name)
+        else:
+            path = os.path.join(task_dir, AUDIO_FILENAME)
+            if os.path.exists(path):
+                return path
+            if not is_evicted(task_dir, AUDIO_FILENAME):
+                raise FileNotFoundError(f"音频文件不存在: {video_id}")
+            video_path = restore(video_id, bv_id, task_dir, 'video')
+            from app.services.audio_service import AudioService
+            logger.info(f"重新提取被清理的音频: {video_id}")
+            AudioService().extract_audio(video_path, path)
+            _update_evicted(task_dir, AUDIO_FILENAME)
+        ARTIFACT_RESTORES.inc(kind=kind)
+        touch(task_dir)
+        return path
+
+
+def restore_async(video_id: str, bv_id: str, task_dir: str, kind: str) -> bool:
+    """
+    在后台线程重新获取，已在获取中时不重复启动
+
+    Returns:
+        是否可以重新获取
+    """
+    if kind == 'video' and (bv_id or '').startswith('LV'):
+        return False
+    key = (os.path.abspath(task_dir), kind)
+    with _project_locks_guard:
+        if key in _restoring:
+            return True
+        _restoring.add(key)
+
+    def run():
+        try:
+            restore(video_id, bv_id, task_dir, kind)
+        except Exception as e:
+            logger.error(f"重新获取 {video_id} 的{kind}失败: {str(e)}")
+        finally:
+            with _project_locks_guard:
+                _restoring.discard(key)
+
+    threading.Thread(target=run, name=f"restore-{video_id[:8]}", daemon=True).start()
+    return True
@@ -1,9 +1,17 @@
 import os
 import subprocess
 import sys
+from app.services.metrics import STAGE_DURATION
+from app.services.tracing import span
 
 class AudioService:
     def extract_audio(self, video_path: str, output_path: str) -> str:
+        with STAGE_DURATION.time(stage='extract'), span('ffmpeg.extract', bytes=os.path.getsize(video_path)) as s:
+            self._extract_audio(video_path, output_path)
+            s.set(output_bytes=os.path.getsize(output_path))
+            return output_path
+
+    def _extract_audio(self, video_path: str, output_path: str) -> str:
         try:
             # 首先尝试使用 ffmpeg-python
             try:
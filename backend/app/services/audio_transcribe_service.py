@@ -1,12 +1,16 @@
 import os
 import time
 import logging
-from typing import List, Tuple
-from pydub import AudioSegment
-from google import genai
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
 import re
 import mimetypes
+from app.services.transcript_utils import parse_stage_header, speaker_camp
+from app.services.llm_provider import get_provider, TASK_TRANSCRIBE
+from app.services.hedging import HedgeBudget, hedged_call, transcribe_latency
+from app.services.metrics import STAGE_DURATION, EMPTY_SEGMENT_RETRIES, UPLOAD_BYTES, AUDIO_SECONDS, record_llm_failure
+from app.services.tracing import span
+from app.config import Config
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -31,15 +35,45 @@ class AudioTranscribeService:
             max_retries: 最大重试次数
             segment_length_ms: 音频分段长度（毫秒）
         """
-        # 增强：校验并初始化客户端
-        if not gemini_api_key:
-            raise ValueError("Gemini API Key 未配置")
-        self.client = genai.Client(api_key=gemini_api_key)
+        # 按配置的路由获取转录提供方（Gemini提供方会校验API Key）
+        self.provider = get_provider(TASK_TRANSCRIBE, api_key=gemini_api_key)
         self.max_retries = max_retries
         self.segment_length_ms = segment_length_ms
+        # 每个服务实例对应一个项目，对冲请求的额外花费按项目限额
+        self.hedge_budget = HedgeBudget(Config.HEDGE_MAX_PER_PROJECT)
         
+    def trim_silence(self, audio_path: str) -> Tuple[str, Optional[object]]:
+        """
+        转录前删去长段非人声（见 vad.trim_silence）
+
+        Returns:
+            (待切分的音频路径, 偏移表 vad.OffsetMap)；未裁剪时返回原路径和None
+        """
+        # 人声检测依赖NumPy，只在转录时加载
+        from app.services.vad import trim_silence
+        audio_dir = os.path.dirname(audio_path)
+        audio_name, audio_ext = os.path.splitext(os.path.basename(audio_path))
+        trimmed_path = os.path.join(audio_dir, f"{audio_name}_vad{audio_ext}")
+        with STAGE_DURATION.time(stage='vad'), span('vad', bytes=os.path.getsize(audio_path)) as s:
+            offset_map, duration_s = trim_silence(audio_path, trimmed_path)
+            if duration_s is not None:
+                AUDIO_SECONDS.inc(duration_s, kind='original')
+                AUDIO_SECONDS.inc(offset_map.kept_s if offset_map else duration_s, kind='sent')
+                s.set(original_s=round(duration_s, 1), sent_s=round(offset_map.kept_s if offset_map else duration_s, 1))
+        if offset_map is None:
+            return audio_path, None
+        return trimmed_path, offset_map
+
     def split_audio(self, audio_path: str) -> List[Tuple[str, int]]:
         """将长音频切分为多个小段"""
+        with STAGE_DURATION.time(stage='split'), span('split_audio', bytes=os.path.getsize(audio_path)) as s:
+            segments = self._split_audio(audio_path)
+            s.set(segments=len(segments))
+            return segments
+
+    def _split_audio(self, audio_path: str) -> List[Tuple[str, int]]:
+        # pydub导入较慢，只在真正切分音频时加载，加快后端启动
+        from pydub import AudioSegment
         audio = AudioSegment.from_file(audio_path)
         segments = []
         
@@ -92,29 +126,51 @@ class AudioTranscribeService:
         
         for attempt in range(self.max_retries):
             try:
-                uploaded_file = self.client.files.upload(file=segment_path)
-                response = self.client.models.generate_content_stream(
-                    model="gemini-2.5-pro",
-                    contents=[prompt, uploaded_file])
-                
-                # 收集流式响应
-                full_text = ""
-                for chunk in response:
-                    if chunk.text:
-                        full_text += chunk.text
-                        # 可以在这里添加进度回调或日志
-                        # logger.info(f"转录进度: {len(full_text)} 字符")
-                        print(chunk.text)
+                size = os.path.getsize(segment_path)
+                with span('llm.upload', task=TASK_TRANSCRIBE, bytes=size, attempt=attempt + 1):
+                    uploaded_file = self.provider.upload(segment_path)
+                UPLOAD_BYTES.inc(size, task=TASK_TRANSCRIBE)
+                contents = [prompt, uploaded_file]
+
+                with span('llm.generate', task=TASK_TRANSCRIBE, attempt=attempt + 1) as s:
+                    if Config.HEDGE_ENABLED:
+                        # 首字节超过近期延迟的百分位阈值时发出对冲请求，降低尾延迟
+                        deadline = transcribe_latency.deadline(
+                            Config.HEDGE_PERCENTILE, Config.HEDGE_MIN_SAMPLES, Config.HEDGE_DEFAULT_DEADLINE_S
+                        )
+                        full_text = hedged_call(
+                            lambda on_first_byte, cancelled: self._stream_text(contents, on_first_byte, cancelled),
+                            deadline, self.hedge_budget, label=os.path.basename(segment_path)
+                        )
+                    else:
+                        full_text = self._stream_text(contents)
+                    s.set(chars=len(full_text))
                 
                 return full_text.strip()
                     
             except Exception as e:
                 logger.warning(f"Gemini转写失败(第{attempt+1}次): {str(e)}")
+                record_llm_failure(TASK_TRANSCRIBE, e, will_retry=attempt < self.max_retries - 1)
                 if attempt == self.max_retries - 1:
                     raise
                 time.sleep(2 ** attempt)
         return ""
 
+    def _stream_text(self, contents: list, on_first_byte=None, cancelled=None) -> str:
+        """收集流式响应，并记录首字节延迟供对冲阈值学习"""
+        start = time.time()
+        full_text = ""
+        for text in self.provider.stream(contents):
+            if not full_text:
+                transcribe_latency.record(time.time() - start)
+                if on_first_byte:
+                    on_first_byte()
+            if cancelled and cancelled():
+                # 对冲中的另一个请求已先完成，放弃本次结果
+                return full_text
+            full_text += text
+        return full_text
+
     def from_raw_text(self, raw_txt_path: str, output_path: str = None) -> None:
         """
         读取raw.txt（多段原始Gemini返回），自动分段并本地化处理，保存为新txt。
@@ -126,6 +182,11 @@ class AudioTranscribeService:
         # import pdb; pdb.set_trace()
         with open(raw_txt_path, 'r', encoding='utf-8') as f:
             lines = f.readlines()
+        # 转录前做过人声裁剪时，原始文本中的时间戳是裁剪后音频的时间，需按偏移表换算
+        offset_map = None
+        if raw_txt_path.endswith('_raw.txt'):
+            from app.services.vad import OffsetMap
+            offset_map = OffsetMap.load(raw_txt_path[:-len('_raw.txt')] + '_offsets.json')
         # 合并所有行，按时间戳递增分段
         segments = []
         current_lines = []
@@ -170,7 +231,7 @@ class AudioTranscribeService:
                 else:
                     start_ms = 0
             all_text.append((start_ms, seg_text))
-        segments_structured = self.local_segment_and_format(all_text)
+        segments_structured = self.local_segment_and_format(all_text, offset_map)
         # 保存为新txt
         if not output_path:
             output_path = raw_txt_path.replace('.txt', '_local_from_raw.txt')
@@ -182,11 +243,12 @@ class AudioTranscribeService:
                     f.write(f"{seg.global_ts} {seg.speaker}: {seg.text}\n")
         logger.info(f"本地化处理后的转录文本已保存到: {output_path}")
 
-    def local_segment_and_format(self, all_text: List[Tuple[int, str]]) -> List[TranscriptionSegment]:
+    def local_segment_and_format(self, all_text: List[Tuple[int, str]], offset_map=None) -> List[TranscriptionSegment]:
         """
         本地分段、发言人识别、时间戳推算和格式化。
         识别发言人阵营（正反方）和辩论阶段，过滤自我介绍和主持人串场。
         支持[mm:ss]和[hh:mm:ss]两种时间戳。
+        转录的是人声裁剪后的音频时，由offset_map把时间戳换算回原音频时间。
         """
         segments = []
         # 支持[mm:ss]和[hh:mm:ss]，优先匹配hh:mm:ss
@@ -207,9 +269,9 @@ class AudioTranscribeService:
                 if not line:
                     continue
                 # 跳过阶段标题
-                stage_match = re.match(r"^###\s*\*\*?辩论阶段[：:][^*]+\*\*?$", line)
-                if stage_match:
-                    current_stage_name = re.sub(r'^###\s*\*\*?辩论阶段[：:](.+?)\*\*?$', r'\1', line).strip()
+                stage_name = parse_stage_header(line)
+                if stage_name is not None:
+                    current_stage_name = stage_name
                     segments.append(TranscriptionSegment(
                         global_ts="",
                         speaker="",
@@ -239,6 +301,8 @@ class AudioTranscribeService:
                     # 去掉content前的时间戳和说话人
                     content = re.sub(r'^\[\d{1,2}:\d{1,2}(?::\d{1,2})?\][^\s：:]+[：:]', '', content).strip()
                     global_seconds = local_seconds + start_seconds
+                    if offset_map is not None:
+                        global_seconds = int(offset_map.to_original(global_seconds))
                     gh = global_seconds // 3600
                     gm = (global_seconds % 3600) // 60
                     gs = global_seconds % 60
@@ -264,16 +328,7 @@ class AudioTranscribeService:
 
     def identify_speaker_camp(self, speaker: str) -> str:
         """识别发言人阵营（正反方）"""
-        if "正方" in speaker:
-            return "正方"
-        elif "反方" in speaker:
-            return "反方"
-        elif "主持人" in speaker or "主席" in speaker:
-            return "主持人"
-        elif "评委" in speaker:
-            return "评委"
-        else:
-            return "未知"
+        return speaker_camp(speaker)
 
     def is_intro_or_host_content(self, speaker: str, content: str) -> bool:
         """判断是否为自我介绍或主持人串场内容"""
@@ -342,125 +397,113 @@ class AudioTranscribeService:
         
         return optimized
 
+    def transcribe_segment_with_retry(self, segment_path: str, index: int) -> str:
+        """转录单个音频段，内容为空时自动重试，多次为空则主动失败"""
+        with STAGE_DURATION.time(stage='transcribe_segment'), \
+                span('transcribe_segment', index=index, bytes=os.path.getsize(segment_path)):
+            return self._transcribe_segment_with_retry(segment_path, index)
+
+    def _transcribe_segment_with_retry(self, segment_path: str, index: int) -> str:
+        try_count = 0
+        text = ""
+        while try_count < self.max_retries:
+            text = self.gemini_transcribe(segment_path)
+            if text.strip():
+                break
+            try_count += 1
+            EMPTY_SEGMENT_RETRIES.inc()
+            logger.warning(f"第{index+1}段转录内容为空，重试第{try_count}次。文件: {segment_path}")
+        if not text.strip():
+            # 多次尝试后仍为空，主动失败，避免静默完成
+            raise RuntimeError(f"第{index+1}段多次为空，终止任务。文件: {segment_path}")
+        logger.info(f"第{index+1}段转录文本长度: {len(text)}，内容预览: {text[:50]}")
+        return text
+
     def transcribe_audio_stream(self, audio_path: str, progress_callback=None):
         """
-        流式音频转录流程，支持进度回调
+        流式音频转录流程，支持进度回调。每个音频段转录完成后立即产出该段的结构化结果，
+        原始Gemini文本同步追加写入 xxx_raw.txt，整个流程只调用一次转录。
         
         Args:
             audio_path: 音频文件路径
             progress_callback: 进度回调函数，接收(当前步骤, 总步骤, 描述)参数
             
         Yields:
-            TranscriptionSegment: 转录段
+            TranscriptionSegment: 已优化的转录段
         """
         logger.info(f"开始流式转录音频: {audio_path}")
-        
+
+        audio_dir = os.path.dirname(audio_path)
+        audio_name_without_ext = os.path.splitext(os.path.basename(audio_path))[0]
+        raw_txt_path = os.path.join(audio_dir, f"{audio_name_without_ext}_raw.txt")
+        offsets_path = os.path.join(audio_dir, f"{audio_name_without_ext}_offsets.json")
+
+        segments = []
+        split_path = audio_path
         try:
-            # 1. 切分音频
+            # 1. 删去长段非人声后切分音频
             if progress_callback:
-                progress_callback(1, 5, "正在切分音频...")
-            segments = self.split_audio(audio_path)
-            
-            # 2. 分段转录
-            if progress_callback:
-                progress_callback(2, 5, "正在转录音频段...")
-            
+                progress_callback(1, 4, "正在切分音频...")
+            offset_map = None
+            if Config.VAD_ENABLED:
+                split_path, offset_map = self.trim_silence(audio_path)
+            if offset_map is not None:
+                offset_map.save(offsets_path)
+            elif os.path.exists(offsets_path):
+                os.remove(offsets_path)
+            segments = self.split_audio(split_path)
+
+            # 2. 分段转录，每段完成后立即格式化并产出
             all_text = []
-            for i, (segment_path, start_ms) in enumerate(segments):
-                try:
+            emitted = 0
+            with open(raw_txt_path, 'w', encoding='utf-8') as raw_file:
+                for i, (segment_path, start_ms) in enumerate(segments):
                     if progress_callback:
-                        progress_callback(2, 5, f"正在转录第 {i+1}/{len(segments)} 段...")
-                    
-                    text = self.gemini_transcribe(segment_path)
+                        progress_callback(2, 4, f"正在转录第 {i+1}/{len(segments)} 段...")
+
+                    text = self.transcribe_segment_with_retry(segment_path, i)
                     all_text.append((start_ms, text))
-                    
-                    # 实时返回已完成的转录段
-                    if i > 0:  # 从第二段开始，可以处理前一段的完整转录
-                        prev_start_ms = all_text[i-1][0]
-                        prev_text = all_text[i-1][1]
-                        
-                        # 处理前一段的转录
-                        prev_segments = self.local_segment_and_format([(prev_start_ms, prev_text)])
-                        for seg in prev_segments:
-                            yield seg
-                            
-                finally:
-                    # 清理临时文件
+                    raw_file.write(f"{text}\n")
+                    raw_file.flush()
                     if os.path.exists(segment_path):
                         os.remove(segment_path)
-            
-            # 3. 本地分段和格式化
-            if progress_callback:
-                progress_callback(3, 5, "正在分段和格式化...")
-            
-            # 处理最后一段
-            if all_text:
-                last_start_ms = all_text[-1][0]
-                last_text = all_text[-1][1]
-                last_segments = self.local_segment_and_format([(last_start_ms, last_text)])
-                for seg in last_segments:
-                    yield seg
-            
-            # 4. 优化转录结果（可选，如果需要的话）
+
+                    # 阶段名需要跨段延续，因此基于全部已转录文本格式化，只产出新增部分
+                    if progress_callback:
+                        progress_callback(3, 4, f"正在格式化第 {i+1}/{len(segments)} 段...")
+                    structured = self.local_segment_and_format(all_text, offset_map)
+                    for seg in self.optimize_transcription(structured[emitted:]):
+                        yield seg
+                    emitted = len(structured)
+            logger.info(f"原始Gemini转录文本已保存到: {raw_txt_path}")
+
             if progress_callback:
-                progress_callback(4, 5, "正在优化转录结果...")
-            
+                progress_callback(4, 4, "转录完成")
             logger.info("流式转录完成")
-            
+
         except Exception as e:
             logger.error(f"流式音频转录失败: {str(e)}")
             raise
+        finally:
+            # 清理未处理（失败或客户端中断）的临时音频段和裁剪后的音频
+            for segment_path, _ in segments:
+                if os.path.exists(segment_path):
+                    os.remove(segment_path)
+            if split_path != audio_path and os.path.exists(split_path):
+                os.remove(split_path)
 
-    def transcribe_audio(self, audio_path: str) -> List[TranscriptionSegment]:
-        """完整的音频转录流程（非流式，保持向后兼容）"""
+    def transcribe_audio(self, audio_path: str, progress_callback=None) -> List[TranscriptionSegment]:
+        """完整的音频转录流程（非流式，保持向后兼容），基于流式流程收集全部结果"""
         logger.info(f"开始转录音频: {audio_path}")
         
         try:
-            # 1. 切分音频
-            segments = self.split_audio(audio_path)
-            
-            # 2. 分段转录
-            all_text = []
-            raw_texts = []
-            for i, (segment_path, start_ms) in enumerate(segments):
-                try_count = 0
-                text = ""
-                # 新增：如果内容为空自动重试
-                while try_count < self.max_retries:
-                    text = self.gemini_transcribe(segment_path)
-                    if text.strip():
-                        break
-                    try_count += 1
-                    logger.warning(f"第{i+1}段转录内容为空，重试第{try_count}次。文件: {segment_path}")
-                if not text.strip():
-                    # 多次尝试后仍为空，主动失败，避免静默完成
-                    raise RuntimeError(f"第{i+1}段多次为空，终止任务。文件: {segment_path}")
-                logger.info(f"第{i+1}段转录文本长度: {len(text)}，内容预览: {text[:50]}")
-                all_text.append((start_ms, text))
-                raw_texts.append(text)
-                # 清理临时文件
-                if os.path.exists(segment_path):
-                    os.remove(segment_path)
-            audio_dir = os.path.dirname(audio_path)
-            audio_name = os.path.basename(audio_path)
-            audio_name_without_ext = os.path.splitext(audio_name)[0]
-            raw_txt_path = os.path.join(audio_dir, f"{audio_name_without_ext}_raw.txt")
-            with open(raw_txt_path, 'w', encoding='utf-8') as f:
-                for raw in raw_texts:
-                    f.write(f"{raw}\n")
-            logger.info(f"原始Gemini转录文本已保存到: {raw_txt_path}")
-            
-            # 3. 本地分段和格式化
-            logger.info("本地分段和格式化")
-            structured = self.local_segment_and_format(all_text)
-            
-            # 4. 优化转录结果
-            logger.info("优化转录结果")
-            optimized = self.optimize_transcription(structured)
+            with span('transcribe', bytes=os.path.getsize(audio_path)) as s:
+                optimized = list(self.transcribe_audio_stream(audio_path, progress_callback))
+                s.set(segments=len(optimized))
 
-            # 5. 保存转录结果
-            transcript_path=os.path.join(audio_dir,"transcript.txt")
-            self.save_transcription_to_file(optimized,transcript_path)
+            # 保存转录结果
+            transcript_path = os.path.join(os.path.dirname(audio_path), "transcript.txt")
+            self.save_transcription_to_file(optimized, transcript_path)
             
             logger.info(f"转录完成，共 {len(optimized)} 段")
             return optimized
@@ -469,6 +512,12 @@ class AudioTranscribeService:
             logger.error(f"音频转录失败: {str(e)}")
             raise
 
+    def format_transcript_line(self, segment: TranscriptionSegment) -> str:
+        """将单个转录段格式化为文字稿中的一行（阶段标题行不带时间戳）"""
+        if segment.global_ts:
+            return f"{segment.global_ts} {segment.speaker}: {segment.text}\n"
+        return f"{segment.text}\n"
+
     def save_transcription_to_file(self, segments: List[TranscriptionSegment], output_path: str):
         """
         将转录结果保存到文件
@@ -479,10 +528,7 @@ class AudioTranscribeService:
         """
         with open(output_path, 'w', encoding='utf-8') as f:
             for segment in segments:
-                if segment.global_ts:
-                    f.write(f"{segment.global_ts} {segment.speaker}: {segment.text}\n")
-                else:
-                    f.write(f"{segment.text}\n")
+                f.write(self.format_transcript_line(segment))
         
         logger.info(f"转录结果已保存到: {output_path}")
 
@@ -1,6 +1,13 @@
-import yt_dlp
 import os
 import glob
+from app.services.metrics import STAGE_DURATION
+from app.services.tracing import span
+
+def _yt_dlp():
+    """yt_dlp导入耗时约0.2秒，推迟到第一次下载或查询时加载，加快后端启动"""
+    import yt_dlp
+    return yt_dlp
+
 
 class BilibiliService:
     def __init__(self):
@@ -13,7 +20,7 @@ class BilibiliService:
 
     def get_video_info(self, bv_id: str) -> dict:
         url = f"https://www.bilibili.com/video/{bv_id}"
-        with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
+        with _yt_dlp().YoutubeDL(self.ydl_opts) as ydl:
             info = ydl.extract_info(url, download=False)
             # print(info)
         return {
@@ -30,8 +37,10 @@ class BilibiliService:
         temp_opts = self.ydl_opts.copy()
         temp_opts['outtmpl'] = f'temp/{video_id}/video.%(ext)s'
         
-        with yt_dlp.YoutubeDL(temp_opts) as ydl:
+        with STAGE_DURATION.time(stage='download'), span('yt-dlp.download', bv_id=bv_id) as s, \
+                _yt_dlp().YoutubeDL(temp_opts) as ydl:
             info = ydl.extract_info(url, download=True)
+            s.set(bytes=info.get('filesize') or info.get('filesize_approx'))
         return f"temp/{video_id}/video.{info.get('ext')}"
 
     def cleanup_part_files(self, video_id: str):
@@ -67,7 +76,8 @@ class BilibiliService:
                 'no_warnings': True,
             })
             try:
-                with yt_dlp.YoutubeDL(audio_opts) as ydl:
+                with STAGE_DURATION.time(stage='download'), span('yt-dlp.download_audio', bv_id=bv_id, format=fmt), \
+                        _yt_dlp().YoutubeDL(audio_opts) as ydl:
                     info = ydl.extract_info(url, download=True)
                 # 检查文件是否真的下载成功
                 file_path = f"temp/{video_id}/audio.{fmt}"
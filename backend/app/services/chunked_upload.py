@@ -0,0 +1,172 @@
+"""
+可续传的分块上传：大视频按 CHUNKED_UPLOAD_CHUNK_SIZE 切块，每块单独请求上传并附带SHA-256校验值。
+
+创建上传时在项目目录下按文件大小预分配最终文件 video.<扩展名>，每块按偏移量直接写入，边接收边计算校验值，
+不经过临时文件或内存缓冲，整个文件只写一次磁盘。已收到的块和各块校验值记录在项目目录的 upload.json 中，
+连接中断后客户端查询已收到的块，只重传缺少的部分；全部块到齐后由调用方立即开始处理项目。
+上传完成后记录 chunk_tree_sha256（按顺序拼接各块SHA-256后的SHA-256），无需重新读取文件；
+它不是整个文件的SHA-256，不能与 sha256sum 的结果比较。
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from app.config import Config
+from app.services.file_utils import atomic_write_json
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = 'upload.json'
+# 从请求体读取并写入文件的缓冲大小
+_READ_SIZE = 1024 * 1024
+_SHA256_RE = re.compile(r'[0-9a-fA-F]{64}')
+
+_locks_guard = threading.Lock()
+_locks = {}
+
+
+class UploadError(ValueError):
+    """上传请求不合法，status 为应返回的HTTP状态码"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _lock_for(upload_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+
+def _state_path(task_dir: str) -> str:
+    return os.path.join(task_dir, STATE_FILENAME)
+
+
+def load_state(task_dir: str):
+    """读取上传状态，不存在时返回None"""
+    try:
+        with open(_state_path(task_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def summary(state: dict) -> dict:
+    """返回给客户端的上传进度"""
+    received = sorted(int(index) for index in state['chunks'])
+    received_set = set(received)
+    return {
+        'upload_id': state['upload_id'],
+        'size': state['size'],
+        'chunk_size': state['chunk_size'],
+        'total_chunks': state['total_chunks'],
+        'received': received,
+        'missing': [index for index in range(state['total_chunks']) if index not in received_set],
+        'complete': state.get('completed_at') is not None,
+        'chunk_tree_sha256': state.get('chunk_tree_sha256'),
+    }
+
+
+def create_upload(task_dir: str, filename: str, size: int, title: str = '', chunk_size: int = None) -> dict:
+    """
+    创建上传并预分配最终文件
+
+    Returns:
+        上传状态
+    """
+    if size <= 0:
+        raise UploadError('文件大小不正确')
+    if size > Config.CHUNKED_UPLOAD_MAX_BYTES:
+        raise UploadError(f'文件太大！最大支持{Config.CHUNKED_UPLOAD_MAX_BYTES // (1024 * 1024)}MB', 413)
+    chunk_size = int(chunk_size or Config.CHUNKED_UPLOAD_CHUNK_SIZE)
+    # 每块大小限制在 [1MB, 单次请求上限] 之间
+    chunk_size = max(1024 * 1024, min(chunk_size, Config.MAX_CONTENT_LENGTH))
+    extension = filename.rsplit('.', 1)[1].lower()
+
+    os.makedirs(task_dir, exist_ok=True)
+    video_path = os.path.join(task_dir, f"video.{extension}")
+    with open(video_path, 'wb') as f:
+        f.truncate(size)
+    state = {
+        'upload_id': os.path.basename(os.path.normpath(task_dir)),
+        'filename': filename,
+        'title': title,
+        'size': size,
+        'chunk_size': chunk_size,
+        'total_chunks': (size + chunk_size - 1) // chunk_size,
+        'video_path': video_path,
+        'chunks': {},
+        'created_at': time.time(),
+        'completed_at': None,
+        'chunk_tree_sha256': None,
+    }
+    atomic_write_json(_state_path(task_dir), state)
+    logger.info(f"创建分块上传: {state['upload_id']}，{size} 字节，{state['total_chunks']} 块")
+    return state
+
+
+def write_chunk(task_dir: str, index: int, stream, expected_sha256: str) -> tuple:
+    """
+    把第index块从stream直接写入最终文件的对应偏移量，同时计算SHA-256并与客户端提供的值比对
+
+    Args:
+        expected_sha256: 客户端计算的该块SHA-256（十六进制），必须提供
+
+    Returns:
+        (上传状态, 是否由本次请求完成了整个上传)
+    """
+    if not expected_sha256 or not _SHA256_RE.fullmatch(expected_sha256.strip()):
+        raise UploadError('缺少或无效的请求头 X-Chunk-SHA256，应为该块的SHA-256（64位十六进制）')
+    expected_sha256 = expected_sha256.strip().lower()
+    state = load_state(task_dir)
+    if state is None:
+        raise UploadError('上传不存在或已过期', 404)
+    if state['completed_at'] is not None:
+        # 客户端没收到最后一块的响应而重传时，文件可能已在处理中，不再写入
+        return state, False
+    if not 0 <= index < state['total_chunks']:
+        raise UploadError(f'块编号超出范围: {index}')
+    offset = index * state['chunk_size']
+    length = min(state['chunk_size'], state['size'] - offset)
+
+    digest = hashlib.sha256()
+    written = 0
+    # 不同块写入文件的不同区域，可以并行上传
+    with open(state['video_path'], 'r+b') as f:
+        f.seek(offset)
+        while written < length:
+            data = stream.read(min(_READ_SIZE, length - written))
+            if not data:
+                break
+            f.write(data)
+            digest.update(data)
+            written += len(data)
+    if written != length or stream.read(1):
+        raise UploadError(f'第{index}块长度不正确，应为 {length} 字节')
+    sha256 = digest.hexdigest()
+
+    with _lock_for(state['upload_id']):
+        state = load_state(task_dir)
+        if expected_sha256 != sha256:
+            # 损坏的数据可能覆盖了之前已收到的同一块，标记为未收到
+            if state['chunks'].pop(str(index), None):
+                atomic_write_json(_state_path(task_dir), state)
+            raise UploadError(f'第{index}块校验失败，请重传', 422)
+        state['chunks'][str(index)] = sha256
+        completed_now = False
+        if state['completed_at'] is None and len(state['chunks']) == state['total_chunks']:
+            state['completed_at'] = time.time()
+            state['chunk_tree_sha256'] = hashlib.sha256(b''.join(
+                bytes.fromhex(state['chunks'][str(i)]) for i in range(state['total_chunks']))).hexdigest()
+            completed_now = True
+        atomic_write_json(_state_path(task_dir), state)
+    if completed_now:
+        with _locks_guard:
+            _locks.pop(state['upload_id'], None)
+        logger.info(f"分块上传完成: {state['upload_id']}，用时 {state['completed_at'] - state['created_at']:.1f} 秒")
+    return state, completed_now
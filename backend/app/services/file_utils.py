@@ -0,0 +1,28 @@
+import os
+import json
+import tempfile
+
+
+def atomic_write_text(path: str, content: str):
+    """
+    先写入同目录下的临时文件再替换目标文件，读者只会看到旧内容或完整的新内容，
+    并发写入时以最后完成的一次为准，不会出现交错或截断的文件
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data, **kwargs):
+    """原子写入JSON，参数同 json.dumps"""
+    kwargs.setdefault('ensure_ascii', False)
+    atomic_write_text(path, json.dumps(data, **kwargs))
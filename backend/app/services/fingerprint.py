@@ -0,0 +1,188 @@
+"""
+音频指纹：识别同一场比赛的重复导入（同一BV号重新导入、队友上传的本地文件、换了BV号的转载）。
+
+每 25ms 计算一个子指纹（Haitsma-Kalker 方法）：取以该时刻开始的1秒音频，把频谱在 300~3000Hz 间按对数划分为17个频带，
+相邻频带能量差与1秒后的同一位置比较取符号，得到16位。对重新编码、音量变化不敏感；
+子指纹间隔远小于帧长，两份录音起点相差不到一秒时也能对齐比对。
+完整的子指纹保存为项目目录下的 fingerprint_v2.npy；子指纹的哈希和音频秒数写入 videos 表的索引列：
+哈希相同即为同一段音频，否则在时长相近的项目中比对子指纹，误码率低于 FINGERPRINT_MAX_BER 视为重复。
+"""
+import os
+import shutil
+import hashlib
+import logging
+import numpy as np
+from app.config import Config
+from app.services.pcm import WavFormatError, open_wav, frame_blocks, frame_count
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 每秒一个子指纹的旧格式（fingerprint.npy）无法与新格式比对，不再读取
+FINGERPRINT_FILENAME = 'fingerprint_v2.npy'
+# 重复项目可直接复用的产物：文字稿（含转录原文和人声裁剪偏移表）和分析结果（含清单，复用后命中分析缓存）
+REUSABLE_ARTIFACTS = ('transcript.txt', 'audio_raw.txt', 'audio_offsets.json',
+                      'tree.json', 'tree.manifest.json', 'bubble.json', 'bubble.manifest.json', 'stats.npz')
+# 子指纹间隔；频谱按两倍间隔的窗口（半重叠）计算，再累加为1秒的帧
+_HOP_MS = 25
+FRAMES_PER_S = 1000 // _HOP_MS
+_BAND_EDGES_HZ = np.geomspace(300, 3000, 18)
+# 比对时每隔几个子指纹取一个，错位仍按单个子指纹的间隔搜索
+_COMPARE_STEP = 5
+# 文字稿和分析结果的时间戳精确到秒，错位不到半秒时复制过来的时间戳仍然准确；错位更大时不复用
+REUSE_MAX_SHIFT_S = 0.5
+# 静音和单调音频（如纯音、底噪）的子指纹几乎全为0，无法区分不同比赛
+_MIN_NONZERO_RATIO = 0.5
+
+
+def _window_band_energy(samples: np.ndarray, rate: int) -> np.ndarray:
+    """各窗口（从第k个间隔开始、长两个间隔）的频带能量，形状为 (窗口数, 频带数)"""
+    hop_len = max(1, rate * _HOP_MS // 1000)
+    freqs = np.fft.rfftfreq(2 * hop_len, 1 / rate)
+    band_of = np.searchsorted(_BAND_EDGES_HZ, freqs, side='right') - 1
+    # 频率 -> 频带的0/1矩阵，功率谱乘以它即得各频带能量
+    bands = (band_of[:, None] == np.arange(len(_BAND_EDGES_HZ) - 1)[None, :]).astype(np.float32)
+    window = np.hanning(2 * hop_len).astype(np.float32)
+    n_hops = frame_count(samples, rate, _HOP_MS)
+    energy = np.empty((max(0, n_hops - 1), bands.shape[1]), dtype=np.float32)
+    carry = None
+    for first, hops in frame_blocks(samples, rate, _HOP_MS):
+        # 与上一块的最后一个间隔拼接，跨块的窗口不丢失
+        if carry is not None:
+            hops = np.concatenate([carry, hops])
+            first -= 1
+        carry = hops[-1:]
+        if len(hops) < 2:
+            continue
+        windows = np.concatenate([hops[:-1], hops[1:]], axis=1) * window
+        energy[first:first + len(windows)] = np.square(np.abs(np.fft.rfft(windows, axis=1))) @ bands
+    return energy
+
+
+def compute_fingerprint(audio_path: str):
+    """
+    计算音频的子指纹
+
+    Returns:
+        uint16数组，每秒 FRAMES_PER_S 个；不是可映射的PCM WAV或音频内容不足以区分时返回None
+    """
+    try:
+        samples, rate = open_wav(audio_path)
+    except (OSError, WavFormatError) as e:
+        logger.warning(f"无法读取PCM音频，跳过音频指纹: {str(e)}")
+        return None
+    if frame_count(samples, rate, 1000) < max(3, Config.FINGERPRINT_MIN_S):
+        return None
+
+    # 从每个间隔开始的1秒帧的频带能量：累加落在这1秒内的窗口（半重叠的汉宁窗相加后权重均匀）
+    windows = _window_band_energy(samples, rate)
+    cumulative = np.zeros((len(windows) + 1, windows.shape[1]), dtype=np.float64)
+    cumulative[1:] = np.cumsum(windows, axis=0)
+    per_frame = FRAMES_PER_S - 1
+    energy = cumulative[per_frame:] - cumulative[:-per_frame]
+    energy = np.log10(energy + 1e-3)
+
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[FRAMES_PER_S:] - band_diff[:-FRAMES_PER_S]) > 0
+    fingerprint = np.packbits(bits, axis=1, bitorder='little').view('<u2').ravel()
+    if np.count_nonzero(fingerprint) < _MIN_NONZERO_RATIO * len(fingerprint):
+        logger.info(f"音频内容不足以区分，跳过音频指纹: {audio_path}")
+        return None
+    return fingerprint
+
+
+def fingerprint_seconds(fingerprint: np.ndarray) -> int:
+    """子指纹覆盖的音频秒数，写入 videos.audio_seconds"""
+    return len(fingerprint) // FRAMES_PER_S
+
+
+def fingerprint_key(fingerprint: np.ndarray) -> str:
+    """子指纹的哈希，写入 videos.audio_fingerprint"""
+    return hashlib.sha1(fingerprint.astype('<u2').tobytes()).hexdigest()
+
+
+def save_fingerprint(task_dir: str, fingerprint: np.ndarray):
+    np.save(os.path.join(task_dir, FINGERPRINT_FILENAME), fingerprint)
+
+
+def load_fingerprint(task_dir: str):
+    path = os.path.join(task_dir, FINGERPRINT_FILENAME)
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        return None
+
+
+# 16位整数中1的个数，用于计算误码率
+_POPCOUNT = np.array([bin(i).count('1') for i in range(1 << 16)], dtype=np.uint8)
+
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray, max_shift_s: float):
+    """
+    在 ±max_shift_s 秒的错位内按子指纹间隔（25ms）逐一尝试对齐，取误码率最低的一种。
+    每种对齐方式只抽取每 _COMPARE_STEP 个子指纹比较；重叠不足较长一方的90%时视为不同（误码率为1）
+
+    Returns:
+        (误码率, b相对a的错位秒数)：b中t秒处的音频对应a中t+错位秒处
+    """
+    best = (1.0, 0.0)
+    max_shift = int(round(max_shift_s * FRAMES_PER_S))
+    for shift in range(-max_shift, max_shift + 1):
+        x = a[max(0, shift):]
+        y = b[max(0, -shift):]
+        n = min(len(x), len(y))
+        if n < 0.9 * max(len(a), len(b)):
+            continue
+        diff = np.bitwise_xor(x[:n:_COMPARE_STEP], y[:n:_COMPARE_STEP])
+        ber = float(_POPCOUNT[diff].sum(dtype=np.int64)) / (16 * len(diff))
+        if ber < best[0]:
+            best = (ber, shift / FRAMES_PER_S)
+    return best
+
+
+def find_duplicate(fingerprint: np.ndarray, candidates) -> tuple:
+    """
+    在候选项目中找与本音频相同的一个，有多个时优先错位不超过 REUSE_MAX_SHIFT_S 的
+
+    Args:
+        candidates: [(项目编号, 项目目录, 指纹哈希)]，先找哈希完全相同的，再逐个比对子指纹
+
+    Returns:
+        (项目编号, 误码率, 错位秒数)：本音频t秒处对应该项目t+错位秒处；没有重复时返回 (None, None, None)
+    """
+    key = fingerprint_key(fingerprint)
+    for project_id, task_dir, candidate_key in candidates:
+        if candidate_key == key:
+            return project_id, 0.0, 0.0
+    shifted = (None, None, None)
+    for project_id, task_dir, _ in candidates:
+        other = load_fingerprint(task_dir)
+        if other is None:
+            continue
+        ber, shift = bit_error_rate(other, fingerprint, Config.FINGERPRINT_MAX_SHIFT_S)
+        if ber <= Config.FINGERPRINT_MAX_BER:
+            logger.info(f"音频指纹匹配: {project_id}，误码率 {ber:.3f}，错位 {shift:.3f} 秒")
+            if abs(shift) <= REUSE_MAX_SHIFT_S:
+                return project_id, ber, shift
+            if shifted[0] is None:
+                shifted = (project_id, ber, shift)
+    return shifted
+
+
+def copy_artifacts(source_dir: str, target_dir: str) -> list:
+    """
+    把重复项目的文字稿和分析结果复制到新项目目录（复制而不是链接，之后各自修改文字稿互不影响），
+    新项目中已有的文件不覆盖
+
+    Returns:
+        复制的文件名
+    """
+    copied = []
+    for name in REUSABLE_ARTIFACTS:
+        source = os.path.join(source_dir, name)
+        target = os.path.join(target_dir, name)
+        if os.path.isfile(source) and not os.path.exists(target):
+            shutil.copy2(source, target)
+            copied.append(name)
+    return copied
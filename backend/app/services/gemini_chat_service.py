@@ -1,22 +1,26 @@
 import os
 import logging
 import time
-from google import genai
 from app.config import Config
+from app.services.llm_provider import get_provider, TASK_CHAT
+from app.services.metrics import CHAT_TTFT, UPLOAD_BYTES, record_llm_failure
+from app.services.analysis_shards import file_hash
+from app.services.singleflight import SingleFlight, StreamFlight
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 同一文字稿、同一时间点的相同问题同时只回答一次（如重复点击发送、多个标签页）
+CHAT_FLIGHT = SingleFlight('chat')
+CHAT_STREAM_FLIGHT = StreamFlight('chat_stream')
+
 class GeminiChatService:
     def __init__(self, api_key: str = None):
         """初始化 Gemini 聊天服务"""
         # 优先使用传入的api_key，其次使用配置中的API Key
         self.api_key = api_key or Config.GEMINI_API_KEY
-        if not self.api_key:
-            raise ValueError("Gemini API Key 未配置，请在首页的API配置中设置")
-
-        self.client = genai.Client(api_key=self.api_key)
+        self.provider = get_provider(TASK_CHAT, api_key=self.api_key)
         self.max_retries = 3
 
     def format_time(self, seconds: float) -> str:
@@ -25,7 +29,25 @@ class GeminiChatService:
         remaining_seconds = int(seconds % 60)
         return f"{minutes}:{remaining_seconds:02d}"
 
+    def _flight_key(self, transcript_path: str, current_time: float, question: str) -> tuple:
+        return (os.path.normpath(os.path.abspath(transcript_path)), file_hash(transcript_path),
+                self.format_time(current_time), question.strip(), self.provider.name, self.provider.model)
+
     def chat_with_transcript(self, transcript_path: str, current_time: float, question: str) -> str:
+        """基于文字稿文件进行聊天，相同问题正在回答时共享其结果，参数同 _chat_with_transcript"""
+        key = self._flight_key(transcript_path, current_time, question)
+        return CHAT_FLIGHT.do(key, lambda: self._chat_with_transcript(transcript_path, current_time, question))[0]
+
+    def chat_with_transcript_stream(self, transcript_path: str, current_time: float, question: str):
+        """流式聊天，相同问题正在回答时共享其输出，参数同 _chat_with_transcript_stream"""
+        def produce(publish):
+            for chunk in self._chat_with_transcript_stream(transcript_path, current_time, question):
+                publish(chunk)
+
+        key = self._flight_key(transcript_path, current_time, question)
+        return CHAT_STREAM_FLIGHT.stream(key, produce)
+
+    def _chat_with_transcript(self, transcript_path: str, current_time: float, question: str) -> str:
         """
         基于文字稿文件进行聊天
         
@@ -51,33 +73,29 @@ class GeminiChatService:
         for attempt in range(self.max_retries):
             try:
                 # 读取文件内容并生成流式响应
-                uploaded_file = self.client.files.upload(file=transcript_path)
-                
-                response = self.client.models.generate_content_stream(
-                    model="gemini-2.5-pro",
-                    contents=[prompt, uploaded_file]
-                )
+                start = time.time()
+                uploaded_file = self.provider.upload(transcript_path)
+                UPLOAD_BYTES.inc(os.path.getsize(transcript_path), task=TASK_CHAT)
                 
                 # 收集流式响应
                 full_text = ""
-                for chunk in response:
-                    if chunk.text:
-                        full_text += chunk.text
-                        # 可以在这里添加进度回调或日志
-                        # logger.info(f"聊天进度: {len(full_text)} 字符")
-                        print(chunk.text)
+                for text in self.provider.stream([prompt, uploaded_file]):
+                    if not full_text:
+                        CHAT_TTFT.observe(time.time() - start)
+                    full_text += text
                 
                 return full_text.strip()
                     
             except Exception as e:
                 logger.warning(f"Gemini聊天失败(第{attempt+1}次): {str(e)}")
+                record_llm_failure(TASK_CHAT, e, will_retry=attempt < self.max_retries - 1)
                 if attempt == self.max_retries - 1:
                     raise
                 time.sleep(2 ** attempt)
         
         return ""
 
-    def chat_with_transcript_stream(self, transcript_path: str, current_time: float, question: str):
+    def _chat_with_transcript_stream(self, transcript_path: str, current_time: float, question: str):
         """
         基于文字稿文件进行流式聊天
         Args:
@@ -98,27 +116,29 @@ class GeminiChatService:
 """
         for attempt in range(self.max_retries):
             try:
-                uploaded_file = self.client.files.upload(file=transcript_path)
-                response = self.client.models.generate_content_stream(
-                    model="gemini-2.5-pro",
-                    contents=[prompt, uploaded_file]
-                )
+                start = time.time()
+                uploaded_file = self.provider.upload(transcript_path)
+                UPLOAD_BYTES.inc(os.path.getsize(transcript_path), task=TASK_CHAT)
                 buffer = ""
-                for chunk in response:
-                    if chunk.text:
-                        buffer += chunk.text
-                        # 按行分批yield，保证Markdown分段
-                        while '\n' in buffer:
-                            idx = buffer.find('\n')
-                            to_yield = buffer[:idx+1]
-                            yield to_yield
-                            buffer = buffer[idx+1:]
+                first_chunk = True
+                for text in self.provider.stream([prompt, uploaded_file]):
+                    if first_chunk:
+                        CHAT_TTFT.observe(time.time() - start)
+                        first_chunk = False
+                    buffer += text
+                    # 按行分批yield，保证Markdown分段
+                    while '\n' in buffer:
+                        idx = buffer.find('\n')
+                        to_yield = buffer[:idx+1]
+                        yield to_yield
+                        buffer = buffer[idx+1:]
                 # yield 剩余内容
                 if buffer.strip():
                     yield buffer
                 return  # 成功完成，退出重试循环
             except Exception as e:
                 logger.warning(f"Gemini聊天失败(第{attempt+1}次): {str(e)}")
+                record_llm_failure(TASK_CHAT, e, will_retry=attempt < self.max_retries - 1)
                 if attempt == self.max_retries - 1:
                     yield f"错误: {str(e)}"
                     return
@@ -126,12 +146,5 @@ class GeminiChatService:
 
     def health_check(self) -> bool:
         """健康检查"""
-        try:
-            # 简单的测试请求，设置较短的超时时间
-            response = self.client.generate_content("Hello", timeout=10)
-            return True
-        except Exception as e:
-            logger.warning(f"Gemini健康检查失败: {str(e)}")
-            # 即使API连接失败，也不应该完全阻止服务启动
-            # 返回True表示服务本身是健康的，只是API暂时不可用
-            return True 
\ No newline at end of file
+        # 只查询模型信息，不产生生成开销；API暂时不可用不影响服务本身
+        return self.provider.health_check() 
\ No newline at end of file
@@ -0,0 +1,114 @@
+import math
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional
+from app.services.tracing import span, propagate
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """记录最近若干次请求的首字节延迟（秒），用于计算对冲请求的触发阈值"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """最近样本的第p百分位（最近秩法），没有样本时返回None"""
+        with self.lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        rank = max(1, min(len(ordered), math.ceil(p / 100 * len(ordered))))
+        return ordered[rank - 1]
+
+    def deadline(self, p: float, min_samples: int, default: float) -> float:
+        """样本足够时返回第p百分位延迟，否则返回默认阈值"""
+        with self.lock:
+            enough = len(self.samples) >= min_samples
+        value = self.percentile(p) if enough else None
+        return default if value is None else value
+
+
+class HedgeBudget:
+    """单个项目允许发出的对冲请求数量上限，控制额外花费"""
+
+    def __init__(self, max_hedges: int):
+        self.max_hedges = max_hedges
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self.lock:
+            if self.used >= self.max_hedges:
+                return False
+            self.used += 1
+            return True
+
+
+# 进程内共享的转录首字节延迟统计
+transcribe_latency = LatencyTracker()
+
+
+def hedged_call(fn: Callable, deadline_s: float, budget: HedgeBudget, label: str = ""):
+    """
+    对冲调用：先发出主请求，若在deadline_s内还没有收到首字节，且预算允许，
+    再发出一个相同的请求，取先成功完成的结果，另一个请求在下一个数据块时自行停止
+
+    Args:
+        fn: fn(on_first_byte, cancelled) -> 结果。收到首个数据块时调用on_first_byte()，
+            cancelled()为True时应尽快停止并返回
+        deadline_s: 等待首字节的时间（秒）
+        budget: 项目的对冲预算
+        label: 日志标识
+
+    Returns:
+        先成功完成的请求结果；全部失败时抛出最后一个异常
+    """
+    results = queue.Queue()
+    cancel = threading.Event()
+
+    def run(index: int, first_byte: threading.Event):
+        try:
+            with span('llm.request', hedge=bool(index)):
+                value = fn(first_byte.set, cancel.is_set)
+            results.put((index, True, value))
+        except Exception as e:
+            results.put((index, False, e))
+        finally:
+            # 请求提前结束（成功或失败）同样视为不再需要等待首字节
+            first_byte.set()
+
+    primary_first_byte = threading.Event()
+    threading.Thread(target=propagate(run), args=(0, primary_first_byte), daemon=True).start()
+    running = 1
+
+    if not primary_first_byte.wait(deadline_s):
+        if budget.try_acquire():
+            logger.info(f"{label} 超过 {deadline_s:.1f}s 未收到首字节，发出对冲请求（本项目已用 {budget.used}/{budget.max_hedges}）")
+            threading.Thread(target=propagate(run), args=(1, threading.Event()), daemon=True).start()
+            running += 1
+        else:
+            logger.info(f"{label} 首字节超时，但对冲预算已用完")
+
+    last_error = None
+    while running:
+        index, ok, value = results.get()
+        running -= 1
+        if ok:
+            cancel.set()
+            if index == 1:
+                logger.info(f"{label} 对冲请求先完成")
+            return value
+        last_error = value
+        logger.warning(f"{label} 请求{'(对冲)' if index else ''}失败: {str(value)}")
+    raise last_error
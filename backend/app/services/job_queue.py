@@ -0,0 +1,102 @@
+"""
+后台任务队列：请求只负责保存输入并入队，由固定数量的工作线程依次执行耗时任务（如转录）。
+同时执行的任务数由工作线程数限制，不再占用处理请求的线程，排队中的任务不消耗任何资源。
+队列只在内存中，进程退出后由调用方根据数据库中的任务状态恢复（见 worker_id / worker_alive）。
+"""
+import os
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable
+from app.services.metrics import Gauge
+from app.services.tracing import propagate
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """按名称区分的线程池队列，首次提交任务时才创建工作线程"""
+
+    def __init__(self, name: str, workers: int, depth_gauge: Gauge = None):
+        self.name = name
+        self.workers = max(1, workers)
+        self.depth_gauge = depth_gauge
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-worker")
+            return self.executor
+
+    def depth(self) -> int:
+        """排队和执行中的任务数"""
+        return self.pending
+
+    def submit(self, job_id: str, fn: Callable, *args) -> Future:
+        """入队，任务在工作线程中以 fn(*args) 执行；异常只记录日志，任务自身负责保存失败状态"""
+        self._change_depth(1)
+        run = propagate(fn)
+
+        def job():
+            try:
+                return run(*args)
+            except Exception as e:
+                logger.error(f"{self.name} 任务执行失败: {job_id}, 错误: {str(e)}")
+            finally:
+                self._change_depth(-1)
+
+        logger.info(f"{self.name} 任务入队: {job_id}，当前排队和执行中 {self.pending} 个")
+        return self._get_executor().submit(job)
+
+    def _change_depth(self, delta: int):
+        with self.lock:
+            self.pending += delta
+        if self.depth_gauge is not None:
+            self.depth_gauge.inc(delta)
+
+
+def worker_id() -> str:
+    """当前进程的标识（主机名:进程号），记录在执行中的任务上"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # Windows 上 os.kill 会结束目标进程，改为查询进程退出码
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        ok = kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return bool(ok) and code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def worker_alive(worker: str) -> bool:
+    """
+    worker_id() 记录的进程是否仍在运行；其他主机上的进程无法判断，视为仍在运行
+
+    Args:
+        worker: 主机名:进程号，为空时视为已退出
+    """
+    host, _, pid = (worker or '').rpartition(':')
+    if not host or not pid.isdigit():
+        return False
+    if host != socket.gethostname():
+        return True
+    return _pid_alive(int(pid))
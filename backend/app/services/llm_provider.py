@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 任务类型，用于按任务路由到不同的提供方/模型
+TASK_TRANSCRIBE = 'transcribe'
+TASK_ANALYSIS = 'analysis'
+TASK_CHAT = 'chat'
+
+
+class LLMProvider:
+    """
+    大模型提供方统一接口：上传文件、一次性生成、流式生成。
+
+    contents 为提示词字符串与 upload() 返回的文件句柄组成的列表，句柄只能交给同一提供方使用。
+    """
+
+    name = 'base'
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def upload(self, file_path: str):
+        """上传文件，返回可放入contents的文件句柄"""
+        raise NotImplementedError
+
+    def stream(self, contents: list) -> Iterator[str]:
+        """流式生成，逐块产出文本"""
+        raise NotImplementedError
+
+    def generate(self, contents: list) -> str:
+        """一次性生成完整文本"""
+        return ''.join(self.stream(contents))
+
+    def health_check(self) -> bool:
+        return True
+
+
+# 进程级 genai 客户端池：同一API Key（和API地址）共用一个客户端，
+# 其底层HTTP连接池的keep-alive连接在各线程、各请求之间复用，避免每次请求重新建立TLS连接
+_client_pool: Dict[tuple, object] = {}
+_client_pool_lock = threading.Lock()
+
+
+def get_gemini_client(api_key: str, base_url: str = ''):
+    """按API Key获取共享的genai客户端，第一次使用时创建"""
+    key = (api_key, base_url)
+    with _client_pool_lock:
+        client = _client_pool.get(key)
+        if client is None:
+            from google import genai
+            http_options = {'base_url': base_url} if base_url else None
+            client = genai.Client(api_key=api_key, http_options=http_options)
+            _client_pool[key] = client
+            logger.info(f"创建Gemini客户端（当前共 {len(_client_pool)} 个）")
+        return client
+
+
+def reset_client_pool():
+    """API Key变更后丢弃已缓存的客户端；正在进行的请求继续使用各自持有的旧客户端"""
+    with _client_pool_lock:
+        _client_pool.clear()
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini（google-genai SDK）"""
+
+    name = 'gemini'
+
+    def __init__(self, model: str, api_key: str, base_url: str = ''):
+        super().__init__(model)
+        if not api_key:
+            raise ValueError("Gemini API Key 未配置，请在首页的API配置中设置")
+        self.client = get_gemini_client(api_key, base_url)
+
+    def upload(self, file_path: str):
+        return self.client.files.upload(file=file_path)
+
+    def stream(self, contents: list) -> Iterator[str]:
+        response = self.client.models.generate_content_stream(model=self.model, contents=contents)
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def generate(self, contents: list) -> str:
+        response = self.client.models.generate_content(model=self.model, contents=contents)
+        return response.text or ""
+
+    def health_check(self) -> bool:
+        try:
+            self.client.models.get(model=self.model)
+            return True
+        except Exception as e:
+            logger.warning(f"Gemini健康检查失败: {str(e)}")
+            return False
+
+
+@dataclass
+class FakeFile:
+    """本地假提供方的文件句柄"""
+    path: str
+    size: int
+
+
+# 假提供方的固定回复：转录结果覆盖多个阶段，分析结果包含引用关系，便于跑通整条流水线
+FAKE_TRANSCRIPT = """### **辩论阶段：正方立论**
+[00:05]正方一辩：我方认为人工智能的发展利大于弊，第一，它显著提升了社会生产效率。
+[00:40]正方一辩：第二，人工智能降低了医疗、教育等公共服务的成本，让更多人受益。
+### **辩论阶段：反方立论**
+[03:10]反方一辩：对方只看到了效率，却忽略了就业冲击和算法偏见带来的社会风险。
+[03:50]反方一辩：我方认为，在缺乏有效监管的今天，人工智能的弊端更为突出。
+### **辩论阶段：自由辩论**
+[07:00]正方二辩：请问对方，技术进步带来的新岗位是否也应计入考量？
+[07:12]反方二辩：新岗位需要的技能门槛，恰恰把被替代的人挡在了门外。
+[07:30]正方三辩：所以问题在于培训体系，而不是人工智能本身。"""
+
+FAKE_ANALYSIS = {
+    "analysis": [
+        {"analysis_id": "1", "global_fs": "[00:05]", "speaker": "正方一辩", "analysis_type": "affirmation",
+         "content": "提出效率论点", "technique": "举例", "target": "", "base": "",
+         "goal": "支持自身论点：效率", "pros_gain": 6, "cons_gain": 0, "summary": "AI提升效率", "interruption_type": "none"},
+        {"analysis_id": "2", "global_fs": "[00:40]", "speaker": "正方一辩", "analysis_type": "example",
+         "content": "以公共服务成本为例", "technique": "举例", "target": "", "base": "1",
+         "goal": "支持自身论点：效率", "pros_gain": 4, "cons_gain": 0, "summary": "降低服务成本", "interruption_type": "none"},
+        {"analysis_id": "3", "global_fs": "[03:10]", "speaker": "反方一辩", "analysis_type": "attack",
+         "content": "指出就业与偏见风险", "technique": "反证", "target": "1", "base": "",
+         "goal": "攻击对方论点：效率", "pros_gain": -4, "cons_gain": 5, "summary": "忽略社会风险", "interruption_type": "none"},
+        {"analysis_id": "4", "global_fs": "[07:30]", "speaker": "正方三辩", "analysis_type": "defence",
+         "content": "将问题归因于培训体系", "technique": "归谬", "target": "3", "base": "",
+         "goal": "支持自身论点：效率", "pros_gain": 3, "cons_gain": -2, "summary": "问题在培训", "interruption_type": "active"}
+    ]
+}
+
+FAKE_CHAT = "这是本地假提供方的回答。\n当前时间点双方围绕人工智能的效率与风险展开交锋。\n"
+
+
+class FakeProvider(LLMProvider):
+    """
+    本地确定性假提供方：不访问网络，按任务返回固定内容，并可配置延迟，
+    用于离线跑通、压测和基准测试整条流水线
+    """
+
+    name = 'fake'
+
+    def __init__(self, model: str, task: str = TASK_CHAT, first_token_ms: int = 0, chunk_delay_ms: int = 0,
+                 upload_ms: int = 0, chunk_chars: int = 64, responses: Dict[str, str] = None):
+        super().__init__(model)
+        self.task = task
+        self.first_token_ms = first_token_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self.upload_ms = upload_ms
+        self.chunk_chars = max(1, chunk_chars)
+        self.responses = {
+            TASK_TRANSCRIBE: FAKE_TRANSCRIPT,
+            TASK_ANALYSIS: json.dumps(FAKE_ANALYSIS, ensure_ascii=False, indent=2),
+            TASK_CHAT: FAKE_CHAT,
+        }
+        self.responses.update(responses or {})
+
+    def upload(self, file_path: str):
+        time.sleep(self.upload_ms / 1000)
+        return FakeFile(path=file_path, size=os.path.getsize(file_path))
+
+    def stream(self, contents: list) -> Iterator[str]:
+        text = self.responses.get(self.task, FAKE_CHAT)
+        time.sleep(self.first_token_ms / 1000)
+        for i in range(0, len(text), self.chunk_chars):
+            if i:
+                time.sleep(self.chunk_delay_ms / 1000)
+            yield text[i:i + self.chunk_chars]
+
+
+# 提供方注册表：名称 -> 工厂函数(task, model, api_key) -> LLMProvider
+_registry: Dict[str, Callable[..., LLMProvider]] = {}
+
+
+def register_provider(name: str, factory: Callable[..., LLMProvider]):
+    """注册提供方，工厂函数签名为 factory(task, model, api_key)"""
+    _registry[name] = factory
+
+
+def _gemini_factory(task: str, model: str, api_key: str) -> LLMProvider:
+    from app.config import Config
+    return GeminiProvider(model=model, api_key=api_key or Config.GEMINI_API_KEY, base_url=Config.GEMINI_BASE_URL)
+
+
+def _fake_factory(task: str, model: str, api_key: str) -> LLMProvider:
+    from app.config import Config
+    return FakeProvider(
+        model=model,
+        task=task,
+        first_token_ms=Config.FAKE_LLM_FIRST_TOKEN_MS,
+        chunk_delay_ms=Config.FAKE_LLM_CHUNK_DELAY_MS,
+        upload_ms=Config.FAKE_LLM_UPLOAD_MS,
+    )
+
+
+register_provider('gemini', _gemini_factory)
+register_provider('fake', _fake_factory)
+
+
+def resolve_route(task: str):
+    """
+    解析任务使用的提供方和模型：LLM_ROUTES中按任务配置的"提供方[:模型]"优先，
+    否则使用默认的LLM_PROVIDER / LLM_MODEL
+    """
+    from app.config import Config
+    provider_name, model = Config.LLM_PROVIDER, Config.LLM_MODEL
+    route = Config.LLM_ROUTES.get(task)
+    if route:
+        name, _, route_model = route.partition(':')
+        provider_name = name or provider_name
+        model = route_model or model
+    return provider_name, model
+
+
+def get_provider(task: str, api_key: str = None) -> LLMProvider:
+    """按任务获取提供方实例"""
+    provider_name, model = resolve_route(task)
+    factory = _registry.get(provider_name)
+    if factory is None:
+        raise ValueError(f"未知的LLM提供方: {provider_name}，可选: {', '.join(sorted(_registry))}")
+    return factory(task, model, api_key)
+
+
+def available_providers() -> List[str]:
+    return sorted(_registry)
@@ -0,0 +1,242 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# 流水线各步骤耗时从几百毫秒到几十分钟不等
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+# 首字节延迟
+TTFT_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """指标基类：按标签值分别记录，线程安全"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """可增可减的当前值"""
+
+    type_name = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(_Metric):
+    """分桶直方图，记录观测值的分布、总和与次数"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self.values = {}  # 标签值 -> [各桶计数, 总和, 次数]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块耗时（秒），代码块抛出异常时同样记录"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self.lock:
+            entry = self.values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def _samples(self):
+        with self.lock:
+            items = sorted((key, ([*counts], total, n)) for key, (counts, total, n) in self.values.items())
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus文本格式"""
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'debatelens_stage_duration_seconds',
+    '流水线步骤耗时（download/extract/split/transcribe_segment/analysis）',
+    ('stage',),
+))
+CHAT_TTFT = REGISTRY.register(Histogram(
+    'debatelens_chat_ttft_seconds',
+    '聊天从收到问题到产出第一个文本块的时间（包含上传文字稿）',
+    buckets=TTFT_BUCKETS,
+))
+LLM_RETRIES = REGISTRY.register(Counter(
+    'debatelens_llm_retries_total',
+    '大模型调用失败后的重试次数',
+    ('task',),
+))
+EMPTY_SEGMENT_RETRIES = REGISTRY.register(Counter(
+    'debatelens_empty_segment_retries_total',
+    '音频段转录结果为空导致的重试次数',
+))
+LLM_RATE_LIMITED = REGISTRY.register(Counter(
+    'debatelens_llm_rate_limited_total',
+    '大模型调用返回429（限流）的次数',
+    ('task',),
+))
+UPLOAD_BYTES = REGISTRY.register(Counter(
+    'debatelens_upload_bytes_total',
+    '上传给大模型的文件字节数',
+    ('task',),
+))
+PIPELINE_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'debatelens_pipeline_queue_depth',
+    '正在处理（下载/转录/分析中）的项目数',
+))
+TRANSCRIBE_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'debatelens_transcribe_queue_depth',
+    '/api/transcribe 排队和执行中的转录任务数',
+))
+SINGLEFLIGHT_SHARED = REGISTRY.register(Counter(
+    'debatelens_singleflight_shared_total',
+    '与进行中的相同请求合并、未重复调用大模型的次数',
+    ('operation',),
+))
+DUPLICATE_IMPORTS = REGISTRY.register(Counter(
+    'debatelens_duplicate_imports_total',
+    '音频指纹与已有项目相同、直接复用其文字稿和分析结果的项目数',
+))
+AUDIO_SECONDS = REGISTRY.register(Counter(
+    'debatelens_audio_seconds_total',
+    '待转录音频的秒数（original为原音频，sent为人声检测裁剪后实际上传的部分）',
+    ('kind',),
+))
+
+ARTIFACT_EVICTED_BYTES = REGISTRY.register(Counter(
+    'debatelens_artifact_evicted_bytes_total',
+    '为控制 temp/ 占用而删除的可重新获取文件的字节数（video为B站视频，audio为提取的音频）',
+    ('kind',),
+))
+ARTIFACT_RESTORES = REGISTRY.register(Counter(
+    'debatelens_artifact_restores_total',
+    '被回收后按需重新获取的文件数',
+    ('kind',),
+))
+TEMP_DIR_BYTES = REGISTRY.register(Gauge(
+    'debatelens_temp_dir_bytes',
+    '最近一次回收检查时 temp/ 目录占用的磁盘空间（字节）',
+))
+
+def is_rate_limited(error: Exception) -> bool:
+    """判断异常是否为限流（HTTP 429 / RESOURCE_EXHAUSTED）"""
+    if getattr(error, 'code', None) == 429 or getattr(error, 'status_code', None) == 429:
+        return True
+    message = str(error)
+    return '429' in message or 'RESOURCE_EXHAUSTED' in message
+
+
+def record_llm_failure(task: str, error: Exception, will_retry: bool):
+    """记录一次大模型调用失败：限流计数，以及之后是否重试"""
+    if is_rate_limited(error):
+        LLM_RATE_LIMITED.inc(task=task)
+    if will_retry:
+        LLM_RETRIES.inc(task=task)
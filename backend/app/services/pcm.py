@@ -0,0 +1,127 @@
+"""
+直接读取 audio.wav 中的PCM采样：按内存映射打开，不把整段音频读入内存，分块计算每帧的RMS能量和过零率。
+extract_audio 输出的是 16kHz、单声道、16位PCM的WAV。
+"""
+import wave
+import struct
+import numpy as np
+
+# 分块计算RMS时每块的秒数，限制转换为浮点数时的内存占用
+_BLOCK_SECONDS = 60
+
+
+class WavFormatError(ValueError):
+    """不是可以直接映射的16位PCM WAV"""
+
+
+def _find_data_chunk(path: str):
+    """解析RIFF头，返回 (采样率, 声道数, data块偏移, data块字节数)"""
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise WavFormatError(f"不是WAV文件: {path}")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise WavFormatError(f"WAV文件缺少data块: {path}")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+                f.seek(size - 16 + (size & 1), 1)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise WavFormatError(f"WAV文件缺少fmt块: {path}")
+                audio_format, channels, rate, _, _, bits = fmt
+                if audio_format != 1 or bits != 16:
+                    raise WavFormatError(f"只支持16位PCM，实际格式 {audio_format}/{bits}位: {path}")
+                return rate, channels, f.tell(), size
+            else:
+                f.seek(size + (size & 1), 1)
+
+
+def open_wav(path: str):
+    """
+    以内存映射方式打开16位PCM WAV
+
+    Returns:
+        (采样数组 int16，形状为 (采样数,) 或多声道时 (采样数, 声道数), 采样率)
+    """
+    rate, channels, offset, size = _find_data_chunk(path)
+    frames = size // (2 * channels)
+    shape = (frames,) if channels == 1 else (frames, channels)
+    if frames == 0:
+        return np.zeros(shape, dtype='<i2'), rate
+    return np.memmap(path, dtype='<i2', mode='r', offset=offset, shape=shape), rate
+
+
+def frame_blocks(samples: np.ndarray, rate: int, frame_ms: int):
+    """按块产出 (第一帧编号, 浮点采样数组，形状为 (帧数, 每帧采样数))，多声道取平均；末尾不足一帧的采样丢弃"""
+    frame_len = max(1, rate * frame_ms // 1000)
+    n_frames = len(samples) // frame_len
+    frames_per_block = max(1, _BLOCK_SECONDS * 1000 // frame_ms)
+    for first in range(0, n_frames, frames_per_block):
+        last = min(n_frames, first + frames_per_block)
+        block = np.asarray(samples[first * frame_len:last * frame_len], dtype=np.float32)
+        if block.ndim > 1:
+            block = block.mean(axis=1)
+        yield first, (block / 32768.0).reshape(last - first, frame_len)
+
+
+def frame_count(samples: np.ndarray, rate: int, frame_ms: int) -> int:
+    return len(samples) // max(1, rate * frame_ms // 1000)
+
+
+def frame_rms_db(samples: np.ndarray, rate: int, frame_ms: int = 30) -> np.ndarray:
+    """
+    每帧的RMS能量（dBFS，满幅为0）
+
+    Returns:
+        float32数组，第i帧对应 [i*frame_ms, (i+1)*frame_ms) 毫秒
+    """
+    return frame_features(samples, rate, frame_ms, with_zcr=False)[0]
+
+
+def frame_features(samples: np.ndarray, rate: int, frame_ms: int = 30, with_zcr: bool = True):
+    """
+    每帧的RMS能量（dBFS）和过零率（相邻采样符号变化的比例，0~1）
+
+    Returns:
+        (rms_db, zcr)，均为float32数组；with_zcr为False时zcr为None
+    """
+    n_frames = frame_count(samples, rate, frame_ms)
+    rms_db = np.empty(n_frames, dtype=np.float32)
+    zcr = np.empty(n_frames, dtype=np.float32) if with_zcr else None
+    for first, frames in frame_blocks(samples, rate, frame_ms):
+        power = np.square(frames).mean(axis=1)
+        rms_db[first:first + len(frames)] = 10 * np.log10(np.maximum(power, 1e-10))
+        if with_zcr:
+            signs = np.signbit(frames)
+            zcr[first:first + len(frames)] = (signs[:, 1:] != signs[:, :-1]).mean(axis=1) if frames.shape[1] > 1 else 0
+    return rms_db, zcr
+
+
+def voiced_frames(rms_db: np.ndarray, margin_db: float, min_db: float) -> np.ndarray:
+    """
+    按能量判断每帧是否有人声：阈值为底噪（能量第10百分位）加 margin_db，且不低于 min_db
+
+    Returns:
+        bool数组
+    """
+    if not len(rms_db):
+        return np.zeros(0, dtype=bool)
+    threshold = max(float(np.percentile(rms_db, 10)) + margin_db, min_db)
+    return rms_db >= threshold
+
+
+def write_wav_slices(samples: np.ndarray, rate: int, slices, output_path: str):
+    """把若干采样区间 [(开始采样, 结束采样)] 依次拼接写入16位PCM WAV"""
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    step = rate * _BLOCK_SECONDS
+    with wave.open(output_path, 'wb') as out:
+        out.setnchannels(channels)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        for start, end in slices:
+            for block_start in range(start, end, step):
+                out.writeframes(np.ascontiguousarray(samples[block_start:min(end, block_start + step)]).tobytes())
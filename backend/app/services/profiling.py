@@ -0,0 +1,142 @@
+import os
+import io
+import re
+import time
+import pstats
+import random
+import cProfile
+import logging
+from datetime import datetime
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from app.config import Config
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 文本摘要中列出的函数个数
+SUMMARY_LINES = 60
+
+_SAFE_NAME_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def should_profile() -> bool:
+    """请求头 X-Profile: 1 强制采样；否则按 PROFILE_SAMPLE_RATE 随机采样"""
+    if has_request_context():
+        header = request.headers.get(Config.PROFILE_HEADER, '')
+        if header.lower() in ('1', 'true', 'yes'):
+            return True
+    return Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE
+
+
+def _start_profiler():
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # 同一时刻只能有一个性能分析器生效（Python 3.12+），此时跳过本次采样
+        logger.info(f"跳过性能分析: {str(e)}")
+        return None
+    return profiler
+
+
+def _prune_profiles(profile_dir: str):
+    """只保留最近 PROFILE_MAX_FILES 份性能分析结果"""
+    names = sorted(n for n in os.listdir(profile_dir) if n.endswith('.prof'))
+    for name in names[:max(0, len(names) - Config.PROFILE_MAX_FILES)]:
+        for path in (os.path.join(profile_dir, name), os.path.join(profile_dir, name[:-5] + '.txt')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def save_profile(profiler: cProfile.Profile, kind: str, name: str, duration: float) -> str:
+    """
+    保存性能分析结果：.prof 为pstats二进制格式（可用snakeviz等工具查看），.txt 为按累计耗时排序的摘要
+
+    Returns:
+        结果文件名（不含扩展名）
+    """
+    profile_dir = Config.PROFILE_DIR
+    os.makedirs(profile_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    profile_id = f"{stamp}-{kind}-{_SAFE_NAME_RE.sub('_', name).strip('_')[:60]}"
+
+    profiler.dump_stats(os.path.join(profile_dir, f"{profile_id}.prof"))
+    summary = io.StringIO()
+    summary.write(f"{kind} {name}\n耗时: {duration:.3f}秒\n\n")
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    with open(os.path.join(profile_dir, f"{profile_id}.txt"), 'w', encoding='utf-8') as f:
+        f.write(summary.getvalue())
+
+    _prune_profiles(profile_dir)
+    logger.info(f"性能分析结果已保存: {profile_id}（{duration:.2f}秒）")
+    return profile_id
+
+
+@contextmanager
+def profile_block(kind: str, name: str, enabled: bool = True):
+    """对代码块做性能分析，enabled为False或分析器不可用时不做任何事"""
+    profiler = _start_profiler() if enabled else None
+    start = time.time()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            save_profile(profiler, kind, name, time.time() - start)
+
+
+def list_profiles(limit: int = 50) -> list:
+    """最近的性能分析结果，按时间倒序"""
+    profile_dir = Config.PROFILE_DIR
+    if not os.path.isdir(profile_dir):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(profile_dir), reverse=True):
+        if not filename.endswith('.prof'):
+            continue
+        profile_id = filename[:-5]
+        path = os.path.join(profile_dir, filename)
+        duration = None
+        summary_path = os.path.join(profile_dir, f"{profile_id}.txt")
+        if os.path.exists(summary_path):
+            with open(summary_path, 'r', encoding='utf-8') as f:
+                f.readline()
+                match = re.match(r'耗时: ([\d.]+)', f.readline())
+                duration = float(match.group(1)) if match else None
+        parts = profile_id.split('-', 4)
+        profiles.append({
+            'id': profile_id,
+            'kind': parts[3] if len(parts) > 3 else '',
+            'name': parts[4] if len(parts) > 4 else '',
+            'created_at': datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds'),
+            'duration': duration,
+            'size': os.path.getsize(path),
+        })
+        if len(profiles) >= limit:
+            break
+    return profiles
+
+
+def init_request_profiling(app):
+    """为Flask请求挂上采样性能分析：命中采样的请求在响应头 X-Profile-Id 中返回结果编号"""
+
+    @app.before_request
+    def _start_request_profile():
+        if request.path.startswith('/api/profiles') or not should_profile():
+            return
+        g._profiler = _start_profiler()
+        g._profile_start = time.time()
+
+    @app.after_request
+    def _stop_request_profile(response):
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            # 流式响应只统计到生成器返回为止，后续推送的内容不计入
+            profiler.disable()
+            name = f"{request.method}-{request.path}"
+            response.headers['X-Profile-Id'] = save_profile(profiler, 'request', name, time.time() - g._profile_start)
+        return response
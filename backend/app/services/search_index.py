@@ -0,0 +1,242 @@
+"""
+全部项目文字稿的全文检索索引（SQLite FTS5），独立于业务数据库存放在 Config.SEARCH_INDEX_PATH。
+
+每个发言行是一条记录：FTS5表 lines 只索引发言文本，发言人、阵营、阶段和时间戳存放在普通表 line_meta 中，
+两者rowid相同；排序和取详情分开，命中很多时只为前几条读取详情。
+中文没有空格分词，索引和查询时都在每个汉字两侧补空格，查询词按短语匹配（"归谬" 匹配相邻的"归""谬"两个字），
+排序使用FTS5内置的bm25。
+
+文字稿写入后调用 index_transcript 更新对应项目；检索前按文件修改时间同步一次，
+补上手动修改或在其他进程中写入的文字稿，并移除已删除的项目。
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from app.config import Config
+from app.services.transcript_utils import parse_transcript_lines
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 索引结构变化时递增，旧索引会被删除并从文字稿重建
+SCHEMA_VERSION = 1
+# 每个项目占用的rowid区间，rowid = 文档编号 * LINES_PER_DOC + 行号，按区间删除无需扫描全表
+LINES_PER_DOC = 1_000_000
+TRANSCRIPT_FILENAME = 'transcript.txt'
+
+_CJK_RE = re.compile(r'([㐀-䶿一-鿿豈-﫿])')
+
+_write_lock = threading.Lock()
+_last_sync = 0.0
+
+
+def _tokenize(text: str) -> str:
+    """汉字逐字切分，其余文本交给 unicode61 分词"""
+    return _CJK_RE.sub(r' \1 ', text)
+
+
+def _connect() -> sqlite3.Connection:
+    path = Config.SEARCH_INDEX_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        with _write_lock:
+            _create_schema(conn)
+    return conn
+
+
+@contextmanager
+def _open():
+    """打开索引连接，正常结束时提交"""
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _create_schema(conn: sqlite3.Connection):
+    if conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION:
+        return
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(f"""
+        DROP TABLE IF EXISTS documents;
+        DROP TABLE IF EXISTS lines;
+        DROP TABLE IF EXISTS line_meta;
+        CREATE TABLE documents (
+            doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id TEXT NOT NULL UNIQUE,
+            path TEXT NOT NULL,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            line_count INTEGER NOT NULL,
+            indexed_at REAL NOT NULL
+        );
+        CREATE VIRTUAL TABLE lines USING fts5(body, tokenize = 'unicode61');
+        CREATE TABLE line_meta (
+            id INTEGER PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            line_no INTEGER NOT NULL,
+            ts_ms INTEGER,
+            speaker TEXT NOT NULL,
+            camp TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            text TEXT NOT NULL
+        );
+        PRAGMA user_version = {SCHEMA_VERSION};
+    """)
+
+
+def _delete_document(conn: sqlite3.Connection, doc_id: int):
+    bounds = (doc_id * LINES_PER_DOC, (doc_id + 1) * LINES_PER_DOC)
+    conn.execute('DELETE FROM lines WHERE rowid >= ? AND rowid < ?', bounds)
+    conn.execute('DELETE FROM line_meta WHERE id >= ? AND id < ?', bounds)
+    conn.execute('DELETE FROM documents WHERE doc_id = ?', (doc_id,))
+
+
+def index_transcript(project_id: str, transcript_path: str, force: bool = False) -> int:
+    """
+    重建某个项目的索引，文字稿未变化（修改时间和大小相同）时跳过
+
+    Returns:
+        写入的发言行数，跳过时返回-1
+    """
+    stat = os.stat(transcript_path)
+    with _open() as conn, _write_lock:
+        row = conn.execute('SELECT doc_id, mtime, size FROM documents WHERE project_id = ?', (project_id,)).fetchone()
+        if row and not force and row['mtime'] == stat.st_mtime and row['size'] == stat.st_size:
+            return -1
+
+        with open(transcript_path, 'r', encoding='utf-8') as f:
+            lines = parse_transcript_lines(f.read())[:LINES_PER_DOC - 1]
+        if row:
+            _delete_document(conn, row['doc_id'])
+        cursor = conn.execute(
+            'INSERT INTO documents (project_id, path, mtime, size, line_count, indexed_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (project_id, os.path.abspath(transcript_path), stat.st_mtime, stat.st_size, len(lines), time.time()))
+        base = cursor.lastrowid * LINES_PER_DOC
+        conn.executemany('INSERT INTO lines (rowid, body) VALUES (?, ?)',
+                         [(base + line.line_no, _tokenize(line.text)) for line in lines])
+        conn.executemany(
+            'INSERT INTO line_meta (id, project_id, line_no, ts_ms, speaker, camp, stage, text) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(base + line.line_no, project_id, line.line_no, line.ts_ms,
+              line.speaker, line.camp, line.stage, line.text) for line in lines])
+    logger.info(f"已更新检索索引: {project_id}，{len(lines)} 行")
+    return len(lines)
+
+
+def remove_project(project_id: str):
+    with _open() as conn, _write_lock:
+        row = conn.execute('SELECT doc_id FROM documents WHERE project_id = ?', (project_id,)).fetchone()
+        if row:
+            _delete_document(conn, row['doc_id'])
+
+
+def sync(root: str = None, force: bool = False) -> dict:
+    """
+    与项目目录下的文字稿同步：新增或修改过的重新索引，目录已不存在的移除。
+    距上次同步不足 SEARCH_SYNC_INTERVAL_S 秒时跳过（force除外）
+    """
+    global _last_sync
+    now = time.time()
+    if not force and now - _last_sync < Config.SEARCH_SYNC_INTERVAL_S:
+        return {'indexed': 0, 'removed': 0, 'skipped': True}
+    _last_sync = now
+
+    root = root or Config.UPLOAD_FOLDER
+    present = {}
+    if os.path.isdir(root):
+        for entry in os.scandir(root):
+            path = os.path.join(entry.path, TRANSCRIPT_FILENAME)
+            if entry.is_dir() and os.path.isfile(path):
+                present[entry.name] = path
+
+    with _open() as conn:
+        known = {row['project_id']: row['doc_id'] for row in conn.execute('SELECT project_id, doc_id FROM documents')}
+    indexed = 0
+    for project_id, path in present.items():
+        try:
+            if index_transcript(project_id, path) >= 0:
+                indexed += 1
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"索引文字稿失败: {path}, 错误: {str(e)}")
+    removed = [project_id for project_id in known if project_id not in present]
+    for project_id in removed:
+        remove_project(project_id)
+    return {'indexed': indexed, 'removed': len(removed), 'skipped': False}
+
+
+def build_match_query(q: str) -> str:
+    """把用户输入转换为FTS5查询：空格分隔的每个词按短语匹配，多个词同时出现"""
+    phrases = []
+    for term in q.split():
+        tokens = _tokenize(term).replace('"', ' ').split()
+        if tokens:
+            phrases.append('"' + ' '.join(tokens) + '"')
+    return ' AND '.join(phrases)
+
+
+def search(q: str, camp: str = None, speaker: str = None, stage: str = None, project_id: str = None,
+           limit: int = 20, offset: int = 0) -> dict:
+    """
+    检索发言行，按相关度排序
+
+    Args:
+        camp: 阵营（正方/反方/主持人/评委/未知）精确匹配
+        speaker: 发言人包含该文本，如"一辩"
+        stage: 阶段名包含该文本，如"自由辩论"
+        project_id: 只在该项目中检索
+
+    Returns:
+        {'hits': [...], 'has_more': bool}
+    """
+    match = build_match_query(q)
+    if not match:
+        return {'hits': [], 'has_more': False}
+
+    # 先只按rowid排序取出当前页，再读取这几条的详情
+    filters = []
+    params = [match]
+    if camp:
+        filters.append('m.camp = ?')
+        params.append(camp)
+    if speaker:
+        filters.append('instr(m.speaker, ?) > 0')
+        params.append(speaker)
+    if stage:
+        filters.append('instr(m.stage, ?) > 0')
+        params.append(stage)
+    if project_id:
+        filters.append('m.project_id = ?')
+        params.append(project_id)
+    if filters:
+        ranked = ('SELECT lines.rowid AS id, bm25(lines) AS score FROM lines JOIN line_meta m ON m.id = lines.rowid '
+                  'WHERE lines MATCH ? AND ' + ' AND '.join(filters))
+    else:
+        ranked = 'SELECT rowid AS id, bm25(lines) AS score FROM lines WHERE lines MATCH ?'
+    params.extend([limit + 1, offset])
+    sql = (f"SELECT m.project_id, m.line_no, m.ts_ms, m.speaker, m.camp, m.stage, m.text, r.score "
+           f"FROM ({ranked} ORDER BY score LIMIT ? OFFSET ?) r JOIN line_meta m ON m.id = r.id ORDER BY r.score")
+
+    with _open() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    hits = [{
+        'project_id': row['project_id'],
+        'line_no': row['line_no'],
+        'timestamp': row['ts_ms'] / 1000 if row['ts_ms'] is not None else None,
+        'speaker': row['speaker'],
+        'camp': row['camp'],
+        'stage': row['stage'],
+        'text': row['text'],
+        'score': round(-row['score'], 4),
+        'link': f"/project/{row['project_id']}" + (f"?t={row['ts_ms'] // 1000}" if row['ts_ms'] is not None else ''),
+    } for row in rows[:limit]]
+    return {'hits': hits, 'has_more': len(rows) > limit}
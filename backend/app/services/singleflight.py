@@ -0,0 +1,144 @@
+"""
+请求合并（single-flight）：相同键的计算同一时刻只执行一次，之后到达的调用者等待并共享同一结果。
+
+键一般为 (操作, 任务ID, 输入哈希)，例如两个浏览器标签页同时请求同一任务的树形分析，
+或者后台流水线和用户点击同时触发分析时，只调用一次大模型，也不会有两个线程同时写同一个结果文件。
+计算结束后键即被移除，之后的请求重新执行（通常会直接命中已写入的结果）。
+"""
+import logging
+import threading
+from typing import Callable, Hashable, Iterator
+from app.services.metrics import SINGLEFLIGHT_SHARED
+from app.services.tracing import propagate
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """合并返回单个结果的调用"""
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key: Hashable, fn: Callable):
+        """
+        执行fn()，相同key已在执行时等待其结果
+
+        Returns:
+            (结果, 是否共享了其他调用者的计算)；fn抛出的异常会同样抛给所有等待者
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            SINGLEFLIGHT_SHARED.inc(operation=self.operation)
+            logger.info(f"{self.operation} 已有相同请求在执行，等待其结果: {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+
+class _Broadcast:
+    """一次流式计算的全部输出，订阅者从头回放并继续接收新产出的内容"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.items = []
+        self.finished = False
+        self.error = None
+
+    def publish(self, item):
+        with self.cond:
+            self.items.append(item)
+            self.cond.notify_all()
+
+    def finish(self, error: BaseException = None):
+        with self.cond:
+            self.finished = True
+            self.error = error
+            self.cond.notify_all()
+
+    def subscribe(self) -> Iterator:
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.items) and not self.finished:
+                    self.cond.wait()
+                pending = self.items[index:]
+                index = len(self.items)
+                finished, error = self.finished, self.error
+            yield from pending
+            if finished and index >= len(self.items):
+                if error is not None:
+                    raise error
+                return
+
+
+class StreamFlight:
+    """
+    合并流式调用：第一个调用者在后台线程中运行生产函数，所有调用者（包括它自己）订阅同一份输出。
+    生产函数不依赖任何一个客户端连接，某个客户端断开不会中断其他订阅者
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.lock = threading.Lock()
+        self.broadcasts = {}
+
+    def stream(self, key: Hashable, produce: Callable[[Callable], None]) -> Iterator:
+        """
+        订阅key对应的流，没有进行中的流时在后台线程中调用 produce(publish) 创建
+
+        Args:
+            produce: 通过 publish(item) 逐个发布输出；抛出的异常在订阅者读完已发布的内容后抛出
+        """
+        with self.lock:
+            broadcast = self.broadcasts.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self.broadcasts[key] = _Broadcast()
+
+        if leader:
+            threading.Thread(target=propagate(self._produce), args=(key, produce, broadcast), daemon=True).start()
+        else:
+            SINGLEFLIGHT_SHARED.inc(operation=self.operation)
+            logger.info(f"{self.operation} 已有相同请求在执行，共享其输出: {key}")
+        return broadcast.subscribe()
+
+    def _produce(self, key, produce, broadcast: _Broadcast):
+        error = None
+        try:
+            produce(broadcast.publish)
+        except BaseException as e:
+            logger.error(f"{self.operation} 执行失败: {str(e)}")
+            error = e
+        finally:
+            with self.lock:
+                self.broadcasts.pop(key, None)
+            broadcast.finish(error)
@@ -0,0 +1,192 @@
+"""
+本地计算的语速和停顿指标，代替让大模型判断"语速（快/中/慢）"。
+
+每句话的时长来自文字稿时间戳（见 stats_service.parse_segments）；有 audio.wav 时按帧RMS能量判断人声，
+语速按实际发声时长计算，并统计句中超过 SPEECH_PAUSE_MIN_S 秒的停顿。
+结果按句保存为项目目录下的 speech_metrics.json，文字稿或音频变化后重新计算，并合并进分析结果的节点。
+"""
+import os
+import json
+import bisect
+import logging
+import numpy as np
+from app.config import Config
+from app.services import artifact_gc
+from app.services.analysis_shards import file_hash
+from app.services.file_utils import atomic_write_json
+from app.services.pcm import WavFormatError, open_wav, frame_rms_db, voiced_frames
+from app.services.stats_service import parse_segments
+from app.services.transcript_utils import ts_to_ms
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SPEECH_METRICS_FILENAME = 'speech_metrics.json'
+# 计算方式变化时递增，旧结果会被重新计算
+METRICS_VERSION = 1
+# 发声时长不足该秒数的句子不计算语速
+_MIN_SPEAKING_S = 0.5
+
+
+def speed_label(chars_per_min):
+    """按每分钟字数划分快/中/慢"""
+    if chars_per_min is None:
+        return None
+    if chars_per_min < Config.SPEECH_SLOW_CPM:
+        return 'slow'
+    if chars_per_min > Config.SPEECH_FAST_CPM:
+        return 'fast'
+    return 'medium'
+
+
+def _format_ts(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"[{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}]"
+
+
+def _audio_signature(audio_path: str):
+    if not audio_path or not os.path.exists(audio_path):
+        return None
+    stat = os.stat(audio_path)
+    return [stat.st_size, stat.st_mtime]
+
+
+def _voice_activity(audio_path: str, starts: np.ndarray, ends: np.ndarray):
+    """
+    按句统计发声时长和句中停顿
+
+    Returns:
+        (发声秒数, 停顿次数, 停顿总秒数)，音频不可用时返回None
+    """
+    try:
+        samples, rate = open_wav(audio_path)
+    except (OSError, WavFormatError) as e:
+        logger.warning(f"无法读取音频，语速按文字稿时间戳估算: {str(e)}")
+        return None
+    frame_s = Config.SPEECH_FRAME_MS / 1000
+    voiced = voiced_frames(frame_rms_db(samples, rate, Config.SPEECH_FRAME_MS),
+                           Config.SPEECH_VAD_MARGIN_DB, Config.SPEECH_VAD_MIN_DB)
+    if not voiced.any():
+        logger.warning(f"音频中未检测到人声，语速按文字稿时间戳估算: {audio_path}")
+        return None
+    n = len(voiced)
+    first = np.clip((starts / frame_s).astype(np.int64), 0, n)
+    last = np.clip((ends / frame_s).astype(np.int64), 0, n)
+
+    # 前缀和求每句内的发声帧数
+    voiced_cum = np.concatenate([[0], np.cumsum(voiced, dtype=np.int64)])
+    voiced_s = (voiced_cum[last] - voiced_cum[first]) * frame_s
+
+    # 无声帧的连续区间，长度达到阈值的是停顿，按开始帧归入所在的句子
+    edges = np.diff(np.concatenate([[1], voiced.astype(np.int8), [1]]))
+    run_starts = np.flatnonzero(edges == -1)
+    run_lengths = np.flatnonzero(edges == 1) - run_starts
+    keep = run_lengths * frame_s >= Config.SPEECH_PAUSE_MIN_S
+    run_starts, run_lengths = run_starts[keep], run_lengths[keep]
+    length_cum = np.concatenate([[0], np.cumsum(run_lengths)])
+    lo = np.searchsorted(run_starts, first, side='left')
+    hi = np.searchsorted(run_starts, last, side='left')
+    pause_count = hi - lo
+    pause_s = (length_cum[hi] - length_cum[lo]) * frame_s
+    return voiced_s, pause_count, pause_s
+
+
+def compute_speech_metrics(transcript_path: str, audio_path: str = None) -> dict:
+    """按句计算语速和停顿"""
+    with open(transcript_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    segments = parse_segments(text)
+    starts, ends, chars = segments['start'], segments['end'], segments['chars']
+    speakers = segments['speakers'][segments['speaker']] if len(starts) else []
+
+    activity = _voice_activity(audio_path, starts, ends) if _audio_signature(audio_path) and len(starts) else None
+    speaking_s = activity[0] if activity else ends - starts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cpm = np.where(speaking_s >= _MIN_SPEAKING_S, chars / speaking_s * 60, np.nan)
+
+    rows = []
+    for i in range(len(starts)):
+        rate = None if np.isnan(cpm[i]) else round(float(cpm[i]), 1)
+        row = {
+            'global_fs': _format_ts(starts[i]),
+            'start_s': float(starts[i]),
+            'end_s': round(float(ends[i]), 2),
+            'speaker': str(speakers[i]),
+            'chars': int(chars[i]),
+            'speaking_s': round(float(speaking_s[i]), 2),
+            'chars_per_min': rate,
+            'speaking_speed': speed_label(rate),
+        }
+        if activity:
+            row['pause_count'] = int(activity[1][i])
+            row['pause_total_s'] = round(float(activity[2][i]), 2)
+        rows.append(row)
+
+    return {
+        'version': METRICS_VERSION,
+        'transcript_hash': file_hash(transcript_path),
+        'audio': _audio_signature(audio_path),
+        'source': 'audio' if activity else 'timestamps',
+        'segments': rows,
+    }
+
+
+def load_or_compute(transcript_path: str, audio_path: str = None) -> dict:
+    """读取项目目录下已保存的指标，文字稿或音频变化后重新计算并保存"""
+    if audio_path is None:
+        audio_path = os.path.join(os.path.dirname(transcript_path), 'audio.wav')
+    metrics_path = os.path.join(os.path.dirname(transcript_path), SPEECH_METRICS_FILENAME)
+    if os.path.exists(metrics_path):
+        try:
+            with open(metrics_path, 'r', encoding='utf-8') as f:
+                metrics = json.load(f)
+            # 音频被 temp/ 回收删除后沿用已保存的指标，不退化为只按文字稿计算
+            audio_evicted = not os.path.exists(audio_path) and \
+                artifact_gc.is_evicted(os.path.dirname(audio_path), os.path.basename(audio_path))
+            if metrics.get('version') == METRICS_VERSION and \
+                    metrics.get('transcript_hash') == file_hash(transcript_path) and \
+                    (audio_evicted or metrics.get('audio') == _audio_signature(audio_path)):
+                return metrics
+        except (OSError, ValueError):
+            pass
+
+    metrics = compute_speech_metrics(transcript_path, audio_path)
+    atomic_write_json(metrics_path, metrics, indent=2)
+    logger.info(f"语速指标已保存: {metrics_path}（{len(metrics['segments'])} 句，来源 {metrics['source']}）")
+    return metrics
+
+
+class SpeechAnnotator:
+    """按时间戳把语速指标附加到分析节点上"""
+
+    def __init__(self, metrics: dict):
+        self.segments = metrics['segments']
+        self.starts = [segment['start_s'] for segment in self.segments]
+
+    def annotate(self, node: dict) -> dict:
+        ms = ts_to_ms(str(node.get('global_fs', '')))
+        if ms is None or not self.segments:
+            return node
+        index = bisect.bisect_right(self.starts, ms / 1000) - 1
+        if index < 0:
+            return node
+        segment = self.segments[index]
+        node['speaking_speed'] = segment['speaking_speed']
+        node['speech'] = {key: segment[key] for key in ('chars_per_min', 'speaking_s', 'pause_count', 'pause_total_s')
+                          if key in segment}
+        return node
+
+    def annotate_result(self, result: str) -> str:
+        """给分析结果JSON中的每个节点附加指标，结果无法解析时原样返回"""
+        try:
+            data = json.loads(result)
+        except ValueError:
+            return result
+        nodes = data.get('analysis') if isinstance(data, dict) else data
+        if not isinstance(nodes, list):
+            return result
+        for node in nodes:
+            if isinstance(node, dict):
+                self.annotate(node)
+        return json.dumps(data, ensure_ascii=False, indent=2)
@@ -0,0 +1,239 @@
+"""
+跨场次的讲者统计：发言时长、每分钟字数、发言轮次和打断密度，按发言人和阵营汇总。
+
+每份文字稿解析为一组等长的NumPy数组（开始、结束、发言人编号、阵营编号、字数），按文字稿哈希缓存在内存中，
+并写入文字稿旁的 stats.npz，重启后无需重新解析；多场汇总时拼接数组，用 bincount 一次完成分组求和。
+
+时长的估算方式：一句话从它的时间戳持续到下一句的时间戳，最长不超过 STATS_MAX_SEGMENT_S 秒
+（中场休息、换场等空档不计入发言时长）；最后一句按字数和 STATS_DEFAULT_CHARS_PER_S 估算。
+连续的同一发言人的句子合并为一个轮次；上一轮次不足 STATS_INTERRUPT_WINDOW_S 秒就被对方阵营接过话头，
+记为一次打断，打断密度为每分钟发言时长中的打断次数。
+"""
+import os
+import logging
+import threading
+import numpy as np
+from app.config import Config
+from app.services.analysis_shards import file_hash
+from app.services.transcript_utils import parse_transcript_lines
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 阵营编号
+CAMPS = ('正方', '反方', '主持人', '评委', '未知')
+_CAMP_CODES = {camp: code for code, camp in enumerate(CAMPS)}
+# 对方阵营之间的接话才算打断
+_DEBATER_CAMPS = (_CAMP_CODES['正方'], _CAMP_CODES['反方'])
+
+STATS_FILENAME = 'stats.npz'
+# 缓存格式变化时递增，旧的 stats.npz 会被忽略并重新生成
+STATS_VERSION = 1
+
+_cache_lock = threading.Lock()
+_by_path = {}   # 文字稿路径 -> (mtime, size, 哈希)
+_by_hash = {}   # 文字稿哈希 -> 数组
+
+
+def parse_segments(text: str) -> dict:
+    """
+    把文字稿解析为按句的数组，只保留带时间戳和发言人的句子
+
+    Returns:
+        {'start', 'end'（秒，float64）, 'speaker'（发言人编号，int32）, 'speakers'（发言人名，str数组）,
+         'camp'（阵营编号，int8）, 'chars'（字数，int32）}
+    """
+    lines = [line for line in parse_transcript_lines(text) if line.ts_ms is not None and line.speaker]
+    start = np.array([line.ts_ms / 1000 for line in lines], dtype=np.float64)
+    chars = np.array([len(line.text) for line in lines], dtype=np.int32)
+    speakers, speaker = np.unique(np.array([line.speaker for line in lines], dtype=str), return_inverse=True)
+    camp = np.array([_CAMP_CODES.get(line.camp, _CAMP_CODES['未知']) for line in lines], dtype=np.int8)
+
+    # 每句持续到下一句开始，空档和时间戳回退的情况截断到 [0, STATS_MAX_SEGMENT_S]
+    end = np.empty_like(start)
+    if len(start):
+        end[:-1] = start[1:]
+        end[-1] = start[-1] + chars[-1] / Config.STATS_DEFAULT_CHARS_PER_S
+    end = start + np.clip(end - start, 0, Config.STATS_MAX_SEGMENT_S)
+    return {
+        'start': start,
+        'end': end,
+        'speaker': speaker.astype(np.int32),
+        'speakers': speakers,
+        'camp': camp,
+        'chars': chars,
+    }
+
+
+def _load_npz(path: str, digest: str):
+    try:
+        with np.load(path) as data:
+            if str(data['hash']) != digest or int(data['version']) != STATS_VERSION:
+                return None
+            return {key: data[key] for key in ('start', 'end', 'speaker', 'speakers', 'camp', 'chars')}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save_npz(path: str, digest: str, segments: dict):
+    tmp_path = f"{path}.tmp.npz"
+    try:
+        np.savez(tmp_path, hash=np.array(digest), version=np.array(STATS_VERSION), **segments)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"保存统计缓存失败: {path}, 错误: {str(e)}")
+
+
+def load_segments(transcript_path: str) -> dict:
+    """
+    读取文字稿的按句数组。文件修改时间和大小未变时直接使用内存缓存；
+    内容哈希未变时使用内存或 stats.npz 中的结果，否则重新解析
+    """
+    stat = os.stat(transcript_path)
+    with _cache_lock:
+        known = _by_path.get(transcript_path)
+        if known and known[:2] == (stat.st_mtime, stat.st_size) and known[2] in _by_hash:
+            return _by_hash[known[2]]
+
+    digest = file_hash(transcript_path)
+    segments = _by_hash.get(digest)
+    if segments is None:
+        npz_path = os.path.join(os.path.dirname(transcript_path), STATS_FILENAME)
+        segments = _load_npz(npz_path, digest)
+        if segments is None:
+            with open(transcript_path, 'r', encoding='utf-8') as f:
+                segments = parse_segments(f.read())
+            _save_npz(npz_path, digest, segments)
+    with _cache_lock:
+        previous = _by_path.get(transcript_path)
+        _by_path[transcript_path] = (stat.st_mtime, stat.st_size, digest)
+        _by_hash[digest] = segments
+        # 文字稿被修改后，旧内容的结果不再被任何文字稿引用时释放
+        if previous and previous[2] != digest and all(entry[2] != previous[2] for entry in _by_path.values()):
+            _by_hash.pop(previous[2], None)
+    return segments
+
+
+def _turn_arrays(segments: dict):
+    """
+    按句标记轮次：同一发言人的连续句子为一个轮次
+
+    Returns:
+        (每句是否为轮次开始, 每句是否为打断)
+    """
+    speaker, camp = segments['speaker'], segments['camp']
+    n = len(speaker)
+    turn_start = np.ones(n, dtype=bool)
+    turn_start[1:] = speaker[1:] != speaker[:-1]
+
+    # 每个轮次的时长，回填到该轮次之后的第一句上，判断是否为打断
+    turn_id = np.cumsum(turn_start) - 1
+    turn_duration = np.bincount(turn_id, weights=segments['end'] - segments['start']) if n else np.zeros(0)
+    interrupted = np.zeros(n, dtype=bool)
+    starts = np.flatnonzero(turn_start)[1:]
+    if len(starts):
+        prev_camp = camp[starts - 1]
+        cross_camp = (camp[starts] != prev_camp) & np.isin(camp[starts], _DEBATER_CAMPS) & \
+            np.isin(prev_camp, _DEBATER_CAMPS)
+        quick = turn_duration[turn_id[starts] - 1] < Config.STATS_INTERRUPT_WINDOW_S
+        interrupted[starts] = cross_camp & quick
+    return turn_start, interrupted
+
+
+def _aggregate(codes: np.ndarray, size: int, duration, chars, turns, interruptions, debates) -> dict:
+    """按编号分组求和"""
+    talk_time = np.bincount(codes, weights=duration, minlength=size)
+    total_chars = np.bincount(codes, weights=chars, minlength=size)
+    minutes = talk_time / 60
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chars_per_min = np.where(minutes > 0, total_chars / minutes, 0)
+        interruptions_per_min = np.where(minutes > 0, np.bincount(codes, weights=interruptions, minlength=size) / minutes, 0)
+    return {
+        'talk_time_s': talk_time,
+        'chars': total_chars,
+        'chars_per_min': chars_per_min,
+        'turns': np.bincount(codes, weights=turns, minlength=size),
+        'interruptions': np.bincount(codes, weights=interruptions, minlength=size),
+        'interruptions_per_min': interruptions_per_min,
+        'debates': debates,
+    }
+
+
+def _rows(names, aggregates: dict, extra: list = None) -> list:
+    rows = []
+    for i, name in enumerate(names):
+        if aggregates['talk_time_s'][i] == 0 and aggregates['turns'][i] == 0:
+            continue
+        row = {'name': str(name)}
+        row.update(extra[i] if extra else {})
+        row.update({
+            'talk_time_s': round(float(aggregates['talk_time_s'][i]), 1),
+            'chars': int(aggregates['chars'][i]),
+            'chars_per_min': round(float(aggregates['chars_per_min'][i]), 1),
+            'turns': int(aggregates['turns'][i]),
+            'interruptions': int(aggregates['interruptions'][i]),
+            'interruptions_per_min': round(float(aggregates['interruptions_per_min'][i]), 3),
+            'debates': int(aggregates['debates'][i]),
+        })
+        rows.append(row)
+    rows.sort(key=lambda row: row['talk_time_s'], reverse=True)
+    return rows
+
+
+def compute_stats(transcript_paths: list) -> dict:
+    """
+    汇总多场文字稿的讲者统计
+
+    Returns:
+        {'debates': 场次, 'segments': 句数, 'speakers': [按发言人], 'camps': [按阵营]}
+    """
+    docs = [load_segments(path) for path in transcript_paths]
+    docs = [doc for doc in docs if len(doc['start'])]
+    if not docs:
+        return {'debates': 0, 'segments': 0, 'speakers': [], 'camps': []}
+
+    # 各场的发言人编号映射到全局编号
+    names, local_to_global = np.unique(np.concatenate([doc['speakers'] for doc in docs]), return_inverse=True)
+    offsets = np.cumsum([0] + [len(doc['speakers']) for doc in docs])
+    speaker = np.concatenate([local_to_global[offsets[i]:offsets[i + 1]][doc['speaker']] for i, doc in enumerate(docs)])
+    doc_index = np.concatenate([np.full(len(doc['start']), i, dtype=np.int32) for i, doc in enumerate(docs)])
+    camp = np.concatenate([doc['camp'] for doc in docs]).astype(np.intp)
+    duration = np.concatenate([doc['end'] - doc['start'] for doc in docs])
+    chars = np.concatenate([doc['chars'] for doc in docs])
+    turn_start, interrupted = (np.concatenate(parts) for parts in zip(*(_turn_arrays(doc) for doc in docs)))
+
+    # 参与场次：去重后的 (场次, 编号) 组合按编号计数
+    def debates_per(codes, size):
+        pairs = np.unique(doc_index.astype(np.int64) * size + codes)
+        return np.bincount(pairs % size, minlength=size)
+
+    speaker_stats = _aggregate(speaker, len(names), duration, chars, turn_start, interrupted,
+                               debates_per(speaker, len(names)))
+    camp_stats = _aggregate(camp, len(CAMPS), duration, chars, turn_start, interrupted,
+                            debates_per(camp, len(CAMPS)))
+
+    # 发言人所属阵营取其最多的句子所在阵营
+    speaker_camp = np.zeros((len(names), len(CAMPS)), dtype=np.int64)
+    np.add.at(speaker_camp, (speaker, camp), 1)
+    camp_of = [{'camp': CAMPS[code]} for code in speaker_camp.argmax(axis=1)]
+
+    return {
+        'debates': len(docs),
+        'segments': int(len(duration)),
+        'speakers': _rows(names, speaker_stats, camp_of),
+        'camps': _rows(CAMPS, camp_stats),
+    }
+
+
+def project_transcripts(project_ids: list = None, root: str = None) -> dict:
+    """项目编号 -> 文字稿路径；不指定项目时返回全部有文字稿的项目"""
+    root = root or Config.UPLOAD_FOLDER
+    if project_ids is None:
+        project_ids = [entry.name for entry in os.scandir(root) if entry.is_dir()] if os.path.isdir(root) else []
+    paths = {}
+    for project_id in project_ids:
+        path = os.path.join(root, os.path.basename(project_id), 'transcript.txt')
+        if os.path.isfile(path):
+            paths[project_id] = path
+    return paths
@@ -0,0 +1,138 @@
+"""
+轻量级链路追踪：每次项目处理是一条trace，各步骤、每个音频段、每次上传/生成调用是嵌套的span。
+
+span按 Chrome Trace Event 格式逐行追加写入 Config.TRACE_FILE：文件以"["开头，之后每行一个事件，
+可直接用 chrome://tracing 或 https://ui.perfetto.dev 打开。每条trace显示为一个进程，线程各占一行。
+
+未开启（TRACE_ENABLED）时 span() 直接返回共享的空对象，不计时也不写文件。
+"""
+import os
+import json
+import time
+import uuid
+import zlib
+import threading
+import contextvars
+from app.config import Config
+
+_enabled = Config.TRACE_ENABLED
+_current = contextvars.ContextVar('debatelens_span', default=None)
+
+
+class _NoopSpan:
+    """追踪关闭时使用的空span"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Exporter:
+    """线程安全地把事件逐行追加到追踪文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def write(self, event: dict):
+        line = json.dumps(event, ensure_ascii=False)
+        with self.lock:
+            if self.file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                self.file = open(self.path, 'a', encoding='utf-8', buffering=1)
+                if new_file:
+                    self.file.write('[\n')
+            self.file.write(line + ',\n')
+
+
+_exporter = _Exporter(Config.TRACE_FILE)
+
+
+class Span:
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        parent = _current.get()
+        self.parent = parent
+        self.span_id = uuid.uuid4().hex[:16]
+        if parent is None:
+            # 没有父span时开启一条新trace
+            self.trace_id = uuid.uuid4().hex
+            self.pid = zlib.crc32(self.trace_id.encode()) & 0x7fffffff
+        else:
+            self.trace_id = parent.trace_id
+            self.pid = parent.pid
+        self.token = None
+        self.start = 0.0
+
+    def set(self, **attributes):
+        """补充属性，如字节数、结果长度"""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start = time.time()
+        self.token = _current.set(self)
+        if self.parent is None:
+            _exporter.write({
+                'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+                'args': {'name': f"{self.name} {self.attributes.get('video_id', '')}".strip()},
+            })
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.time()
+        _current.reset(self.token)
+        args = dict(self.attributes)
+        args.update(trace_id=self.trace_id, span_id=self.span_id)
+        if self.parent is not None:
+            args['parent_id'] = self.parent.span_id
+        if exc is not None:
+            args['error'] = f"{exc_type.__name__}: {exc}"
+        _exporter.write({
+            'name': self.name,
+            'cat': 'debatelens',
+            'ph': 'X',
+            'ts': int(self.start * 1_000_000),
+            'dur': int((end - self.start) * 1_000_000),
+            'pid': self.pid,
+            'tid': threading.get_ident(),
+            'args': args,
+        })
+        return False
+
+
+def span(name: str, **attributes):
+    """
+    记录一个span，用法：
+        with span('upload', bytes=size, attempt=1) as s:
+            ...
+            s.set(chars=len(text))
+    当前线程没有进行中的span时开启新的trace
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attributes)
+
+
+def propagate(fn):
+    """
+    让fn在调用propagate时的追踪上下文中运行，用于交给线程池或新线程的任务；追踪关闭时原样返回。
+    每个任务需要单独调用一次（同一个上下文不能被多个线程同时进入）
+    """
+    if not _enabled:
+        return fn
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return run
@@ -0,0 +1,201 @@
+"""
+文字稿导出为 SRT、WebVTT、JSONL 或纯文本，逐行解析、逐行生成，内存占用与文字稿大小无关。
+
+每句的结束时间为下一句的开始时间，与讲者统计一致最长不超过 STATS_MAX_SEGMENT_S 秒；
+最后一句按字数和 STATS_DEFAULT_CHARS_PER_S 估算。没有时间戳的行只出现在 JSONL 和纯文本中。
+只读取到打开时的文件大小，流式转录仍在追加的文字稿也能导出一致的内容。
+纯文本原样输出，Content-Length 即文件大小；其他格式第一次导出时边生成边计数、不带 Content-Length，
+导出完成后按 (路径, 修改时间, 文件大小, 格式) 缓存字节数，同一文字稿再次导出时带 Content-Length。
+"""
+import io
+import json
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import IO, Iterator, Optional, Tuple
+from app.config import Config
+from app.services.transcript_utils import TranscriptLine, iter_transcript_lines
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 格式 -> (Content-Type, 扩展名)
+FORMATS = {
+    'srt': ('application/x-subrip; charset=utf-8', '.srt'),
+    'vtt': ('text/vtt; charset=utf-8', '.vtt'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', '.jsonl'),
+    'txt': ('text/plain; charset=utf-8', '.txt'),
+}
+# 合并为约64KB一块写出，减少小块写入的开销
+_BUFFER_SIZE = 64 * 1024
+# 带时间戳的行之后最多暂存这么多无时间戳的行，超过时按字数估算该句的结束时间，保证内存占用有上限
+_MAX_PENDING_LINES = 1000
+# 最多缓存的 Content-Length 条数
+_LENGTH_CACHE_SIZE = 256
+
+_length_cache = OrderedDict()
+_length_cache_lock = threading.Lock()
+
+
+def _estimated_end(line: TranscriptLine, max_ms: int) -> int:
+    return line.ts_ms + max(0, min(int(len(line.text) / Config.STATS_DEFAULT_CHARS_PER_S * 1000), max_ms))
+
+
+def _timed_lines(f: IO[str]) -> Iterator[Tuple[TranscriptLine, Optional[int]]]:
+    """产出 (发言行, 结束毫秒)，向后多读一个带时间戳的行以确定结束时间；没有时间戳的行结束时间为None"""
+    max_ms = int(Config.STATS_MAX_SEGMENT_S * 1000)
+    held = None
+    untimed = []
+    for line in iter_transcript_lines(f):
+        if line.ts_ms is None:
+            if held is None:
+                yield line, None
+                continue
+            # 排在待定的上一句之后输出，保持原顺序
+            untimed.append(line)
+            if len(untimed) >= _MAX_PENDING_LINES:
+                yield held, _estimated_end(held, max_ms)
+                yield from ((pending, None) for pending in untimed)
+                held = None
+                untimed = []
+            continue
+        if held is not None:
+            yield held, held.ts_ms + max(0, min(line.ts_ms - held.ts_ms, max_ms))
+            yield from ((pending, None) for pending in untimed)
+            untimed = []
+        held = line
+    if held is not None:
+        yield held, _estimated_end(held, max_ms)
+        yield from ((pending, None) for pending in untimed)
+
+
+def _clock(ms: int, separator: str) -> str:
+    seconds, ms = divmod(ms, 1000)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}{separator}{ms:03d}"
+
+
+def _vtt_escape(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _render_text(fmt: str, f: IO[str]) -> Iterator[str]:
+    if fmt == 'txt':
+        yield from f
+        return
+    if fmt == 'vtt':
+        yield 'WEBVTT\n\n'
+    index = 0
+    for line, end_ms in _timed_lines(f):
+        if fmt == 'jsonl':
+            yield json.dumps({
+                'line_no': line.line_no,
+                'stage': line.stage,
+                'start_ms': line.ts_ms,
+                'end_ms': end_ms,
+                'speaker': line.speaker,
+                'camp': line.camp,
+                'text': line.text,
+            }, ensure_ascii=False) + '\n'
+            continue
+        if line.ts_ms is None:
+            continue
+        index += 1
+        if fmt == 'srt':
+            yield f"{index}\n{_clock(line.ts_ms, ',')} --> {_clock(end_ms, ',')}\n{line.speaker}: {line.text}\n\n"
+        else:
+            yield (f"{index}\n{_clock(line.ts_ms, '.')} --> {_clock(end_ms, '.')}\n"
+                   f"<v {_vtt_escape(line.speaker)}>{_vtt_escape(line.text)}\n\n")
+
+
+def render(fmt: str, f: IO[str]) -> Iterator[bytes]:
+    """从文件当前位置开始逐块产出导出内容（UTF-8）"""
+    buffer = []
+    size = 0
+    for piece in _render_text(fmt, f):
+        data = piece.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= _BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class _SnapshotReader(io.RawIOBase):
+    """只读到打开时的文件大小，之后追加的内容不读取"""
+
+    def __init__(self, raw, size: int):
+        self.raw = raw
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+        n = self.raw.readinto(memoryview(buffer)[:min(len(buffer), self.remaining)]) or 0
+        self.remaining -= n
+        return n
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def _cached_length(key) -> Optional[int]:
+    with _length_cache_lock:
+        length = _length_cache.get(key)
+        if length is not None:
+            _length_cache.move_to_end(key)
+        return length
+
+
+def _cache_length(key, length: int):
+    with _length_cache_lock:
+        _length_cache[key] = length
+        while len(_length_cache) > _LENGTH_CACHE_SIZE:
+            _length_cache.popitem(last=False)
+
+
+def export_stream(fmt: str, path: str) -> Tuple[Optional[int], Iterator[bytes]]:
+    """
+    打开文字稿，返回 (字节数, 内容迭代器)；字节数未知（该格式第一次导出）时为None。
+    迭代结束或中途关闭时关闭文件
+
+    Raises:
+        ValueError: 不支持的格式
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}，可选 {', '.join(FORMATS)}")
+    raw = open(path, 'rb', buffering=0)
+    try:
+        stat = os.fstat(raw.fileno())
+        snapshot = io.BufferedReader(_SnapshotReader(raw, stat.st_size), _BUFFER_SIZE)
+    except Exception:
+        raw.close()
+        raise
+
+    if fmt == 'txt':
+        def generate_raw():
+            with snapshot:
+                yield from iter(lambda: snapshot.read(_BUFFER_SIZE), b'')
+        return stat.st_size, generate_raw()
+
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, fmt)
+    length = _cached_length(key)
+
+    def generate():
+        written = 0
+        # 截断在多字节字符中间的最后一行（仍在追加的文字稿）按替换字符输出
+        with io.TextIOWrapper(snapshot, encoding='utf-8', errors='replace', newline=None) as f:
+            for chunk in render(fmt, f):
+                written += len(chunk)
+                yield chunk
+        if length is None:
+            _cache_length(key, written)
+    return length, generate()
@@ -0,0 +1,148 @@
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# 阶段标题行，如：### **辩论阶段：正方立论**（文字稿中优化后可能带句号）
+STAGE_HEADER_RE = re.compile(r'^###\s*\*\*?辩论阶段[：:]([^*]+?)\*\*?[。]?$')
+
+# 时间戳，支持[mm:ss]和[hh:mm:ss]
+TIMESTAMP_RE = re.compile(r'\[(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?\]')
+
+
+def parse_stage_header(line: str) -> Optional[str]:
+    """若该行是阶段标题则返回阶段名，否则返回None"""
+    match = STAGE_HEADER_RE.match(line.strip())
+    return match.group(1).strip() if match else None
+
+
+def ts_to_ms(ts: str) -> Optional[int]:
+    """将[hh:mm:ss]或[mm:ss]格式的时间戳转换为毫秒，无法解析时返回None"""
+    match = TIMESTAMP_RE.search(ts or '')
+    if not match:
+        return None
+    a, b, c = match.groups()
+    if c is None:
+        seconds = int(a) * 60 + int(b)
+    else:
+        seconds = int(a) * 3600 + int(b) * 60 + int(c)
+    return seconds * 1000
+
+
+def split_stages(text: str) -> List[Tuple[str, str]]:
+    """
+    按阶段标题切分文字稿
+
+    Returns:
+        [(阶段名, 阶段文本)]，阶段文本包含标题行；第一个标题之前的内容并入第一个阶段
+    """
+    stages = []
+    preamble = []
+    current_name = None
+    current_lines = []
+    for line in text.splitlines():
+        name = parse_stage_header(line)
+        if name is not None:
+            if current_name is not None:
+                stages.append((current_name, '\n'.join(current_lines)))
+                current_lines = []
+            else:
+                preamble = current_lines
+                current_lines = []
+            current_name = name
+        current_lines.append(line)
+    if current_name is None:
+        return [("", '\n'.join(current_lines))] if current_lines else []
+    stages.append((current_name, '\n'.join(current_lines)))
+    if any(l.strip() for l in preamble):
+        first_name, first_text = stages[0]
+        stages[0] = (first_name, '\n'.join(preamble) + '\n' + first_text)
+    return stages
+
+
+def split_time_windows(text: str, window_ms: int) -> List[Tuple[str, str]]:
+    """按时间窗口切分文字稿（用于没有阶段标题的文字稿），无时间戳的行归入当前窗口"""
+    windows = []
+    current_lines = []
+    window_end = None
+    for line in text.splitlines():
+        ms = ts_to_ms(line[:12]) if line.startswith('[') else None
+        if ms is not None:
+            if window_end is None:
+                window_end = (ms // window_ms + 1) * window_ms
+            elif ms >= window_end:
+                windows.append(("", '\n'.join(current_lines)))
+                current_lines = []
+                window_end = (ms // window_ms + 1) * window_ms
+        current_lines.append(line)
+    if current_lines:
+        windows.append(("", '\n'.join(current_lines)))
+    return windows
+
+
+def split_regions(text: str, window_ms: int) -> List[Tuple[str, str]]:
+    """优先按辩论阶段切分；文字稿没有多个阶段时退回按时间窗口切分"""
+    stages = split_stages(text)
+    if len(stages) >= 2:
+        return stages
+    return split_time_windows(text, window_ms)
+
+
+def region_start_ms(region_text: str) -> Optional[int]:
+    """区域中第一个时间戳（毫秒），没有时间戳时返回None"""
+    for line in region_text.splitlines():
+        if line.startswith('['):
+            ms = ts_to_ms(line[:12])
+            if ms is not None:
+                return ms
+    return None
+
+
+# 发言行，如：[00:01:05] 正方一辩: 内容 或 [01:05]正方一辩：内容
+SPEECH_LINE_RE = re.compile(r'^(\[\d{1,2}:\d{1,2}(?::\d{1,2})?\])\s*([^\s:：\[][^:：]{0,29})[:：]\s*(.*)$')
+
+
+class TranscriptLine(NamedTuple):
+    line_no: int          # 在文字稿中的行号，从1开始
+    stage: str            # 所在辩论阶段，没有阶段标题时为空
+    ts_ms: Optional[int]  # 时间戳（毫秒），没有时间戳时为None
+    speaker: str
+    camp: str
+    text: str
+
+
+def speaker_camp(speaker: str) -> str:
+    """识别发言人阵营（正反方）"""
+    if "正方" in speaker:
+        return "正方"
+    elif "反方" in speaker:
+        return "反方"
+    elif "主持人" in speaker or "主席" in speaker:
+        return "主持人"
+    elif "评委" in speaker:
+        return "评委"
+    else:
+        return "未知"
+
+
+def iter_transcript_lines(lines: Iterable[str]) -> Iterator[TranscriptLine]:
+    """逐行解析文字稿（可直接传入文件对象），附带所在阶段；阶段标题和空行不产出，无法识别发言人的行按原文产出"""
+    stage = ""
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        name = parse_stage_header(line)
+        if name is not None:
+            stage = name
+            continue
+        match = SPEECH_LINE_RE.match(line)
+        if match:
+            speaker = match.group(2).strip()
+            yield TranscriptLine(line_no, stage, ts_to_ms(match.group(1)), speaker,
+                                 speaker_camp(speaker), match.group(3).strip())
+        else:
+            yield TranscriptLine(line_no, stage, None, "", "未知", line)
+
+
+def parse_transcript_lines(text: str) -> List[TranscriptLine]:
+    """把文字稿解析为发言行，见 iter_transcript_lines"""
+    return list(iter_transcript_lines(text.splitlines()))
@@ -0,0 +1,144 @@
+"""
+转录前的本地人声检测（VAD）：按帧的RMS能量和过零率判断人声，删去超过 VAD_MIN_SILENCE_S 秒的非人声片段
+（静音、计时提示音、掌声、场间休息），只把保留下来的部分上传转录，减少上传和计费的音频时长。
+
+裁剪后的时间与原音频时间的对应关系保存为 OffsetMap，转录结果中的时间戳经它换算回原音频时间，
+文字稿、跳转播放和语速指标仍使用原音频的时间轴。
+"""
+import os
+import json
+import bisect
+import logging
+import numpy as np
+from app.config import Config
+from app.services.pcm import WavFormatError, open_wav, frame_features, voiced_frames, write_wav_slices
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class OffsetMap:
+    """裁剪后音频中的时间 -> 原音频中的时间"""
+
+    def __init__(self, intervals, duration_s: float):
+        # 保留的区间 [(原音频开始秒, 原音频结束秒)]，按时间排序且互不重叠
+        self.intervals = [(float(start), float(end)) for start, end in intervals]
+        self.duration_s = float(duration_s)
+        self.trimmed_starts = []
+        position = 0.0
+        for start, end in self.intervals:
+            self.trimmed_starts.append(position)
+            position += end - start
+        self.kept_s = position
+
+    def to_original(self, seconds: float) -> float:
+        """把裁剪后音频中的秒数换算为原音频中的秒数；落在两个区间的拼接点上时取后一个区间的开始"""
+        if not self.intervals:
+            return seconds
+        index = max(0, bisect.bisect_right(self.trimmed_starts, seconds) - 1)
+        return self.intervals[index][0] + seconds - self.trimmed_starts[index]
+
+    def to_dict(self) -> dict:
+        return {'duration_s': self.duration_s, 'intervals': [list(interval) for interval in self.intervals]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'OffsetMap':
+        return cls(data['intervals'], data['duration_s'])
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str):
+        """读取保存的偏移表，文件不存在时返回None（未裁剪）"""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def speech_frames(rms_db: np.ndarray, zcr: np.ndarray) -> np.ndarray:
+    """
+    按帧判断是否为人声：能量不低于底噪（第10百分位）加 VAD_MARGIN_DB 且不低于 VAD_MIN_DB，
+    同时过零率不超过 VAD_MAX_ZCR（掌声、噪声的过零率明显高于语音）；短于 VAD_MIN_SPEECH_S 的人声片段视为噪声
+
+    Returns:
+        bool数组
+    """
+    speech = voiced_frames(rms_db, Config.VAD_MARGIN_DB, Config.VAD_MIN_DB) & (zcr <= Config.VAD_MAX_ZCR)
+    if not len(speech):
+        return speech
+
+    min_frames = int(np.ceil(Config.VAD_MIN_SPEECH_S * 1000 / Config.VAD_FRAME_MS))
+    edges = np.diff(np.concatenate([[0], speech.astype(np.int8), [0]]))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    short = run_ends - run_starts < min_frames
+    # 差分标记短片段的起止，前缀和为1的帧属于短片段
+    marks = np.zeros(len(speech) + 1, dtype=np.int32)
+    marks[run_starts[short]] += 1
+    marks[run_ends[short]] -= 1
+    return speech & (np.cumsum(marks[:-1]) == 0)
+
+
+def keep_intervals(speech: np.ndarray, frame_s: float, duration_s: float) -> list:
+    """
+    需要保留的区间（秒）：删去长于 VAD_MIN_SILENCE_S 的非人声片段，人声两侧各保留 VAD_PAD_S 秒
+
+    Returns:
+        [(开始秒, 结束秒)]；整段音频都没有人声时返回空列表
+    """
+    edges = np.diff(np.concatenate([[0], speech.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1) * frame_s - Config.VAD_PAD_S
+    ends = np.flatnonzero(edges == -1) * frame_s + Config.VAD_PAD_S
+    if not len(starts):
+        return []
+    starts = np.clip(starts, 0, duration_s)
+    ends = np.clip(ends, 0, duration_s)
+
+    # 间隔不超过 VAD_MIN_SILENCE_S 的相邻人声片段合并
+    gap_start = np.concatenate([[True], starts[1:] - ends[:-1] > Config.VAD_MIN_SILENCE_S])
+    gap_end = np.concatenate([gap_start[1:], [True]])
+    intervals = list(zip(starts[gap_start].tolist(), ends[gap_end].tolist()))
+
+    # 开头和结尾的短暂空白也保留，不必为了不到 VAD_MIN_SILENCE_S 的空白多切一刀
+    if intervals[0][0] <= Config.VAD_MIN_SILENCE_S:
+        intervals[0] = (0.0, intervals[0][1])
+    if duration_s - intervals[-1][1] <= Config.VAD_MIN_SILENCE_S:
+        intervals[-1] = (intervals[-1][0], duration_s)
+    return intervals
+
+
+def trim_silence(audio_path: str, output_path: str):
+    """
+    删去音频中的长段非人声，写入output_path
+
+    Returns:
+        (OffsetMap, 原音频秒数)；不是可映射的PCM WAV、没有检测到人声或节省不足 VAD_MIN_SAVING_S 秒时不裁剪，返回 (None, 原音频秒数或None)
+    """
+    try:
+        samples, rate = open_wav(audio_path)
+    except (OSError, WavFormatError) as e:
+        logger.warning(f"无法读取PCM音频，跳过人声检测: {str(e)}")
+        return None, None
+    duration_s = len(samples) / rate if rate else 0.0
+    frame_s = Config.VAD_FRAME_MS / 1000
+    rms_db, zcr = frame_features(samples, rate, Config.VAD_FRAME_MS)
+    intervals = keep_intervals(speech_frames(rms_db, zcr), frame_s, duration_s)
+    if not intervals:
+        logger.warning(f"音频中未检测到人声，按原音频转录: {audio_path}")
+        return None, duration_s
+
+    # 区间对齐到采样点，偏移表与实际写入的音频一致
+    slices = [(int(start * rate), int(end * rate)) for start, end in intervals]
+    offset_map = OffsetMap([(start / rate, end / rate) for start, end in slices], duration_s)
+    if duration_s - offset_map.kept_s < Config.VAD_MIN_SAVING_S:
+        logger.info(f"可删去的非人声不足 {Config.VAD_MIN_SAVING_S} 秒，按原音频转录: {audio_path}")
+        return None, duration_s
+
+    write_wav_slices(samples, rate, slices, output_path)
+    logger.info(f"人声检测完成: 保留 {len(intervals)} 个片段，{offset_map.kept_s:.1f}/{duration_s:.1f} 秒，"
+                f"已写入 {output_path}")
+    return offset_map, duration_s
@@ -0,0 +1,246 @@
+"""
+数据库并发写入基准测试。
+
+模拟多个后台任务同时运行：每个任务创建项目和转录任务记录，用 ProgressReporter 反复提交进度，
+中间穿插模拟的耗时步骤，最后更新项目状态；同时有若干线程不断请求项目列表和转录状态接口。
+统计 database is locked 等数据库错误数、每次进度提交的耗时和接口响应耗时。
+
+每种设置在独立子进程中运行（Config 在导入时读取环境变量），各自使用新建的数据库文件：
+- tuned：当前默认设置（WAL、busy_timeout、synchronous=NORMAL）
+- legacy：调整前的行为（DELETE日志、synchronous=FULL、sqlite3默认的5秒等待）
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_db_concurrency.py --jobs 16 --updates 200
+    python benchmarks/bench_db_concurrency.py --jobs 32 --modes tuned
+tuned 设置下出现任何数据库错误时以非零状态退出。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+MODES = {
+    'tuned': {},
+    'legacy': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_BUSY_TIMEOUT_MS': '5000',
+    },
+}
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+    return {'count': len(values), 'p50_ms': pick(0.5) * 1000, 'p95_ms': pick(0.95) * 1000,
+            'p99_ms': pick(0.99) * 1000, 'max_ms': values[-1] * 1000}
+
+
+# ---------- 子进程：在一种设置下运行 ----------
+
+def run_worker(args):
+    """在子进程中运行：环境变量已由父进程设置，这里才导入应用"""
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    logging.disable(logging.INFO)
+    from sqlalchemy.exc import OperationalError
+    from app import create_app
+    from app.models import db, Video, TranscriptionTask
+    from app.api.transcribe import ProgressReporter
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+
+    lock = threading.Lock()
+    commit_times = []
+    read_times = []
+    errors = []
+    done = threading.Event()
+
+    def record_error(where, e):
+        with lock:
+            errors.append(f"{where}: {str(e).splitlines()[0][:200]}")
+
+    def job(index):
+        video_id = f"bench-{index}"
+        task_id = f"bench-task-{index}"
+        with app.app_context():
+            try:
+                db.session.add(Video(id=video_id, bv_id=f"BENCH{index}", title=video_id,
+                                     bilibili_url='', status='processing'))
+                db.session.add(TranscriptionTask(id=task_id, project_id=video_id, status='processing',
+                                                 original_filename='bench.wav', audio_path='bench.wav'))
+                db.session.commit()
+                report = ProgressReporter(task_id)
+                for step in range(args.updates):
+                    # 模拟两次进度之间的转录、分析等耗时步骤
+                    time.sleep(args.work_ms / 1000)
+                    start = time.time()
+                    try:
+                        report(step % 4 + 1, 4, f"第 {step + 1}/{args.updates} 次进度")
+                    except OperationalError as e:
+                        db.session.rollback()
+                        record_error('progress', e)
+                        continue
+                    with lock:
+                        commit_times.append(time.time() - start)
+                video = Video.query.get(video_id)
+                video.status = 'completed'
+                db.session.commit()
+            except OperationalError as e:
+                db.session.rollback()
+                record_error('job', e)
+
+    def reader(index):
+        client = app.test_client()
+        i = 0
+        while not done.is_set():
+            path = '/api/projects/list' if i % 2 == 0 else f"/api/transcribe/status/bench-task-{(index + i) % args.jobs}"
+            i += 1
+            start = time.time()
+            try:
+                response = client.get(path)
+            except OperationalError as e:
+                record_error('read', e)
+                continue
+            if response.status_code >= 500:
+                record_error('read', (response.get_json(silent=True) or {}).get('error', response.status_code))
+                continue
+            with lock:
+                read_times.append(time.time() - start)
+
+    start = time.time()
+    jobs = [threading.Thread(target=job, args=(i,)) for i in range(args.jobs)]
+    readers = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    for thread in jobs + readers:
+        thread.start()
+    for thread in jobs:
+        thread.join()
+    wall = time.time() - start
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    with app.app_context():
+        completed = Video.query.filter_by(status='completed').count()
+    print(json.dumps({
+        'journal_mode': journal_mode,
+        'wall_s': wall,
+        'completed_jobs': completed,
+        'commits_per_s': len(commit_times) / wall if wall > 0 else None,
+        'progress_commit': percentiles(commit_times),
+        'read': percentiles(read_times),
+        'errors': len(errors),
+        'error_samples': errors[:10],
+    }, ensure_ascii=False))
+
+
+# ---------- 父进程 ----------
+
+def run_mode(args, mode: str, work_root: str) -> dict:
+    work_dir = os.path.join(work_root, mode)
+    os.makedirs(work_dir, exist_ok=True)
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(work_dir, 'bench.db')}",
+        'LLM_PROVIDER': 'fake',
+        'TRANSCRIBE_PROGRESS_INTERVAL_S': '0',
+    })
+    for key in ('SQLITE_JOURNAL_MODE', 'SQLITE_SYNCHRONOUS', 'SQLITE_BUSY_TIMEOUT_MS'):
+        env.pop(key, None)
+    env.update(MODES[mode])
+    command = [
+        sys.executable, os.path.abspath(__file__), '--worker',
+        '--jobs', str(args.jobs), '--updates', str(args.updates),
+        '--readers', str(args.readers), '--work-ms', str(args.work_ms),
+    ]
+    proc = subprocess.run(command, cwd=work_dir, env=env, capture_output=True, text=True, encoding='utf-8')
+    lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{mode} 运行失败:\n{proc.stderr[-2000:]}")
+    return {'mode': mode, **json.loads(lines[-1])}
+
+
+def print_report(report: dict):
+    params = report['params']
+    print(f"\n{params['jobs']} 个并行任务，每个提交 {params['updates']} 次进度，{params['readers']} 个读取线程")
+    print(f"{'设置':>8} {'日志模式':>8} {'完成':>6} {'错误':>5} {'提交/秒':>8} "
+          f"{'提交p50(ms)':>11} {'提交p99(ms)':>11} {'读取p95(ms)':>11}")
+    for result in report['results']:
+        commit, read = result['progress_commit'], result['read']
+        print(f"{result['mode']:>8} {result['journal_mode']:>8} {result['completed_jobs']:>3}/{params['jobs']:<2} "
+              f"{result['errors']:>5} {result['commits_per_s'] or 0:>8.0f} {commit.get('p50_ms', float('nan')):>11.1f} "
+              f"{commit.get('p99_ms', float('nan')):>11.1f} {read.get('p95_ms', float('nan')):>11.1f}")
+        for sample in result['error_samples'][:3]:
+            print(f"         {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DebateLens 数据库并发写入基准测试')
+    parser.add_argument('--jobs', type=int, default=16, help='并行任务数')
+    parser.add_argument('--updates', type=int, default=200, help='每个任务提交进度的次数')
+    parser.add_argument('--readers', type=int, default=4, help='同时请求接口的线程数')
+    parser.add_argument('--work-ms', type=float, default=2, help='两次进度之间模拟的耗时（毫秒）')
+    parser.add_argument('--modes', default='tuned,legacy', help='要运行的设置，逗号分隔：tuned、legacy')
+    parser.add_argument('--output', default=None, help='结果JSON路径，默认写入 benchmarks/results/')
+    parser.add_argument('--keep', action='store_true', help='保留临时工作目录')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"未知设置: {', '.join(unknown)}")
+
+    work_root = tempfile.mkdtemp(prefix='debatelens-bench-db-')
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'params': {'jobs': args.jobs, 'updates': args.updates, 'readers': args.readers, 'work_ms': args.work_ms},
+        'results': [],
+    }
+    try:
+        for mode in modes:
+            print(f"运行 {mode} ...")
+            report['results'].append(run_mode(args, mode, work_root))
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    print_report(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"db-concurrency-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {output}")
+
+    tuned = [result for result in report['results'] if result['mode'] == 'tuned']
+    if tuned and (tuned[0]['errors'] or tuned[0]['completed_jobs'] < args.jobs):
+        print("\ntuned 设置下出现数据库错误")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+"""
+数据库负载测试：在同样的数据量和请求组合下对比 SQLite 与 PostgreSQL。
+
+先写入指定数量的项目和转录任务，再由多个进程（模拟 gunicorn 的多个工作进程）、每个进程多个线程
+在固定时长内混合执行应用中的典型查询与写入：
+- 读：最近的项目列表（按创建时间倒序）、按状态统计项目、按项目查找最新的转录任务、查询转录任务状态
+- 写：提交转录进度（单条UPDATE）、新建转录任务、更新项目状态
+统计每类操作的吞吐、耗时分位数和错误数（如 database is locked、连接池超时）。
+
+PostgreSQL 需要一个专用的空数据库（表已存在时需加 --reset，会删除其中的应用表），例如：
+    createdb debatelens_bench
+    pip install psycopg2-binary
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_db_load.py --postgres-url postgresql://postgres@localhost:5432/debatelens_bench
+    python benchmarks/bench_db_load.py --backends sqlite --processes 4 --threads 8 --duration 30
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+READ_OPS = ('recent_projects', 'count_by_status', 'latest_task', 'task_status')
+WRITE_OPS = ('progress', 'new_task', 'project_status')
+STATUSES = ('pending', 'processing', 'completed', 'failed')
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {'count': 0}
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+    return {'count': len(values), 'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'max_ms': values[-1]}
+
+
+def load_app():
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    logging.disable(logging.INFO)
+    from app import create_app
+    return create_app()
+
+
+# ---------- 子进程：写入测试数据 ----------
+
+def run_seed(args):
+    from sqlalchemy import inspect
+    app = load_app()
+    from app.models import db, Video, TranscriptionTask
+
+    with app.app_context():
+        existing = set(inspect(db.engine).get_table_names()) & set(db.metadata.tables)
+        if existing and not args.reset:
+            raise SystemExit(f"数据库中已有表 {', '.join(sorted(existing))}，请使用专用的测试数据库或加 --reset")
+        db.drop_all()
+        db.create_all()
+
+        rng = random.Random(42)
+        start = datetime.utcnow() - timedelta(days=365)
+        videos, tasks = [], []
+        for i in range(args.projects):
+            created = start + timedelta(minutes=rng.randrange(365 * 24 * 60))
+            videos.append({
+                'id': f"p-{i:06d}", 'bv_id': f"LVP{i:06d}", 'title': f"项目 {i}", 'bilibili_url': '',
+                'status': rng.choice(STATUSES), 'created_at': created, 'updated_at': created,
+            })
+            for j in range(args.tasks_per_project):
+                tasks.append({
+                    'id': f"t-{i:06d}-{j}", 'project_id': f"p-{i:06d}", 'original_filename': f"p-{i:06d}.wav",
+                    'audio_path': f"p-{i:06d}.wav", 'status': rng.choice(STATUSES), 'progress': rng.randrange(101),
+                    'created_at': created + timedelta(minutes=j),
+                })
+        db.session.execute(Video.__table__.insert(), videos)
+        db.session.execute(TranscriptionTask.__table__.insert(), tasks)
+        db.session.commit()
+    print(json.dumps({'projects': len(videos), 'tasks': len(tasks)}))
+
+
+# ---------- 子进程：运行负载 ----------
+
+def run_load(args):
+    app = load_app()
+    from app.models import db, Video, TranscriptionTask
+    from app.api.transcribe import ProgressReporter
+
+    rng = random.Random(os.getpid())
+    lock = threading.Lock()
+    latencies = {op: [] for op in READ_OPS + WRITE_OPS}
+    errors = []
+    deadline = time.time() + args.duration
+
+    def random_project():
+        return f"p-{rng.randrange(args.projects):06d}"
+
+    def operation(op: str, worker: str, counter: int):
+        if op == 'recent_projects':
+            Video.query.order_by(Video.created_at.desc()).limit(50).all()
+        elif op == 'count_by_status':
+            Video.query.filter_by(status='completed').count()
+        elif op == 'latest_task':
+            TranscriptionTask.query.filter(
+                TranscriptionTask.project_id == random_project(),
+                TranscriptionTask.status == 'completed',
+            ).order_by(TranscriptionTask.created_at.desc()).first()
+        elif op == 'task_status':
+            db.session.get(TranscriptionTask, f"{random_project().replace('p-', 't-')}-0")
+        elif op == 'progress':
+            project = random_project()
+            ProgressReporter(f"{project.replace('p-', 't-')}-0")(2, 4, f"{worker} 第 {counter} 次进度")
+        elif op == 'new_task':
+            project = random_project()
+            db.session.add(TranscriptionTask(id=f"n-{worker}-{counter}", project_id=project,
+                                             original_filename=f"{project}.wav", audio_path=f"{project}.wav",
+                                             status='queued'))
+            db.session.commit()
+        elif op == 'project_status':
+            Video.query.filter_by(id=random_project()).update({'status': rng.choice(STATUSES)})
+            db.session.commit()
+        # 读操作同样结束事务，把连接还给连接池
+        db.session.rollback()
+
+    def worker(index):
+        name = f"{os.getpid()}-{index}"
+        counter = 0
+        with app.app_context():
+            while time.time() < deadline:
+                counter += 1
+                ops = WRITE_OPS if rng.random() < args.write_ratio else READ_OPS
+                op = rng.choice(ops)
+                start = time.perf_counter()
+                try:
+                    operation(op, name, counter)
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(f"{op}: {str(e).splitlines()[0][:200]}")
+                    continue
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies[op].append(round(elapsed, 3))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(json.dumps({'latencies': latencies, 'errors': errors}, ensure_ascii=False))
+
+
+# ---------- 父进程 ----------
+
+def spawn(args, role: str, database_url: str, cwd: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({'DATABASE_URL': database_url, 'LLM_PROVIDER': 'fake', 'TRANSCRIBE_PROGRESS_INTERVAL_S': '0'})
+    command = [
+        sys.executable, os.path.abspath(__file__), '--role', role,
+        '--projects', str(args.projects), '--tasks-per-project', str(args.tasks_per_project),
+        '--threads', str(args.threads), '--duration', str(args.duration), '--write-ratio', str(args.write_ratio),
+    ]
+    if args.reset:
+        command.append('--reset')
+    return subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, encoding='utf-8')
+
+
+def collect(proc: subprocess.Popen, what: str) -> dict:
+    stdout, stderr = proc.communicate()
+    lines = [line for line in stdout.splitlines() if line.startswith('{')]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{what} 失败:\n{stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def run_backend(args, backend: str, database_url: str, work_dir: str) -> dict:
+    print(f"{backend}: 写入 {args.projects} 个项目 ...")
+    seeded = collect(spawn(args, 'seed', database_url, work_dir), f"{backend} 写入测试数据")
+    print(f"{backend}: {args.processes} 个进程 x {args.threads} 个线程，运行 {args.duration} 秒 ...")
+    procs = [spawn(args, 'load', database_url, work_dir) for _ in range(args.processes)]
+    raws = [collect(proc, f"{backend} 负载进程") for proc in procs]
+
+    operations = {}
+    total = 0
+    for op in READ_OPS + WRITE_OPS:
+        values = [value for raw in raws for value in raw['latencies'][op]]
+        total += len(values)
+        operations[op] = {**percentiles(values), 'ops_per_s': len(values) / args.duration}
+    errors = [error for raw in raws for error in raw['errors']]
+    return {
+        'backend': backend,
+        'seeded': seeded,
+        'ops_per_s': total / args.duration,
+        'operations': operations,
+        'errors': len(errors),
+        'error_samples': errors[:10],
+    }
+
+
+def print_report(report: dict):
+    params = report['params']
+    print(f"\n{params['projects']} 个项目，{params['processes']} 个进程 x {params['threads']} 个线程，"
+          f"写操作占 {params['write_ratio']:.0%}，运行 {params['duration']} 秒")
+    print(f"{'数据库':>10} {'操作':>16} {'次/秒':>8} {'p50(ms)':>8} {'p95(ms)':>8} {'p99(ms)':>8}")
+    for result in report['results']:
+        for op, stats in result['operations'].items():
+            if not stats['count']:
+                continue
+            print(f"{result['backend']:>10} {op:>16} {stats['ops_per_s']:>8.0f} {stats['p50_ms']:>8.2f} "
+                  f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+        print(f"{result['backend']:>10} {'合计':>16} {result['ops_per_s']:>8.0f}   错误 {result['errors']}")
+        for sample in result['error_samples'][:3]:
+            print(f"           {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DebateLens 数据库负载测试（SQLite 与 PostgreSQL 对比）')
+    parser.add_argument('--backends', default='sqlite,postgres', help='要测试的数据库，逗号分隔：sqlite、postgres')
+    parser.add_argument('--postgres-url', default=os.environ.get('BENCH_POSTGRES_URL'),
+                        help='PostgreSQL 测试数据库地址，也可用环境变量 BENCH_POSTGRES_URL')
+    parser.add_argument('--projects', type=int, default=5000, help='预先写入的项目数')
+    parser.add_argument('--tasks-per-project', type=int, default=3, help='每个项目的转录任务数')
+    parser.add_argument('--processes', type=int, default=4, help='负载进程数')
+    parser.add_argument('--threads', type=int, default=8, help='每个进程的线程数')
+    parser.add_argument('--duration', type=float, default=20, help='每种数据库的运行时长（秒）')
+    parser.add_argument('--write-ratio', type=float, default=0.3, help='写操作所占比例')
+    parser.add_argument('--reset', action='store_true', help='PostgreSQL 数据库中已有应用表时删除后重建')
+    parser.add_argument('--output', default=None, help='结果JSON路径，默认写入 benchmarks/results/')
+    parser.add_argument('--role', choices=['seed', 'load'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == 'seed':
+        run_seed(args)
+        return
+    if args.role == 'load':
+        run_load(args)
+        return
+
+    backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+    if 'postgres' in backends and not args.postgres_url:
+        parser.error('测试 PostgreSQL 需要 --postgres-url 或环境变量 BENCH_POSTGRES_URL')
+
+    work_dir = tempfile.mkdtemp(prefix='debatelens-bench-load-')
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'params': {
+            'projects': args.projects, 'tasks_per_project': args.tasks_per_project, 'processes': args.processes,
+            'threads': args.threads, 'duration': args.duration, 'write_ratio': args.write_ratio,
+        },
+        'results': [],
+    }
+    try:
+        for backend in backends:
+            if backend == 'sqlite':
+                database_url = f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+            elif backend == 'postgres':
+                database_url = args.postgres_url
+            else:
+                parser.error(f"未知数据库: {backend}")
+            report['results'].append(run_backend(args, backend, database_url, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"db-load-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+流水线吞吐基准测试。
+
+生成指定时长的合成辩论音频，启动本地 Gemini 模拟服务（mock_gemini_server.py），
+在不同并发度下运行 process_local_video_pipeline，统计各步骤耗时、峰值内存（RSS）和每小时可处理项目数，
+结果保存为JSON，便于在版本之间对比发现性能回退。
+
+每个并发度在独立子进程中运行，峰值内存互不影响；模拟服务运行在父进程中，不计入被测进程的内存。
+合成音频直接写为 audio.wav，流水线会跳过音频提取步骤（不依赖ffmpeg）。
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_pipeline.py --minutes 10 --concurrency 1,2,4
+    python benchmarks/bench_pipeline.py --minutes 60 --error-rate 0.05 --compare benchmarks/results/baseline.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import wave
+import shutil
+import struct
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+STAGES = ('extract', 'transcribe', 'analysis', 'total')
+
+# 对比基线时，吞吐下降或耗时上升超过该比例视为回退
+DEFAULT_TOLERANCE = 0.2
+
+
+def generate_debate_wav(path: str, minutes: float, sample_rate: int = 16000):
+    """生成合成辩论音频：交替的两种音高模拟正反方发言，每句之间留有停顿"""
+    total_frames = int(minutes * 60 * sample_rate)
+    sentence = 4 * sample_rate
+    pause = sample_rate // 2
+    block = []
+    for freq in (180.0, 240.0):
+        for i in range(sentence):
+            block.append(int(3000 * math.sin(2 * math.pi * freq * i / sample_rate)))
+        block.extend([0] * pause)
+    pattern = struct.pack(f'<{len(block)}h', *block)
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        written = 0
+        while written < total_frames:
+            frames = min(len(block), total_frames - written)
+            w.writeframes(pattern[:frames * 2])
+            written += frames
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），平台不支持时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        'mean': sum(ordered) / len(ordered),
+        'p50': ordered[(len(ordered) - 1) // 2],
+        'max': ordered[-1],
+    }
+
+
+# ---------- 子进程：在一个并发度下运行流水线 ----------
+
+def run_worker(args):
+    """在子进程中运行：环境变量已由父进程设置，这里才导入应用"""
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    logging.disable(logging.INFO)
+    from app import create_app
+    from app.models import db, Video
+    from app.api.project import process_local_video_pipeline
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        video_ids = []
+        for i in range(args.projects):
+            video_id = f"bench-{args.concurrency}-{i}"
+            task_dir = os.path.join(args.work_dir, video_id)
+            os.makedirs(task_dir, exist_ok=True)
+            shutil.copyfile(args.audio, os.path.join(task_dir, 'audio.wav'))
+            db.session.add(Video(id=video_id, bv_id=f"BENCH{i}", title=video_id, bilibili_url='', status='processing'))
+            video_ids.append(video_id)
+        db.session.commit()
+
+    pending = list(video_ids)
+    lock = threading.Lock()
+    results = []
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                video_id = pending.pop(0)
+            task_dir = os.path.join(args.work_dir, video_id)
+            with app.app_context():
+                try:
+                    timings = process_local_video_pipeline(video_id, os.path.join(task_dir, 'video.mp4'), task_dir)
+                    result = {'video_id': video_id, 'ok': True, 'timings': timings}
+                except Exception as e:
+                    result = {'video_id': video_id, 'ok': False, 'error': str(e)}
+            with lock:
+                results.append(result)
+
+    start = time.time()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.time() - start
+
+    print(json.dumps({'wall_s': wall, 'peak_rss_mb': peak_rss_mb(), 'projects': results}, ensure_ascii=False))
+
+
+# ---------- 父进程：准备数据、启动模拟服务、汇总结果 ----------
+
+def run_level(args, audio_path: str, base_url: str, concurrency: int, work_root: str) -> dict:
+    work_dir = os.path.join(work_root, f"c{concurrency}")
+    os.makedirs(work_dir, exist_ok=True)
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(work_dir, 'bench.db')}",
+        'LLM_PROVIDER': 'gemini',
+        'GEMINI_BASE_URL': base_url,
+        'GEMINI_API_KEY': 'benchmark',
+        'ANALYSIS_MODE': args.analysis_mode,
+    })
+    projects = args.projects or concurrency
+    command = [
+        sys.executable, os.path.abspath(__file__), '--worker',
+        '--audio', audio_path, '--work-dir', work_dir,
+        '--concurrency', str(concurrency), '--projects', str(projects),
+    ]
+    proc = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, encoding='utf-8')
+    lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"并发度 {concurrency} 运行失败:\n{proc.stderr[-2000:]}")
+    raw = json.loads(lines[-1])
+
+    succeeded = [p for p in raw['projects'] if p['ok']]
+    stages = {stage: summarize([p['timings'][stage] for p in succeeded if stage in p['timings']]) for stage in STAGES}
+    return {
+        'concurrency': concurrency,
+        'projects': projects,
+        'succeeded': len(succeeded),
+        'failed': [{'video_id': p['video_id'], 'error': p['error']} for p in raw['projects'] if not p['ok']],
+        'wall_s': raw['wall_s'],
+        'projects_per_hour': len(succeeded) / raw['wall_s'] * 3600 if raw['wall_s'] > 0 else None,
+        'peak_rss_mb': raw['peak_rss_mb'],
+        'stages': stages,
+    }
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) -> list:
+    """与基线逐个并发度比较吞吐、各步骤平均耗时和峰值内存，返回回退说明列表"""
+    regressions = []
+    base_levels = {level['concurrency']: level for level in baseline.get('levels', [])}
+    for level in report['levels']:
+        base = base_levels.get(level['concurrency'])
+        if not base:
+            continue
+        tag = f"并发{level['concurrency']}"
+        if base.get('projects_per_hour') and level.get('projects_per_hour') is not None:
+            if level['projects_per_hour'] < base['projects_per_hour'] * (1 - tolerance):
+                regressions.append(f"{tag} 吞吐 {base['projects_per_hour']:.1f} -> {level['projects_per_hour']:.1f} 项目/小时")
+        for stage in STAGES:
+            old, new = (base.get('stages') or {}).get(stage), level['stages'].get(stage)
+            # 忽略耗时很短的步骤（如跳过的音频提取），避免噪声误报
+            if old and new and old['mean'] > 0.05 and new['mean'] > old['mean'] * (1 + tolerance):
+                regressions.append(f"{tag} {stage} 平均耗时 {old['mean']:.2f}s -> {new['mean']:.2f}s")
+        if base.get('peak_rss_mb') and level.get('peak_rss_mb'):
+            if level['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+                regressions.append(f"{tag} 峰值内存 {base['peak_rss_mb']:.0f}MB -> {level['peak_rss_mb']:.0f}MB")
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"\n音频时长 {report['params']['minutes']} 分钟，分析模式 {report['params']['analysis_mode']}")
+    print(f"{'并发':>4} {'成功':>6} {'总耗时(s)':>10} {'项目/小时':>10} {'峰值内存(MB)':>12} "
+          f"{'转录均值(s)':>11} {'分析均值(s)':>11}")
+    for level in report['levels']:
+        stages = level['stages']
+        transcribe = stages['transcribe']['mean'] if stages.get('transcribe') else float('nan')
+        analysis = stages['analysis']['mean'] if stages.get('analysis') else float('nan')
+        rss = level['peak_rss_mb'] if level['peak_rss_mb'] is not None else float('nan')
+        pph = level['projects_per_hour'] if level['projects_per_hour'] is not None else float('nan')
+        print(f"{level['concurrency']:>4} {level['succeeded']:>3}/{level['projects']:<2} {level['wall_s']:>10.2f} "
+              f"{pph:>10.1f} {rss:>12.0f} {transcribe:>11.2f} {analysis:>11.2f}")
+        for failure in level['failed']:
+            print(f"     失败 {failure['video_id']}: {failure['error'][:120]}")
+
+
+def main():
+    sys.path.insert(0, BENCH_DIR)
+    from mock_gemini_server import add_settings_arguments, settings_from_args, start_server
+
+    parser = argparse.ArgumentParser(description='DebateLens 流水线吞吐基准测试')
+    parser.add_argument('--minutes', type=float, default=10, help='合成音频时长（分钟）')
+    parser.add_argument('--concurrency', default='1,2,4', help='并发度列表，逗号分隔')
+    parser.add_argument('--projects', type=int, default=0, help='每个并发度处理的项目数，默认等于并发度')
+    parser.add_argument('--analysis-mode', default='single', choices=['single', 'sharded', 'auto'])
+    parser.add_argument('--output', default=None, help='结果JSON路径，默认写入 benchmarks/results/')
+    parser.add_argument('--compare', default=None, help='基线结果JSON，发现回退时以非零状态退出')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='判定回退的相对阈值')
+    parser.add_argument('--keep', action='store_true', help='保留临时工作目录')
+    # 子进程参数
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--audio', help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    if args.worker:
+        args.concurrency = int(args.concurrency)
+        run_worker(args)
+        return
+
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    work_root = tempfile.mkdtemp(prefix='debatelens-bench-')
+    server = start_server(settings_from_args(args))
+    print(f"模拟Gemini服务: {server.base_url}，工作目录: {work_root}")
+    try:
+        audio_path = os.path.join(work_root, 'debate.wav')
+        generate_debate_wav(audio_path, args.minutes)
+        print(f"已生成 {args.minutes} 分钟合成音频 ({os.path.getsize(audio_path) / 1024 / 1024:.1f}MB)")
+
+        report = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+            'params': {
+                'minutes': args.minutes,
+                'analysis_mode': args.analysis_mode,
+                'mock': {
+                    'first_token_ms': args.first_token_ms,
+                    'chunk_delay_ms': args.chunk_delay_ms,
+                    'upload_mbps': args.upload_mbps,
+                    'line_interval_s': args.line_interval,
+                    'error_rate': args.error_rate,
+                    'rate_limit_share': args.rate_limit_share,
+                },
+            },
+            'levels': [],
+        }
+        for concurrency in levels:
+            print(f"运行并发度 {concurrency} ...")
+            report['levels'].append(run_level(args, audio_path, server.base_url, concurrency, work_root))
+        report['mock_stats'] = dict(server.stats)
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    print_report(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\n发现性能回退：")
+            for item in regressions:
+                print(f"  - {item}")
+            sys.exit(1)
+        print("\n与基线相比未发现性能回退")
+
+
+if __name__ == '__main__':
+    main()
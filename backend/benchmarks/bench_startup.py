@@ -0,0 +1,144 @@
+"""
+后端冷启动基准测试。
+
+按 Electron 的方式启动 run.py（FLASK_DEBUG=0），测量从启动进程到 /api/ready 首次返回200、
+以及项目列表接口首次响应的时间；另外单独测量导入并创建应用的耗时。多次运行取中位数，结果保存为JSON。
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 5 --compare benchmarks/results/startup-baseline.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+DEFAULT_TOLERANCE = 0.2
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def first_response(url: str, deadline: float, expect_ok: bool):
+    """轮询url直到有响应（expect_ok时要求200），返回 (完成时间, 状态码)，超时返回 (None, None)"""
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return time.time(), response.status
+        except urllib.error.HTTPError as e:
+            if not expect_ok:
+                return time.time(), e.code
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            pass
+        time.sleep(0.02)
+    return None, None
+
+
+def measure_import(env: dict) -> float:
+    """在新进程中导入并创建应用的耗时（秒）"""
+    code = "import time; t = time.time(); from app import create_app; create_app(); print(time.time() - t)"
+    out = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def measure_server(env: dict, timeout: float) -> dict:
+    """启动run.py，返回就绪时间和首个业务接口响应时间（秒）"""
+    port = free_port()
+    env = dict(env, PORT=str(port), FLASK_DEBUG='0')
+    base = f"http://127.0.0.1:{port}"
+    start = time.time()
+    proc = subprocess.Popen([sys.executable, '-u', 'run.py'], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready_at, ready_status = first_response(f"{base}/api/ready", start + timeout, expect_ok=True)
+        list_at, list_status = first_response(f"{base}/api/projects/list", start + timeout, expect_ok=False)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    if ready_at is None:
+        raise RuntimeError(f"后端在 {timeout} 秒内未就绪")
+    return {
+        'ready_s': ready_at - start,
+        'first_list_s': list_at - start if list_at else None,
+        'list_status': list_status,
+    }
+
+
+def median(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DebateLens 后端冷启动基准测试')
+    parser.add_argument('--runs', type=int, default=5, help='重复次数')
+    parser.add_argument('--timeout', type=float, default=60, help='单次启动的超时时间（秒）')
+    parser.add_argument('--output', default=None, help='结果JSON路径，默认写入 benchmarks/results/')
+    parser.add_argument('--compare', default=None, help='基线结果JSON，就绪时间变慢超过阈值时以非零状态退出')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='debatelens-startup-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'startup.db')}")
+
+    runs = []
+    for i in range(args.runs):
+        result = measure_server(env, args.timeout)
+        result['import_s'] = measure_import(env)
+        runs.append(result)
+        print(f"第{i+1}次: 导入 {result['import_s']:.3f}s，就绪 {result['ready_s']:.3f}s，"
+              f"首个接口响应 {result['first_list_s'] or float('nan'):.3f}s")
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'runs': runs,
+        'median': {key: median([run[key] for run in runs]) for key in ('import_s', 'ready_s', 'first_list_s')},
+    }
+    print(f"\n中位数: 导入 {report['median']['import_s']:.3f}s，就绪 {report['median']['ready_s']:.3f}s")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['median']
+        regressions = [
+            f"{key} {baseline[key]:.3f}s -> {report['median'][key]:.3f}s"
+            for key in ('import_s', 'ready_s')
+            if baseline.get(key) and report['median'][key] > baseline[key] * (1 + args.tolerance)
+        ]
+        if regressions:
+            print("\n发现启动变慢：")
+            for item in regressions:
+                print(f"  - {item}")
+            sys.exit(1)
+        print("\n与基线相比未发现启动变慢")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Gemini API 本地模拟服务，供基准测试使用。
+
+实现 google-genai SDK 用到的几个接口：文件分段上传、流式/非流式生成、模型查询。
+转录请求根据上传的WAV时长生成对应长度的辩论文字稿，分析请求根据提示词中的文字稿生成分析节点，
+并可配置首字节延迟、分块间隔、上传带宽和错误率（429/500）。
+
+用法：
+    python benchmarks/mock_gemini_server.py --port 8765 --first-token-ms 800 --error-rate 0.05
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=bench python run.py
+"""
+import io
+import re
+import json
+import time
+import uuid
+import wave
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SPEAKERS = ['正方一辩', '反方一辩', '正方二辩', '反方二辩', '正方三辩', '反方三辩', '正方四辩', '反方四辩']
+STAGES = ['正方立论', '反方立论', '质询', '自由辩论', '反方总结', '正方总结']
+SENTENCES = [
+    '我方认为人工智能的发展利大于弊，它显著提升了社会生产效率。',
+    '对方只看到了效率，却忽略了就业冲击和算法偏见带来的社会风险。',
+    '请问对方，技术进步带来的新岗位是否也应计入考量？',
+    '新岗位需要的技能门槛，恰恰把被替代的人挡在了门外。',
+    '问题在于培训体系，而不是人工智能本身。',
+    '在缺乏有效监管的今天，人工智能的弊端更为突出。',
+]
+ANALYSIS_TYPES = ['affirmation', 'attack', 'defence', 'example', 'rebuttal']
+TIMESTAMP_LINE_RE = re.compile(r'^\[(\d{1,2}:\d{1,2}(?::\d{1,2})?)\]([^\s：:]+)[：:]', re.M)
+
+
+class MockSettings:
+    """模拟服务的行为参数"""
+
+    def __init__(self, first_token_ms=500, chunk_delay_ms=20, chunk_chars=200, upload_mbps=50.0,
+                 line_interval_s=15, error_rate=0.0, rate_limit_share=0.5, max_analysis_nodes=400, seed=None):
+        self.first_token_ms = first_token_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self.chunk_chars = chunk_chars
+        self.upload_mbps = upload_mbps
+        self.line_interval_s = line_interval_s
+        self.error_rate = error_rate
+        self.rate_limit_share = rate_limit_share  # 错误中返回429的比例，其余返回500
+        self.max_analysis_nodes = max_analysis_nodes
+        self.random = random.Random(seed)
+
+
+def wav_duration_seconds(data: bytes) -> float:
+    """从上传内容中读取WAV时长，无法解析时按16kHz单声道16bit估算"""
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as w:
+            return w.getnframes() / float(w.getframerate())
+    except (wave.Error, EOFError):
+        return len(data) / 32000.0
+
+
+def synthetic_transcript(duration_s: float, line_interval_s: int) -> str:
+    """按音频时长生成辩论文字稿：每line_interval_s秒一句，均匀划分为若干阶段"""
+    lines = []
+    total_lines = max(1, int(duration_s // line_interval_s))
+    per_stage = max(1, total_lines // len(STAGES))
+    for i in range(total_lines):
+        if i % per_stage == 0 and i // per_stage < len(STAGES):
+            lines.append(f"### **辩论阶段：{STAGES[i // per_stage]}**")
+        seconds = i * line_interval_s
+        ts = f"[{seconds // 60:02d}:{seconds % 60:02d}]"
+        lines.append(f"{ts}{SPEAKERS[i % len(SPEAKERS)]}：{SENTENCES[i % len(SENTENCES)]}")
+    return '\n'.join(lines)
+
+
+def synthetic_analysis(prompt_text: str, max_nodes: int) -> str:
+    """为提示词中的每句带时间戳的发言生成一个分析节点，相邻节点互相引用"""
+    nodes = []
+    for i, match in enumerate(TIMESTAMP_LINE_RE.finditer(prompt_text)):
+        if i >= max_nodes:
+            break
+        node_id = i + 1
+        nodes.append({
+            "analysis_id": str(node_id),
+            "global_fs": f"[{match.group(1)}]",
+            "speaker": match.group(2),
+            "analysis_type": ANALYSIS_TYPES[i % len(ANALYSIS_TYPES)],
+            "content": "模拟分析内容",
+            "technique": "举例",
+            "target": str(node_id - 1) if node_id > 1 and i % 2 else "",
+            "base": "",
+            "goal": "支持自身论点：效率",
+            "pros_gain": 3 if '正方' in match.group(2) else 0,
+            "cons_gain": 3 if '反方' in match.group(2) else 0,
+            "summary": "模拟摘要",
+            "interruption_type": "none",
+        })
+    return json.dumps({"analysis": nodes}, ensure_ascii=False, indent=2)
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, settings: MockSettings):
+        super().__init__(address, MockGeminiHandler)
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.uploads = {}   # 上传会话id -> 已接收的字节
+        self.files = {}     # 文件uri -> 音频时长（秒）
+        self.stats = {'requests': 0, 'errors': 0, 'uploaded_bytes': 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: MockGeminiServer
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---------- 工具方法 ----------
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send_json(self, payload: dict, status: int = 200, headers: dict = None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _maybe_fail(self) -> bool:
+        """按配置的错误率返回429或500"""
+        settings = self.server.settings
+        with self.server.lock:
+            self.server.stats['requests'] += 1
+            fail = settings.random.random() < settings.error_rate
+            rate_limited = settings.random.random() < settings.rate_limit_share
+            if fail:
+                self.server.stats['errors'] += 1
+        if not fail:
+            return False
+        if rate_limited:
+            self._send_json({"error": {"code": 429, "message": "Resource has been exhausted", "status": "RESOURCE_EXHAUSTED"}}, 429)
+        else:
+            self._send_json({"error": {"code": 500, "message": "Internal error", "status": "INTERNAL"}}, 500)
+        return True
+
+    # ---------- 路由 ----------
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if '/models/' in path:
+            model = path.rsplit('/models/', 1)[1]
+            self._send_json({"name": f"models/{model}", "displayName": model})
+        else:
+            self._send_json({"error": {"code": 404, "message": "not found"}}, 404)
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        body = self._read_body()
+        if path.startswith('/upload/'):
+            if self.headers.get('X-Goog-Upload-Command', '').startswith('start') or 'upload_id' not in parse_qs(parsed.query):
+                self._start_upload()
+            else:
+                self._upload_chunk(parse_qs(parsed.query)['upload_id'][0], body)
+        elif path.endswith(':streamGenerateContent'):
+            self._generate(json.loads(body or b'{}'), stream=True)
+        elif path.endswith(':generateContent'):
+            self._generate(json.loads(body or b'{}'), stream=False)
+        else:
+            self._send_json({"error": {"code": 404, "message": "not found"}}, 404)
+
+    # ---------- 文件上传 ----------
+
+    def _start_upload(self):
+        upload_id = uuid.uuid4().hex
+        with self.server.lock:
+            self.server.uploads[upload_id] = bytearray()
+        upload_url = f"{self.server.base_url}/upload/v1beta/files?upload_id={upload_id}"
+        self._send_json({}, headers={'X-Goog-Upload-URL': upload_url, 'X-Goog-Upload-Status': 'active'})
+
+    def _upload_chunk(self, upload_id: str, chunk: bytes):
+        settings = self.server.settings
+        if settings.upload_mbps > 0:
+            time.sleep(len(chunk) * 8 / (settings.upload_mbps * 1_000_000))
+        with self.server.lock:
+            buffer = self.server.uploads.get(upload_id)
+            if buffer is None:
+                buffer = self.server.uploads[upload_id] = bytearray()
+            buffer.extend(chunk)
+            self.server.stats['uploaded_bytes'] += len(chunk)
+        if 'finalize' not in self.headers.get('X-Goog-Upload-Command', ''):
+            self._send_json({}, headers={'X-Goog-Upload-Status': 'active'})
+            return
+        with self.server.lock:
+            data = bytes(self.server.uploads.pop(upload_id, b''))
+            name = f"files/{upload_id[:12]}"
+            uri = f"{self.server.base_url}/v1beta/{name}"
+            self.server.files[uri] = wav_duration_seconds(data)
+        self._send_json({"file": {
+            "name": name,
+            "uri": uri,
+            "mimeType": "audio/wav",
+            "sizeBytes": str(len(data)),
+            "state": "ACTIVE",
+        }}, headers={'X-Goog-Upload-Status': 'final'})
+
+    # ---------- 生成 ----------
+
+    def _response_text(self, request: dict) -> str:
+        """带音频文件的请求视为转录，提示词中要求analysis数组的视为分析，其余视为对话"""
+        texts, file_uri = [], None
+        for content in request.get('contents', []):
+            for part in content.get('parts', []):
+                if 'text' in part:
+                    texts.append(part['text'])
+                file_data = part.get('fileData') or part.get('file_data')
+                if file_data:
+                    file_uri = file_data.get('fileUri') or file_data.get('file_uri')
+        settings = self.server.settings
+        if file_uri is not None:
+            duration = self.server.files.get(file_uri, 60.0)
+            return synthetic_transcript(duration, settings.line_interval_s)
+        prompt_text = '\n'.join(texts)
+        if '"analysis"' in prompt_text:
+            return synthetic_analysis(prompt_text, settings.max_analysis_nodes)
+        return "这是模拟服务的回答。\n"
+
+    @staticmethod
+    def _candidate(text: str, finished: bool) -> dict:
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        if finished:
+            candidate["finishReason"] = "STOP"
+        return {"candidates": [candidate]}
+
+    def _generate(self, request: dict, stream: bool):
+        if self._maybe_fail():
+            return
+        settings = self.server.settings
+        text = self._response_text(request)
+        time.sleep(settings.first_token_ms / 1000)
+        if not stream:
+            self._send_json(self._candidate(text, True))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        chunks = [text[i:i + settings.chunk_chars] for i in range(0, len(text), settings.chunk_chars)] or ['']
+        try:
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(settings.chunk_delay_ms / 1000)
+                event = self._candidate(chunk, i == len(chunks) - 1)
+                payload = f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode('utf-8')
+                self.wfile.write(f"{len(payload):X}\r\n".encode() + payload + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端取消（如对冲请求中较慢的一方）
+            pass
+
+
+def start_server(settings: MockSettings, host: str = '127.0.0.1', port: int = 0) -> MockGeminiServer:
+    """在后台线程启动模拟服务，port为0时自动分配端口"""
+    server = MockGeminiServer((host, port), settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--first-token-ms', type=int, default=500, help='首字节延迟（毫秒）')
+    parser.add_argument('--chunk-delay-ms', type=int, default=20, help='流式分块间隔（毫秒）')
+    parser.add_argument('--upload-mbps', type=float, default=50.0, help='模拟上传带宽（Mbps），0表示不限')
+    parser.add_argument('--line-interval', type=int, default=15, help='生成文字稿时每句话的间隔（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='生成请求的失败比例（0-1）')
+    parser.add_argument('--rate-limit-share', type=float, default=0.5, help='失败中返回429的比例，其余返回500')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子，用于复现错误分布')
+
+
+def settings_from_args(args) -> MockSettings:
+    return MockSettings(
+        first_token_ms=args.first_token_ms,
+        chunk_delay_ms=args.chunk_delay_ms,
+        upload_mbps=args.upload_mbps,
+        line_interval_s=args.line_interval,
+        error_rate=args.error_rate,
+        rate_limit_share=args.rate_limit_share,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gemini API 本地模拟服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockGeminiServer((args.host, args.port), settings_from_args(args))
+    print(f"模拟Gemini服务已启动: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""add audio fingerprint to video
+
+Revision ID: 3f6a2c81d4e7
+Revises: 970b699590b6
+Create Date: 2026-10-19 10:12:41.218337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a2c81d4e7'
+down_revision = '970b699590b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('audio_fingerprint', sa.String(length=40), nullable=True))
+        batch_op.add_column(sa.Column('audio_seconds', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('duplicate_of', sa.String(length=36), nullable=True))
+        batch_op.create_index(batch_op.f('ix_videos_audio_fingerprint'), ['audio_fingerprint'], unique=False)
+        batch_op.create_index(batch_op.f('ix_videos_audio_seconds'), ['audio_seconds'], unique=False)
+        batch_op.create_index(batch_op.f('ix_videos_duplicate_of'), ['duplicate_of'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_videos_duplicate_of'))
+        batch_op.drop_index(batch_op.f('ix_videos_audio_seconds'))
+        batch_op.drop_index(batch_op.f('ix_videos_audio_fingerprint'))
+        batch_op.drop_column('duplicate_of')
+        batch_op.drop_column('audio_seconds')
+        batch_op.drop_column('audio_fingerprint')
@@ -0,0 +1,39 @@
+"""add project id to transcription tasks
+
+Revision ID: 6c0e8f3b27d5
+Revises: b27d9e4c51a0
+Create Date: 2026-10-19 11:47:05.813264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c0e8f3b27d5'
+down_revision = 'b27d9e4c51a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transcription_tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('project_id', sa.String(length=36), nullable=True))
+        batch_op.create_index(batch_op.f('ix_transcription_tasks_project_id'), ['project_id'], unique=False)
+
+    # 已有任务按原来的规则（文件名中包含项目ID或BV号）回填一次，之后按索引精确查找
+    op.execute("""
+        UPDATE transcription_tasks SET project_id = (
+            SELECT videos.id FROM videos
+            WHERE transcription_tasks.original_filename LIKE '%' || videos.id || '%'
+               OR transcription_tasks.original_filename LIKE '%' || videos.bv_id || '%'
+            LIMIT 1
+        )
+        WHERE project_id IS NULL
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('transcription_tasks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transcription_tasks_project_id'))
+        batch_op.drop_column('project_id')
@@ -16,7 +16,30 @@ branch_labels = None
 depends_on = None
 
 
+# 引用 videos.id 的外键（初始迁移中由PostgreSQL按默认规则命名）
+VIDEO_FOREIGN_KEYS = ('analysis_results', 'transcriptions')
+
+
+def _alter_video_id_postgresql(type_, using):
+    """
+    PostgreSQL 会检查外键两端的类型是否一致，且 SERIAL 默认值无法转换为字符串：
+    先删除外键和默认值，把 videos.id 与引用它的列一起转换类型，再重建外键
+    """
+    for table in VIDEO_FOREIGN_KEYS:
+        op.drop_constraint(f'{table}_video_id_fkey', table, type_='foreignkey')
+    op.alter_column('videos', 'id', server_default=None)
+    op.alter_column('videos', 'id', type_=type_, existing_nullable=False, postgresql_using=f'id::{using}')
+    for table in VIDEO_FOREIGN_KEYS:
+        op.alter_column(table, 'video_id', type_=type_, existing_nullable=False,
+                        postgresql_using=f'video_id::{using}')
+        op.create_foreign_key(f'{table}_video_id_fkey', table, 'videos', ['video_id'], ['id'], ondelete='CASCADE')
+
+
 def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _alter_video_id_postgresql(sa.String(length=36), 'varchar')
+        return
+
     # ### commands auto generated by Alembic - please adjust! ###
     with op.batch_alter_table('videos', schema=None) as batch_op:
         batch_op.alter_column('id',
@@ -28,6 +51,10 @@ def upgrade():
 
 
 def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _alter_video_id_postgresql(sa.INTEGER(), 'integer')
+        return
+
     # ### commands auto generated by Alembic - please adjust! ###
     with op.batch_alter_table('videos', schema=None) as batch_op:
         batch_op.alter_column('id',
@@ -0,0 +1,28 @@
+"""add progress to transcription tasks
+
+Revision ID: b27d9e4c51a0
+Revises: 3f6a2c81d4e7
+Create Date: 2026-10-19 11:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b27d9e4c51a0'
+down_revision = '3f6a2c81d4e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transcription_tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('progress', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('progress_message', sa.String(length=200), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('transcription_tasks', schema=None) as batch_op:
+        batch_op.drop_column('progress_message')
+        batch_op.drop_column('progress')
@@ -0,0 +1,47 @@
+"""add query indexes
+
+Revision ID: d4a9c7e2f813
+Revises: 6c0e8f3b27d5
+Create Date: 2026-10-19 14:05:38.417206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a9c7e2f813'
+down_revision = '6c0e8f3b27d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 项目列表按创建时间倒序、统计按状态筛选
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_videos_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_videos_created_at'), ['created_at'], unique=False)
+
+    # 转录任务列表和文字稿查找按创建时间排序
+    with op.batch_alter_table('transcription_tasks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_transcription_tasks_created_at'), ['created_at'], unique=False)
+
+    # 外键列与 videos.id 类型一致（SQLite 中此前仍为 INTEGER），并建索引供按项目查找和级联删除使用
+    for table in ('analysis_results', 'transcriptions'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('video_id', existing_type=sa.INTEGER(), type_=sa.String(length=36),
+                                  existing_nullable=False, postgresql_using='video_id::varchar')
+            batch_op.create_index(batch_op.f(f'ix_{table}_video_id'), ['video_id'], unique=False)
+
+
+def downgrade():
+    for table in ('transcriptions', 'analysis_results'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_video_id'))
+
+    with op.batch_alter_table('transcription_tasks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transcription_tasks_created_at'))
+
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_videos_created_at'))
+        batch_op.drop_index(batch_op.f('ix_videos_status'))
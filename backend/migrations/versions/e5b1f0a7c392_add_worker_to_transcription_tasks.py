@@ -0,0 +1,26 @@
+"""add worker to transcription tasks
+
+Revision ID: e5b1f0a7c392
+Revises: d4a9c7e2f813
+Create Date: 2026-10-19 15:12:08.306415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b1f0a7c392'
+down_revision = 'd4a9c7e2f813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transcription_tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('worker', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('transcription_tasks', schema=None) as batch_op:
+        batch_op.drop_column('worker')
@@ -14,4 +14,6 @@ os.environ.setdefault('FLASK_ENV', 'development')
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
+    # FLASK_DEBUG=0 时关闭调试和自动重载（重载器会再启动一个进程重新加载整个应用，桌面端打包后不需要）
+    debug = os.environ.get('FLASK_DEBUG', '1').lower() not in ('0', 'false', 'no')
+    app.run(debug=debug, host='127.0.0.1', port=int(os.environ.get('PORT', 5000)))
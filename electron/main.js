@@ -2,10 +2,16 @@ const { app, BrowserWindow, ipcMain, dialog } = require('electron');
 const path = require('path');
 const { PythonShell } = require('python-shell');
 const fs = require('fs');
+const http = require('http');
 
 let mainWindow;
 let pythonProcess;
 
+// 后端就绪检查
+const BACKEND_READY_URL = 'http://127.0.0.1:5000/api/ready';
+const BACKEND_READY_TIMEOUT_MS = 30000;
+const BACKEND_POLL_INTERVAL_MS = 100;
+
 // 获取应用资源路径
 function getResourcePath(relativePath) {
   if (app.isPackaged) {
@@ -35,7 +41,9 @@ function startBackend() {
     pythonPath: pythonExecutable,
     pythonOptions: ['-u'], // unbuffered output
     scriptPath: backendPath,
-    args: ['run.py']
+    args: ['run.py'],
+    // 打包后关闭Flask调试重载，避免启动两次后端进程
+    env: { ...process.env, FLASK_DEBUG: app.isPackaged ? '0' : '1' }
   };
 
   console.log('启动Python后端...');
@@ -59,8 +67,37 @@ function startBackend() {
   return pythonProcess;
 }
 
+// 轮询后端就绪接口，就绪或超时后resolve（超时也显示窗口，由前端自行提示后端错误）
+function waitForBackend() {
+  const deadline = Date.now() + BACKEND_READY_TIMEOUT_MS;
+  return new Promise((resolve) => {
+    const poll = () => {
+      const req = http.get(BACKEND_READY_URL, (res) => {
+        res.resume();
+        if (res.statusCode === 200) {
+          console.log('后端已就绪');
+          resolve(true);
+        } else {
+          retry();
+        }
+      });
+      req.on('error', retry);
+      req.setTimeout(1000, () => req.destroy());
+    };
+    const retry = () => {
+      if (Date.now() > deadline) {
+        console.warn('等待后端就绪超时');
+        resolve(false);
+      } else {
+        setTimeout(poll, BACKEND_POLL_INTERVAL_MS);
+      }
+    };
+    poll();
+  });
+}
+
 // 创建主窗口
-function createWindow() {
+function createWindow(backendReady) {
   mainWindow = new BrowserWindow({
     width: 1400,
     height: 900,
@@ -86,8 +123,12 @@ function createWindow() {
     mainWindow.loadURL('http://localhost:5173');
   }
 
-  // 窗口准备好后显示
-  mainWindow.once('ready-to-show', () => {
+  // 页面和后端都准备好后再显示窗口，避免首屏请求失败
+  mainWindow.once('ready-to-show', async () => {
+    await backendReady;
+    if (!mainWindow) {
+      return;
+    }
     mainWindow.show();
     
     // 开发环境下打开开发者工具
@@ -128,13 +169,13 @@ app.whenReady().then(() => {
   // 启动后端
   startBackend();
   
-  // 创建窗口
-  createWindow();
+  // 创建窗口，前端页面与后端并行加载
+  createWindow(waitForBackend());
 
   // macOS: 当所有窗口关闭时重新创建窗口
   app.on('activate', () => {
     if (BrowserWindow.getAllWindows().length === 0) {
-      createWindow();
+      createWindow(Promise.resolve(true));
     }
   });
 });
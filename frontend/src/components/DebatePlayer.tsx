@@ -25,7 +25,7 @@ import {
   BarChartOutlined,
   AppstoreOutlined
 } from "@ant-design/icons";
-import { useParams, useNavigate } from "react-router-dom";
+import { useParams, useNavigate, useSearchParams } from "react-router-dom";
 
 import AnalysisList from "./AnalysisList";
 import AttackDefenceTree from "./AttackDefenseTree";
@@ -48,6 +48,9 @@ interface Project {
 const DebatePlayer: React.FC = () => {
   const { projectId } = useParams<{ projectId: string }>();
   const navigate = useNavigate();
+  // 检索结果的深链接 /project/:projectId?t=秒，视频加载后跳转到该时间点
+  const [searchParams] = useSearchParams();
+  const startTime = Number(searchParams.get('t')) || 0;
   const videoRef = useRef<HTMLVideoElement>(null);
   const [currentTime, setCurrentTime] = useState(0);
   const analysisListRef = useRef<any>(null);
@@ -87,16 +90,49 @@ const DebatePlayer: React.FC = () => {
   useEffect(() => {
     if (!project) return;
 
+    const sources: EventSource[] = [];
+
+    // 分析结果尚未生成时，订阅流式分析接口，节点生成一个就展示一个
+    const streamAnalysis = (view: 'tree' | 'bubble', setData: React.Dispatch<React.SetStateAction<any[]>>) => {
+      setData([]);
+      const source = new EventSource(`/api/analysis/stream/${project.id}?view=${view}`);
+      sources.push(source);
+      source.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.type === 'node') {
+          setData(prev => [...prev, data.node]);
+        } else if (data.type === 'reset') {
+          setData([]);
+        } else if (data.type === 'completion' || data.type === 'error') {
+          if (data.type === 'error') console.error(`Stream ${view} analysis failed:`, data.error);
+          source.close();
+        }
+      };
+      source.onerror = () => source.close();
+    };
+
     // 加载tree数据
-    fetch(`/api/analysis/${project.id}_tree`).then(res => res.json()).then(data => {
-      setTreeAnalysis(data.analysis || data);
+    fetch(`/api/analysis/${project.id}_tree`).then(res => {
+      if (res.status === 404) {
+        streamAnalysis('tree', setTreeAnalysis);
+        return;
+      }
+      return res.json().then(data => setTreeAnalysis(data.analysis || data));
     });
     // 加载bubble数据
-    fetch(`/api/analysis/${project.id}_bubble`).then(res => res.json()).then(data => {
-      const bubbleData = data.analysis || data;
-      console.log('Bubble analysis data:', bubbleData);
-      setBubbleAnalysis(bubbleData);
+    fetch(`/api/analysis/${project.id}_bubble`).then(res => {
+      if (res.status === 404) {
+        streamAnalysis('bubble', setBubbleAnalysis);
+        return;
+      }
+      return res.json().then(data => {
+        const bubbleData = data.analysis || data;
+        console.log('Bubble analysis data:', bubbleData);
+        setBubbleAnalysis(bubbleData);
+      });
     });
+
+    return () => sources.forEach(source => source.close());
   }, [project]);
 
   const handleBack = () => {
@@ -112,6 +148,12 @@ const DebatePlayer: React.FC = () => {
     }
   };
 
+  const handleLoadedMetadata = () => {
+    if (videoRef.current && startTime > 0) {
+      videoRef.current.currentTime = startTime;
+    }
+  };
+
   const handleSeek = (time: number) => {
     if (videoRef.current) {
       videoRef.current.currentTime = time;
@@ -314,6 +356,7 @@ const DebatePlayer: React.FC = () => {
                 }}
                 controls
                 onTimeUpdate={handleTimeUpdate}
+                onLoadedMetadata={handleLoadedMetadata}
               />
             </div>
           </Card>
@@ -16,7 +16,7 @@ import {
   Form,
   Select,
   Progress,
-  
+  Tooltip,
   
   Badge
 } from 'antd';
@@ -39,6 +39,7 @@ import {
 import { useNavigate } from 'react-router-dom';
 
 import ApiConfigModal from './ApiConfigModal';
+import { uploadVideoInChunks } from '../services/chunkedUpload';
 
 const { Title, Text, Paragraph } = Typography;
 const { Search } = Input;
@@ -54,6 +55,7 @@ interface Project {
   bilibili_url?: string;
   created_at?: string;
   status?: string;
+  duplicate_of?: string | null;
 }
 
 interface UploadFormData {
@@ -193,43 +195,13 @@ const ProjectList: React.FC = () => {
         const selectedFile = uploadFileList[0];
         console.log('使用uploadFileList中的文件:', selectedFile);
         
-        const formData = new FormData();
-        formData.append('video_file', selectedFile);
-        formData.append('title', values.title || '');
-        formData.append('video_type', 'local');
-        
         setUploadStep('正在上传视频文件...');
-        // 模拟上传进度
-        const progressInterval = setInterval(() => {
-          setUploadProgress(prev => {
-            if (prev >= 95) {
-              clearInterval(progressInterval);
-              return 95;
-            }
-            return prev + 5;
-          });
-        }, 100);
-        
-        const response = await fetch('/api/projects/upload_local', {
-          method: 'POST',
-          body: formData,
+        // 分块上传，断线后重新上传同一文件会从缺少的块继续
+        const videoId = await uploadVideoInChunks(selectedFile, {
+          title: values.title || '',
+          onProgress: fraction => setUploadProgress(Math.round(fraction * 99)),
         });
-        
-        clearInterval(progressInterval);
-        
-        if (!response.ok) {
-          const errorData = await response.json().catch(() => ({}));
-          console.error('上传失败:', response.status, errorData);
-          
-          let errorMessage = errorData.error || `上传失败: ${response.status}`;
-          if (response.status === 413) {
-            errorMessage = "文件太大！最大支持1GB，请选择较小的视频文件。";
-          }
-          
-          throw new Error(errorMessage);
-        }
-        
-        const result=await response.json();
+        const result = { video_id: videoId };
         setUploadProgress(100);
         setUploadStatus('processing');
         setUploadStep('视频上传成功！正在处理中（提取音频、转录、分析）...');
@@ -598,6 +570,11 @@ const ProjectList: React.FC = () => {
                         <Tag color="blue" icon={<LinkOutlined />}>
                           {project.bv_id}
                         </Tag>
+                        {project.duplicate_of && (
+                          <Tooltip title={`与「${projects.find(p => p.id === project.duplicate_of)?.title || project.duplicate_of}」音频相同，已复用其文字稿和分析结果`}>
+                            <Tag color="gold">重复导入</Tag>
+                          </Tooltip>
+                        )}
                       </div>
                       
                       {project.uploader && (
@@ -744,10 +721,10 @@ const ProjectList: React.FC = () => {
                     const file = e.target.files?.[0];
                     console.log('选择的文件:', file);
                     if (file) {
-                      // 检查文件大小（1GB限制）
-                      const maxSize = 1024 * 1024 * 1024; // 1GB
+                      // 检查文件大小（分块上传，与后端 CHUNKED_UPLOAD_MAX_BYTES 默认值一致）
+                      const maxSize = 8 * 1024 * 1024 * 1024; // 8GB
                       if (file.size > maxSize) {
-                        message.error(`文件太大！最大支持1GB，当前文件大小: ${(file.size / 1024 / 1024).toFixed(2)}MB`);
+                        message.error(`文件太大！最大支持8GB，当前文件大小: ${(file.size / 1024 / 1024).toFixed(2)}MB`);
                         return;
                       }
                       setUploadFileList([file]);
@@ -0,0 +1,128 @@
+// 本地视频分块上传：每块附带SHA-256单独上传，失败的块自动重试；
+// 上传编号按文件保存在localStorage中，中断后重新选择同一文件即可从缺少的块继续
+
+interface UploadSummary {
+  upload_id: string;
+  chunk_size: number;
+  total_chunks: number;
+  received: number[];
+  missing: number[];
+  complete: boolean;
+  video_id?: string | null;
+}
+
+export interface ChunkedUploadOptions {
+  title?: string;
+  // 已上传的字节比例 0-1
+  onProgress?: (fraction: number) => void;
+  // 同时上传的块数
+  concurrency?: number;
+  // 每块最多重试次数
+  maxRetries?: number;
+}
+
+const BASE_URL = '/api/projects/uploads';
+const STORAGE_PREFIX = 'debatelens-upload:';
+
+const fileKey = (file: File) => `${STORAGE_PREFIX}${file.name}:${file.size}:${file.lastModified}`;
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+const toHex = (buffer: ArrayBuffer) =>
+  Array.from(new Uint8Array(buffer)).map(b => b.toString(16).padStart(2, '0')).join('');
+
+async function readError(response: Response, fallback: string): Promise<string> {
+  const data = await response.json().catch(() => ({}));
+  return data.error || `${fallback}: ${response.status}`;
+}
+
+// 查找该文件未完成的上传，不存在或已过期时创建新的
+async function openUpload(file: File, title: string): Promise<UploadSummary> {
+  const saved = localStorage.getItem(fileKey(file));
+  if (saved) {
+    const response = await fetch(`${BASE_URL}/${saved}`);
+    if (response.ok) {
+      return await response.json();
+    }
+    localStorage.removeItem(fileKey(file));
+  }
+
+  const response = await fetch(BASE_URL, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename: file.name, size: file.size, title }),
+  });
+  if (!response.ok) {
+    throw new Error(await readError(response, '创建上传失败'));
+  }
+  const summary: UploadSummary = await response.json();
+  localStorage.setItem(fileKey(file), summary.upload_id);
+  return summary;
+}
+
+async function putChunk(uploadId: string, index: number, blob: Blob, maxRetries: number) {
+  const data = await blob.arrayBuffer();
+  const checksum = toHex(await crypto.subtle.digest('SHA-256', data));
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await fetch(`${BASE_URL}/${uploadId}/chunks/${index}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': checksum },
+        body: data,
+      });
+      if (response.ok) {
+        return await response.json();
+      }
+      // 4xx中只有校验失败（传输损坏）值得重试
+      if (response.status < 500 && response.status !== 422) {
+        throw Object.assign(new Error(await readError(response, `第${index + 1}块上传失败`)), { fatal: true });
+      }
+      throw new Error(await readError(response, `第${index + 1}块上传失败`));
+    } catch (error: any) {
+      if (error.fatal || attempt >= maxRetries) {
+        throw error;
+      }
+      // 网络中断时指数退避后重试
+      await sleep(Math.min(30000, 1000 * 2 ** attempt));
+    }
+  }
+}
+
+/**
+ * 分块上传视频文件，全部块到达后后端立即开始处理
+ * @returns 项目编号
+ */
+export async function uploadVideoInChunks(file: File, options: ChunkedUploadOptions = {}): Promise<string> {
+  const { title = '', onProgress, concurrency = 3, maxRetries = 8 } = options;
+  const upload = await openUpload(file, title);
+  const pending = [...upload.missing];
+  let uploadedBytes = (upload.total_chunks - pending.length) * upload.chunk_size;
+  onProgress?.(Math.min(1, uploadedBytes / file.size));
+
+  let videoId = upload.complete ? upload.upload_id : null;
+  const worker = async () => {
+    for (let index = pending.shift(); index !== undefined; index = pending.shift()) {
+      const start = index * upload.chunk_size;
+      const blob = file.slice(start, Math.min(file.size, start + upload.chunk_size));
+      const result = await putChunk(upload.upload_id, index, blob, maxRetries);
+      uploadedBytes += blob.size;
+      onProgress?.(Math.min(1, uploadedBytes / file.size));
+      if (result.complete) {
+        videoId = result.video_id;
+      }
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(concurrency, pending.length) }, worker));
+
+  if (!videoId) {
+    // 并行上传时最后一个响应未必标记完成，以服务端状态为准
+    const response = await fetch(`${BASE_URL}/${upload.upload_id}`);
+    const summary = await response.json();
+    if (!summary.complete) {
+      throw new Error(`上传未完成，缺少 ${summary.missing?.length ?? '?'} 块，请重新上传以继续`);
+    }
+    videoId = summary.video_id as string;
+  }
+  localStorage.removeItem(fileKey(file));
+  return videoId;
+}
@@ -12,6 +12,13 @@ export interface AnalysisItem {
     pros_gain?: number | string; // 新增
     cons_gain?: number | string; // 新增
     summary?: string; // 新增
+    speaking_speed?: "fast" | "medium" | "slow" | null; // 本地计算
+    speech?: {
+        chars_per_min: number | null;
+        speaking_s: number;
+        pause_count?: number;
+        pause_total_s?: number;
+    };
 }
 
 export interface AnalysisData {